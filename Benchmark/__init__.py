@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from .sites import SiteFixtureServer, record_snapshots
+from .fake_openai import FakeOpenAIServer
+
+# Configurar el logger reutilizando la configuración del main
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (10, 100, 1000)
+SCENARIOS = ("generator", "parser", "main")
+
+
+class PeakRSS:
+    """
+    Mide la memoria residente máxima del proceso y sus hijos (Chromium, workers de OCR,
+    subprocesos) muestreando cada interval segundos. Usa psutil si está instalado; si no,
+    recurre a resource.getrusage (solo Unix, máximo de un único proceso).
+    """
+
+    def __init__(self, pid: int = None, interval: float = 0.2):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak = 0
+        self.source = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        import psutil
+
+        try:
+            proceso = psutil.Process(self.pid)
+            procesos = [proceso] + proceso.children(recursive=True)
+        except psutil.Error:
+            return
+        total = 0
+        for p in procesos:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak = max(self.peak, total)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        try:
+            import psutil  # noqa: F401
+            self.source = "psutil"
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        except ImportError:
+            self.source = "getrusage"
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+        else:
+            import resource
+
+            # ru_maxrss está en KB en Linux y en bytes en macOS
+            escala = 1 if sys.platform == "darwin" else 1024
+            self.peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * escala
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / (1024 * 1024)
+
+
+def _result(escenario, n, correctos, segundos, rss, resumen, **extra):
+    return {
+        "escenario": escenario,
+        "urls": n,
+        "correctos": correctos,
+        "segundos": round(segundos, 3),
+        "paginas_por_minuto": round(correctos / segundos * 60, 1) if segundos > 0 else 0.0,
+        "rss_pico_mb": round(rss.peak_mb, 1),
+        "rss_fuente": rss.source,
+        "etapas": resumen.get("etapas", {}),
+        **extra,
+    }
+
+
+def capture_has_text(ruta: str) -> bool:
+    """Indica si la captura de texto (JSON) tiene al menos un bloque de contenido."""
+    if not ruta:
+        return False
+    try:
+        with open(ruta, "r", encoding="utf-8") as file:
+            return bool(json.load(file).get("bloques"))
+    except (OSError, ValueError):
+        return False
+
+
+def bench_generator(sites: SiteFixtureServer, n: int, workdir: str, concurrency: int = 4,
+                    capture: str = "pdf", lean: bool = False) -> dict:
+    """Renderiza n páginas del servidor de pruebas con PDFGenerator."""
+    from PDFGenerator import PDFGenerator
+    from Metrics import RunMetrics
+
+    websites_file = os.path.join(workdir, "websites.txt")
+    with open(websites_file, "w") as file:
+        file.write("\n".join(sites.urls(n)))
+    metrics = RunMetrics(f"generator_{n}")
+    generador = PDFGenerator(websites_file, output_folder=os.path.join(workdir, "temp_pdf"), concurrency=concurrency,
+                             headless=True, lean=lean, capture=capture,
+                             archive_folder=os.path.join(workdir, "archived_pdfs"),
+                             storage_state_folder=os.path.join(workdir, "storage_state"), metrics=metrics)
+    with PeakRSS() as rss:
+        inicio = time.perf_counter()
+        resultados = asyncio.run(generador.process_all_websites())
+        segundos = time.perf_counter() - inicio
+    # Una captura de texto solo cuenta si contiene el texto de la página, no solo la URL y el título
+    correctos = sum(1 for r in resultados if (r["pdf"] and not r["captura"]) or capture_has_text(r["captura"]))
+    return _result("generator", n, correctos, segundos, rss, metrics.summary(),
+                   concurrencia=concurrency, captura=capture, lean=lean)
+
+
+def _documentos(sites: SiteFixtureServer, n: int, carpeta: str, capture: str):
+    """
+    Genera n documentos de entrada para el extractor a partir de las páginas de prueba, sin
+    navegador: capturas JSON (capture="text") o PDFs con capa de texto (PyMuPDF).
+    """
+    import re
+    import html as html_lib
+
+    os.makedirs(carpeta, exist_ok=True)
+    fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+    rutas = []
+    for i, url in enumerate(sites.urls(n)):
+        texto = re.sub(r"<(script|style)[^>]*>.*?</\1>", "", sites.page(i), flags=re.S)
+        lineas = [html_lib.unescape(linea).strip() for linea in re.sub(r"<[^>]+>", "\n", texto).splitlines()]
+        lineas = [linea for linea in lineas if linea]
+        base = os.path.join(carpeta, f"s{i % sites.domains}_localhost_{i:06d}_{fecha}")
+        if capture == "text":
+            ruta = f"{base}.json"
+            with open(ruta, "w", encoding="utf-8") as file:
+                json.dump({"url": url, "fecha": fecha, "titulo": lineas[0] if lineas else "",
+                           "bloques": [{"tipo": "texto", "texto": linea} for linea in lineas]}, file, ensure_ascii=False)
+        else:
+            import fitz
+
+            ruta = f"{base}.pdf"
+            with fitz.open() as documento:
+                pagina = documento.new_page()
+                pagina.insert_textbox(pagina.rect + (36, 36, -36, -36), "\n".join(lineas), fontsize=9)
+                documento.save(ruta)
+        rutas.append(ruta)
+    return rutas
+
+
+def bench_parser(sites: SiteFixtureServer, openai_server: FakeOpenAIServer, n: int, workdir: str,
+                 mode: str = "text", capture: str = "pdf") -> dict:
+    """Extrae n documentos con PDFParser.parse_pdf contra el servidor OpenAI simulado."""
+    from OpenAIPDFExtractor import PDFParser
+    from Metrics import RunMetrics
+
+    rutas = _documentos(sites, n, os.path.join(workdir, "documentos"), capture)
+    metrics = RunMetrics(f"parser_{n}")
+    parser = PDFParser("sk-benchmark", mode=mode, base_url=openai_server.base_url, min_text_chars=50, metrics=metrics)
+    correctos = 0
+    with PeakRSS() as rss:
+        inicio = time.perf_counter()
+        for ruta in rutas:
+            try:
+                parser.parse_pdf(ruta)
+                correctos += 1
+            except Exception as e:
+                logger.error(f"Error al extraer {ruta}: {e}")
+        parser.close()
+        segundos = time.perf_counter() - inicio
+    contadores = {}
+    for contador in metrics.report()["contadores"]:
+        contadores[contador["nombre"]] = contadores.get(contador["nombre"], 0) + contador["valor"]
+    return _result("parser", n, correctos, segundos, rss, metrics.summary(), modo=mode, captura=capture,
+                   contadores=contadores)
+
+
+def bench_main(sites: SiteFixtureServer, openai_server: FakeOpenAIServer, n: int, workdir: str,
+               env: dict = None) -> dict:
+    """
+    Ejecuta el flujo completo de main.py en un subproceso, con websites.txt apuntando al servidor
+    de páginas y la API apuntando al servidor OpenAI simulado. env añade variables de configuración
+    (PIPELINE_MODE, PDF_CONCURRENCY, CAPTURE_MODE...).
+    """
+    with open(os.path.join(workdir, "websites.txt"), "w") as file:
+        file.write("\n".join(sites.urls(n)))
+    entorno = {**os.environ, "OPENAI_API_KEY": "sk-benchmark", "OPENAI_BASE_URL": openai_server.base_url,
+               "EXTRACTION_CACHE": "0", "PAUSE_ON_EXIT": "0", **(env or {})}
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "main.py")], cwd=workdir, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with PeakRSS(proceso.pid) as rss:
+        proceso.wait()
+    segundos = time.perf_counter() - inicio
+
+    informes = sorted(f for f in os.listdir(os.path.join(workdir, "logs")) if f.startswith("metricas_"))
+    resumen = {}
+    if informes:
+        with open(os.path.join(workdir, "logs", informes[-1]), "r", encoding="utf-8") as file:
+            resumen = json.load(file)["resumen"]
+    correctos = len(os.listdir(os.path.join(workdir, "processed_pdfs"))) \
+        if os.path.isdir(os.path.join(workdir, "processed_pdfs")) else 0
+    return _result("main", n, correctos, segundos, rss, resumen, codigo_salida=proceso.returncode,
+                   configuracion=env or {})
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, scenarios=SCENARIOS, site_latency=0.2, site_jitter=0.1,
+                   openai_latency=0.3, run_latency=2.0, requests_per_minute=None, tokens_per_minute=None,
+                   snapshots_folder=None, concurrency=4, capture="pdf", mode="text", main_env=None,
+                   keep_workdir=False) -> list:
+    """
+    Ejecuta los escenarios para cada tamaño con los dos servidores locales.
+    :return: Lista de resultados (ver _result)
+    """
+    resultados = []
+    with SiteFixtureServer(snapshots_folder, latency=site_latency, jitter=site_jitter) as sites, \
+            FakeOpenAIServer(latency=openai_latency, run_latency=run_latency,
+                             requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute) as fake:
+        for n in sizes:
+            for escenario in scenarios:
+                workdir = tempfile.mkdtemp(prefix=f"benchmark_{escenario}_{n}_")
+                logger.info(f"Escenario {escenario} con {n} URLs en {workdir}")
+                try:
+                    if escenario == "generator":
+                        resultado = bench_generator(sites, n, workdir, concurrency=concurrency, capture=capture)
+                    elif escenario == "parser":
+                        resultado = bench_parser(sites, fake, n, workdir, mode=mode, capture=capture)
+                    else:
+                        resultado = bench_main(sites, fake, n, workdir, env={
+                            "PDF_CONCURRENCY": str(concurrency), "CAPTURE_MODE": capture,
+                            "EXTRACTION_MODE": mode, **(main_env or {})})
+                finally:
+                    if not keep_workdir:
+                        shutil.rmtree(workdir, ignore_errors=True)
+                logger.info(f"{escenario} ({n} URLs): {resultado['paginas_por_minuto']} páginas/min, "
+                            f"RSS pico {resultado['rss_pico_mb']} MB")
+                resultados.append(resultado)
+    return resultados
+
+
+def print_table(resultados):
+    """Tabla resumen por escenario y tamaño con los p50/p95 de cada etapa."""
+    print(f"{'escenario':<10} {'urls':>6} {'ok':>6} {'seg':>9} {'pág/min':>9} {'RSS MB':>8}  etapas p50/p95 (s)")
+    for r in resultados:
+        etapas = ", ".join(f"{etapa} {datos['p50']:.2f}/{datos['p95']:.2f}" for etapa, datos in sorted(r["etapas"].items()))
+        print(f"{r['escenario']:<10} {r['urls']:>6} {r['correctos']:>6} {r['segundos']:>9.1f} "
+              f"{r['paginas_por_minuto']:>9.1f} {r['rss_pico_mb']:>8.1f}  {etapas}")
+
+
+def main(argv=None):
+    """Línea de comandos de las pruebas de rendimiento."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento sin conexión (páginas y API simuladas).")
+    sub = parser.add_subparsers(dest="comando")
+    grabar = sub.add_parser("grabar", help="Graba instantáneas de las URLs de websites.txt (requiere conexión)")
+    grabar.add_argument("--websites", default="websites.txt")
+    grabar.add_argument("--carpeta", default=os.path.join(REPO_DIR, "Benchmark", "snapshots"))
+
+    parser.add_argument("--tamanos", default=",".join(map(str, DEFAULT_SIZES)), help="Número de URLs, separados por comas")
+    parser.add_argument("--escenarios", default=",".join(SCENARIOS), help="generator, parser y/o main")
+    parser.add_argument("--latencia-web", type=float, default=0.2, help="Latencia de las páginas (s)")
+    parser.add_argument("--jitter-web", type=float, default=0.1, help="Variación de la latencia de las páginas (s)")
+    parser.add_argument("--latencia-openai", type=float, default=0.3, help="Latencia de cada petición a la API (s)")
+    parser.add_argument("--latencia-run", type=float, default=2.0, help="Duración de un run del asistente (s)")
+    parser.add_argument("--rpm", type=float, default=None, help="Límite de peticiones por minuto de la API simulada")
+    parser.add_argument("--tpm", type=float, default=None, help="Límite de tokens por minuto de la API simulada")
+    parser.add_argument("--instantaneas", default=None, help="Carpeta de instantáneas grabadas")
+    parser.add_argument("--concurrencia", type=int, default=4, help="PDF_CONCURRENCY")
+    parser.add_argument("--captura", default="pdf", choices=["pdf", "text", "both"], help="CAPTURE_MODE")
+    parser.add_argument("--modo", default="text", choices=["text", "assistants"], help="EXTRACTION_MODE")
+    parser.add_argument("--env", action="append", default=[], help="Variable adicional para main.py (CLAVE=valor)")
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    parser.add_argument("--conservar", action="store_true", help="No borrar las carpetas de trabajo")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.comando == "grabar":
+        asyncio.run(record_snapshots(args.websites, args.carpeta))
+        return
+
+    resultados = run_benchmarks(
+        sizes=[int(n) for n in args.tamanos.split(",")], scenarios=args.escenarios.split(","),
+        site_latency=args.latencia_web, site_jitter=args.jitter_web, openai_latency=args.latencia_openai,
+        run_latency=args.latencia_run, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+        snapshots_folder=args.instantaneas, concurrency=args.concurrencia, capture=args.captura, mode=args.modo,
+        main_env=dict(v.split("=", 1) for v in args.env), keep_workdir=args.conservar)
+    print_table(resultados)
+    salida = args.salida or os.path.join("output", f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as file:
+        json.dump(resultados, file, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {salida}")
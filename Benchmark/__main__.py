@@ -0,0 +1,4 @@
+from Benchmark import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import re
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Precio devuelto por defecto en las respuestas simuladas
+DEFAULT_PRECIO = {
+    "nombre": "Comercializadora de prueba",
+    "nombre_oferta": "Tarifa de prueba",
+    "precio_te1": 0.1234,
+    "precio_te2": 0.1234,
+    "precio_te3": 0.1234,
+    "precio_tp1": 0.0866,
+    "precio_tp2": 0.0129,
+    "descuento_promo": 10.0,
+    "descuento_servicios": 0.0,
+    "tipo_producto": "fijo",
+    "calendario": "ATR",
+    "abonos": 0.0,
+    "permanencia": "Sin permanencia",
+    "comentario": "Respuesta simulada",
+    "analisis": "Respuesta simulada del servidor de pruebas.",
+}
+
+
+def _estimar_tokens(cuerpo: bytes) -> int:
+    return max(1, len(cuerpo) // 4)
+
+
+def _multipart_file(cuerpo: bytes, content_type: str) -> bytes:
+    """Contenido del campo de archivo de un cuerpo multipart/form-data."""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if match is None:
+        return b""
+    for parte in cuerpo.split(b"--" + match.group(1).encode()):
+        cabecera, _, contenido = parte.partition(b"\r\n\r\n")
+        if b"filename=" in cabecera:
+            return contenido[:-2] if contenido.endswith(b"\r\n") else contenido
+    return b""
+
+
+class _Cubo:
+    """Presupuesto por minuto con recarga continua, como los límites de la API."""
+
+    def __init__(self, por_minuto: float):
+        self.capacidad = por_minuto
+        self.disponible = por_minuto
+        self.ultimo = time.monotonic()
+
+    def tomar(self, cantidad: float) -> float:
+        """Consume cantidad si hay saldo; si no, devuelve los segundos hasta que lo haya."""
+        ahora = time.monotonic()
+        self.disponible = min(self.capacidad, self.disponible + (ahora - self.ultimo) * self.capacidad / 60)
+        self.ultimo = ahora
+        if self.disponible >= cantidad:
+            self.disponible -= cantidad
+            return 0.0
+        return (cantidad - self.disponible) * 60 / self.capacidad
+
+
+class FakeOpenAIServer:
+    """
+    Servidor local compatible con la API de OpenAI para las pruebas de rendimiento, sin coste.
+
+    Implementa los endpoints que usa OpenAIPDFExtractor: files (subida, contenido, borrado),
+    assistants, threads, runs (con create_and_poll), messages, chat completions (con
+    response_format Overview o PackedOverview) y batches. Las respuestas son un Overview fijo
+    (overview), con latencia configurable, límites de peticiones y tokens por minuto que
+    devuelven 429 con Retry-After y cabeceras x-ratelimit-*, y usage en cada respuesta.
+    """
+
+    def __init__(self, latency: float = 0.0, run_latency: float = 0.0, batch_latency: float = 0.0,
+                 requests_per_minute: float = None, tokens_per_minute: float = None,
+                 overview: dict = None, port: int = 0):
+        """
+        :param latency: Segundos de espera de cada petición
+        :param run_latency: Segundos que tarda un run del asistente en completarse
+        :param batch_latency: Segundos que tarda un lote de la Batch API en completarse
+        :param requests_per_minute: Límite de peticiones por minuto (None = sin límite)
+        :param tokens_per_minute: Límite de tokens por minuto (None = sin límite)
+        :param overview: Overview devuelto en todas las extracciones (por defecto un Precio fijo)
+        :param port: Puerto de escucha (0 = uno libre)
+        """
+        self.latency = latency
+        self.run_latency = run_latency
+        self.batch_latency = batch_latency
+        self.overview = overview or {"precios": [DEFAULT_PRECIO]}
+        self._requests = _Cubo(requests_per_minute) if requests_per_minute else None
+        self._tokens = _Cubo(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self._ids = 0
+        self.files = {}
+        self.runs = {}
+        self.batches = {}
+        self.peticiones = {}
+        self.limitadas = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def _nuevo_id(self, prefijo: str) -> str:
+        with self._lock:
+            self._ids += 1
+            return f"{prefijo}-{self._ids}"
+
+    def _limitar(self, cuerpo: bytes):
+        """Devuelve (segundos de espera, cabeceras) según los límites configurados."""
+        cabeceras = {}
+        espera = 0.0
+        with self._lock:
+            if self._requests is not None:
+                espera = max(espera, self._requests.tomar(1))
+                cabeceras["x-ratelimit-limit-requests"] = str(int(self._requests.capacidad))
+                cabeceras["x-ratelimit-remaining-requests"] = str(int(self._requests.disponible))
+            if self._tokens is not None and espera == 0:
+                espera = max(espera, self._tokens.tomar(_estimar_tokens(cuerpo)))
+                cabeceras["x-ratelimit-limit-tokens"] = str(int(self._tokens.capacidad))
+                cabeceras["x-ratelimit-remaining-tokens"] = str(int(self._tokens.disponible))
+            if espera > 0:
+                self.limitadas += 1
+        return espera, cabeceras
+
+    # --- Respuestas simuladas ----------------------------------------------
+
+    def completion(self, peticion: dict) -> dict:
+        """Respuesta de chat completions: Overview fijo o uno por documento si el esquema es agrupado."""
+        formato = (peticion.get("response_format") or {}).get("json_schema", {})
+        texto = "\n".join(str(m.get("content", "")) for m in peticion.get("messages", []))
+        if formato.get("name") == "PackedOverview":
+            ids = re.findall(r"^=== Documento (\S+) ===$", texto, re.MULTILINE)
+            contenido = {"documentos": [{"id": doc_id, **self.overview} for doc_id in ids]}
+        else:
+            contenido = self.overview
+        entrada = max(1, len(texto) // 4)
+        salida = max(1, len(json.dumps(contenido)) // 4)
+        return {
+            "id": self._nuevo_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            "model": peticion.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                         "message": {"role": "assistant", "content": json.dumps(contenido, ensure_ascii=False),
+                                     "refusal": None}}],
+            "usage": {"prompt_tokens": entrada, "completion_tokens": salida, "total_tokens": entrada + salida},
+        }
+
+    def _run(self, thread_id: str, run_id: str) -> dict:
+        run = self.runs[run_id]
+        completado = time.time() - run["inicio"] >= self.run_latency
+        return {
+            "id": run_id, "object": "thread.run", "created_at": int(run["inicio"]), "thread_id": thread_id,
+            "assistant_id": run["assistant_id"], "status": "completed" if completado else "in_progress",
+            "model": "fake", "instructions": "", "tools": [], "metadata": {},
+            "usage": {"prompt_tokens": 5000, "completion_tokens": 500, "total_tokens": 5500} if completado else None,
+        }
+
+    def _batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        completado = time.time() - batch["inicio"] >= self.batch_latency
+        if completado and batch["output_file_id"] is None:
+            lineas = []
+            for linea in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+                if not linea.strip():
+                    continue
+                peticion = json.loads(linea)
+                lineas.append(json.dumps({
+                    "id": self._nuevo_id("batch_req"), "custom_id": peticion["custom_id"],
+                    "response": {"status_code": 200, "request_id": "fake", "body": self.completion(peticion["body"])},
+                    "error": None,
+                }, ensure_ascii=False))
+            batch["output_file_id"] = self._nuevo_id("file")
+            self.files[batch["output_file_id"]] = "\n".join(lineas).encode("utf-8")
+            batch["total"] = len(lineas)
+        return {
+            "id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions", "errors": None,
+            "input_file_id": batch["input_file_id"], "completion_window": "24h",
+            "status": "completed" if completado else "in_progress", "created_at": int(batch["inicio"]),
+            "output_file_id": batch["output_file_id"], "error_file_id": None,
+            "request_counts": {"completed": batch.get("total", 0), "failed": 0, "total": batch.get("total", 0)},
+        }
+
+    # --- Servidor HTTP -------------------------------------------------------
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _enviar(self, estado, objeto=None, crudo=None, cabeceras=None):
+                cuerpo = crudo if crudo is not None else json.dumps(objeto, ensure_ascii=False).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json" if crudo is None else "application/octet-stream")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                # El SDK espera este tiempo entre consultas de runs.create_and_poll
+                self.send_header("openai-poll-after-ms", "50")
+                for nombre, valor in (cabeceras or {}).items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def _atender(self, metodo):
+                ruta = self.path.split("?", 1)[0]
+                if ruta.startswith("/v1"):
+                    ruta = ruta[len("/v1"):]
+                longitud = int(self.headers.get("Content-Length") or 0)
+                cuerpo = self.rfile.read(longitud) if longitud else b""
+                clave = f"{metodo} {re.sub(r'/[a-z_]+-[0-9]+', '/{id}', ruta)}"
+                with servidor._lock:
+                    servidor.peticiones[clave] = servidor.peticiones.get(clave, 0) + 1
+
+                espera, cabeceras = servidor._limitar(cuerpo)
+                if espera > 0:
+                    cabeceras["retry-after"] = f"{espera:.2f}"
+                    return self._enviar(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                                        "code": "rate_limit_exceeded"}}, cabeceras=cabeceras)
+                if servidor.latency > 0:
+                    time.sleep(servidor.latency)
+                try:
+                    respuesta = self._ruta(metodo, ruta, cuerpo)
+                except KeyError:
+                    return self._enviar(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                if isinstance(respuesta, bytes):
+                    return self._enviar(200, crudo=respuesta, cabeceras=cabeceras)
+                self._enviar(200, respuesta, cabeceras=cabeceras)
+
+            def _ruta(self, metodo, ruta, cuerpo):
+                s = servidor
+                if metodo == "POST" and ruta == "/chat/completions":
+                    return s.completion(json.loads(cuerpo))
+                if metodo == "POST" and ruta == "/files":
+                    file_id = s._nuevo_id("file")
+                    s.files[file_id] = _multipart_file(cuerpo, self.headers.get("Content-Type", ""))
+                    return {"id": file_id, "object": "file", "bytes": len(s.files[file_id]),
+                            "created_at": int(time.time()), "filename": "upload", "purpose": "assistants",
+                            "status": "processed"}
+                match = re.match(r"^/files/([^/]+)(/content)?$", ruta)
+                if match:
+                    if metodo == "DELETE":
+                        s.files.pop(match.group(1), None)
+                        return {"id": match.group(1), "object": "file", "deleted": True}
+                    if match.group(2):
+                        return s.files[match.group(1)]
+                if metodo == "POST" and ruta == "/assistants":
+                    return {"id": s._nuevo_id("asst"), "object": "assistant", "created_at": int(time.time()),
+                            "model": json.loads(cuerpo).get("model"), "tools": [], "metadata": {}}
+                match = re.match(r"^/assistants/([^/]+)$", ruta)
+                if match and metodo == "DELETE":
+                    return {"id": match.group(1), "object": "assistant.deleted", "deleted": True}
+                if metodo == "POST" and ruta == "/threads":
+                    return {"id": s._nuevo_id("thread"), "object": "thread", "created_at": int(time.time()),
+                            "metadata": {}}
+                match = re.match(r"^/threads/([^/]+)/runs(?:/([^/]+))?$", ruta)
+                if match:
+                    if metodo == "POST" and match.group(2) is None:
+                        run_id = s._nuevo_id("run")
+                        s.runs[run_id] = {"inicio": time.time(), "assistant_id": json.loads(cuerpo).get("assistant_id")}
+                        return s._run(match.group(1), run_id)
+                    return s._run(match.group(1), match.group(2))
+                match = re.match(r"^/threads/([^/]+)/messages$", ruta)
+                if match:
+                    if "after=" in self.path:
+                        # El SDK pide la página siguiente hasta recibir una vacía
+                        return {"object": "list", "data": [], "first_id": None, "last_id": None, "has_more": False}
+                    mensaje = {"id": s._nuevo_id("msg"), "object": "thread.message", "created_at": int(time.time()),
+                               "thread_id": match.group(1), "role": "assistant",
+                               "content": [{"type": "text", "text": {"value": json.dumps(s.overview, ensure_ascii=False),
+                                                                     "annotations": []}}]}
+                    return {"object": "list", "data": [mensaje], "first_id": mensaje["id"],
+                            "last_id": mensaje["id"], "has_more": False}
+                if metodo == "POST" and ruta == "/batches":
+                    batch_id = s._nuevo_id("batch")
+                    s.batches[batch_id] = {"inicio": time.time(), "input_file_id": json.loads(cuerpo)["input_file_id"],
+                                           "output_file_id": None}
+                    return s._batch(batch_id)
+                match = re.match(r"^/batches/([^/]+)$", ruta)
+                if match:
+                    return s._batch(match.group(1))
+                raise KeyError(ruta)
+
+            def do_GET(self):
+                self._atender("GET")
+
+            def do_POST(self):
+                self._atender("POST")
+
+            def do_DELETE(self):
+                self._atender("DELETE")
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Servidor OpenAI simulado en {self.base_url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
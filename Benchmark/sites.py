@@ -0,0 +1,221 @@
+import os
+import re
+import base64
+import time
+import zlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Banner de cookies que se inyecta en todas las páginas; PDFGenerator.accept_cookies busca el botón "Aceptar"
+COOKIE_BANNER = """
+<div id="cookie-banner" style="position:fixed;bottom:0;left:0;right:0;padding:24px;background:#222;color:#fff">
+  Usamos cookies para mejorar tu experiencia.
+  <button onclick="document.getElementById('cookie-banner').remove()">Aceptar</button>
+</div>
+"""
+
+# Página sintética de una oferta cuando no hay instantáneas grabadas
+SYNTHETIC_PAGE = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Tarifa {nombre} - Comercializadora {sitio}</title>
+<link rel="stylesheet" href="/assets/estilo.css"><script src="/assets/analitica.js"></script></head>
+<body>
+<nav>Inicio | Luz | Gas | Autoconsumo | Atención al cliente | Área clientes</nav>
+<h1>Tarifa {nombre}</h1>
+<img src="/assets/banner.png" alt="banner" width="1200" height="300">
+<p>Una tarifa de precio fijo para tu hogar, sin sorpresas en la factura.</p>
+<h2>Precios</h2>
+<table>
+  <tr><th>Concepto</th><th>Precio</th></tr>
+  <tr><td>Término de energía P1 (punta)</td><td>{te1} €/kWh</td></tr>
+  <tr><td>Término de energía P2 (llano)</td><td>{te2} €/kWh</td></tr>
+  <tr><td>Término de energía P3 (valle)</td><td>{te3} €/kWh</td></tr>
+  <tr><td>Término de potencia P1</td><td>{tp1} €/kW día</td></tr>
+  <tr><td>Término de potencia P2</td><td>{tp2} €/kW día</td></tr>
+</table>
+<div id="detalle"></div>
+<p>Descuento del {descuento}% en el término de energía durante el primer año. Sin permanencia.</p>
+<footer>Aviso legal | Política de privacidad | Política de cookies | Mapa web</footer>
+<script>
+  // Contenido que llega tarde, como en las webs reales (comprueba las esperas de disponibilidad)
+  setTimeout(function () {{
+    document.getElementById("detalle").innerHTML = "<p>Precios con impuestos no incluidos. Calendario ATR.</p>";
+  }}, {retraso_js});
+</script>
+</body>
+</html>
+"""
+
+# Recursos estáticos referenciados por las páginas sintéticas
+ASSETS = {
+    "/assets/estilo.css": ("text/css", b"body{font-family:sans-serif}table{border-collapse:collapse}td{padding:4px}"),
+    "/assets/analitica.js": ("application/javascript", b"window.analitica = true;"),
+    # PNG de 1x1 píxeles
+    "/assets/banner.png": ("image/png", base64.b64decode(
+        "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")),
+}
+
+
+def _semilla(texto: str) -> int:
+    """Semilla estable para que las páginas y las latencias sean reproducibles."""
+    return zlib.crc32(texto.encode("utf-8"))
+
+
+class SiteFixtureServer:
+    """
+    Servidor HTTP local que sirve las páginas de las comercializadoras para las pruebas de rendimiento,
+    sin salir a Internet.
+
+    Sirve las instantáneas grabadas con record_snapshots (snapshots_folder/*.html) o, si no hay,
+    páginas sintéticas con la misma estructura (títulos, tabla de precios, contenido que llega
+    tarde, imágenes, CSS y JS). Cada URL de urls(n) apunta a un subdominio de localhost distinto
+    (s0.localhost, s1.localhost...), que Chromium resuelve a 127.0.0.1, para que el límite de
+    páginas por dominio de PDFGenerator actúe como con las webs reales.
+    """
+
+    def __init__(self, snapshots_folder: str = None, latency: float = 0.0, jitter: float = 0.0,
+                 cookie_banner: bool = True, domains: int = 12, js_delay_ms: int = 300, port: int = 0):
+        """
+        :param snapshots_folder: Carpeta con instantáneas HTML grabadas (None para páginas sintéticas)
+        :param latency: Segundos de espera antes de responder cada página
+        :param jitter: Variación máxima (en segundos) sobre latency, reproducible para cada ruta
+        :param cookie_banner: Inyectar un banner de cookies con el botón "Aceptar"
+        :param domains: Número de subdominios distintos entre los que se reparten las URLs
+        :param js_delay_ms: Retraso del contenido que se añade por JavaScript en las páginas sintéticas
+        :param port: Puerto de escucha (0 = uno libre)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.cookie_banner = cookie_banner
+        self.domains = max(1, domains)
+        self.js_delay_ms = js_delay_ms
+        self.snapshots = []
+        if snapshots_folder and os.path.isdir(snapshots_folder):
+            for archivo in sorted(os.listdir(snapshots_folder)):
+                if archivo.endswith(".html"):
+                    with open(os.path.join(snapshots_folder, archivo), "r", encoding="utf-8") as file:
+                        self.snapshots.append(file.read())
+        self.peticiones = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def urls(self, n: int):
+        """URLs de n páginas repartidas entre los subdominios."""
+        return [f"http://s{i % self.domains}.localhost:{self.port}/oferta/{i}" for i in range(n)]
+
+    def page(self, indice: int) -> str:
+        """HTML de la página indice (instantánea o sintética), con el banner de cookies si procede."""
+        if self.snapshots:
+            html = self.snapshots[indice % len(self.snapshots)]
+        else:
+            aleatorio = _semilla(str(indice))
+            html = SYNTHETIC_PAGE.format(
+                nombre=f"Plan {indice}", sitio=indice % self.domains,
+                te1=f"{0.10 + aleatorio % 100 / 1000:.4f}".replace(".", ","),
+                te2=f"{0.09 + aleatorio % 70 / 1000:.4f}".replace(".", ","),
+                te3=f"{0.07 + aleatorio % 50 / 1000:.4f}".replace(".", ","),
+                tp1=f"{0.08 + aleatorio % 30 / 1000:.4f}".replace(".", ","),
+                tp2=f"{0.01 + aleatorio % 20 / 1000:.4f}".replace(".", ","),
+                descuento=aleatorio % 20, retraso_js=self.js_delay_ms)
+        if self.cookie_banner:
+            html = re.sub(r"</body>", COOKIE_BANNER + "</body>", html, count=1, flags=re.IGNORECASE)
+        return html
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, tipo, cuerpo):
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def do_GET(self):
+                servidor.peticiones += 1
+                ruta = self.path.split("?", 1)[0]
+                if ruta in ASSETS:
+                    return self._responder(*ASSETS[ruta])
+                match = re.match(r"^/oferta/(\d+)$", ruta)
+                if match is None:
+                    self.send_error(404)
+                    return
+                espera = servidor.latency
+                if servidor.jitter:
+                    espera += (_semilla(ruta) % 1000) / 1000 * servidor.jitter
+                if espera > 0:
+                    time.sleep(espera)
+                self._responder("text/html; charset=utf-8", servidor.page(int(match.group(1))).encode("utf-8"))
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Servidor de páginas de prueba en el puerto {self.port}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Elimina scripts y recursos externos para que la instantánea se pueda servir sin conexión
+STRIP_EXTERNAL_SCRIPT = """
+() => {
+    document.querySelectorAll("script, iframe, noscript, link[rel=preload], link[rel=prefetch]").forEach(e => e.remove());
+    document.querySelectorAll("img, source, video, audio").forEach(e => {
+        e.removeAttribute("src");
+        e.removeAttribute("srcset");
+    });
+    document.querySelectorAll("link[rel=stylesheet]").forEach(e => e.remove());
+}
+"""
+
+
+async def record_snapshots(websites_file: str, snapshots_folder: str):
+    """
+    Graba una instantánea HTML de cada URL de websites_file, ya renderizada y sin scripts ni
+    recursos externos, para servirla después con SiteFixtureServer sin conexión.
+    """
+    from playwright.async_api import async_playwright
+
+    os.makedirs(snapshots_folder, exist_ok=True)
+    with open(websites_file, "r") as file:
+        websites = [line.split()[0] for line in file if line.strip()]
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            for i, url in enumerate(websites):
+                page = await browser.new_page()
+                try:
+                    await page.goto(url, wait_until="networkidle", timeout=60000)
+                    await page.evaluate(STRIP_EXTERNAL_SCRIPT)
+                    ruta = os.path.join(snapshots_folder, f"{i:03d}.html")
+                    with open(ruta, "w", encoding="utf-8") as file:
+                        file.write(await page.content())
+                    logger.info(f"Instantánea de {url} guardada en {ruta}")
+                except Exception as e:
+                    logger.error(f"No se pudo grabar {url}: {e}")
+                finally:
+                    await page.close()
+        finally:
+            await browser.close()
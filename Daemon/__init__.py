@@ -0,0 +1,323 @@
+import os
+import re
+import json
+import time
+import zlib
+import signal
+import asyncio
+import logging
+from datetime import datetime
+from playwright.async_api import async_playwright
+from Pipeline import Pipeline
+
+# Configurar el logger reutilizando la configuración del main
+logger = logging.getLogger(__name__)
+
+# Unidades admitidas en los intervalos de refresco ("90", "30m", "6h", "1d")
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(texto: str) -> float:
+    """Convierte un intervalo como "45s", "30m", "6h" o "1d" (sin unidad, segundos) a segundos."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhd]?)", str(texto).strip().lower())
+    if match is None:
+        raise ValueError(f"Intervalo no válido: {texto}")
+    return float(match.group(1)) * INTERVAL_UNITS[match.group(2) or "s"]
+
+
+def load_schedule(websites_file: str, default_interval: float) -> dict:
+    """
+    Lee websites.txt con un intervalo de refresco opcional por URL en la segunda columna
+    (p. ej. "https://www.endesa.com/... 6h"). Las URLs sin intervalo usan default_interval.
+    :return: Diccionario URL -> intervalo en segundos
+    """
+    programa = {}
+    with open(websites_file, "r") as file:
+        for line in file:
+            partes = line.split()
+            if not partes:
+                continue
+            intervalo = default_interval
+            if len(partes) > 1:
+                try:
+                    intervalo = parse_interval(partes[1])
+                except ValueError as e:
+                    logger.warning(f"{e} para {partes[0]}; se usa el intervalo por defecto")
+            programa[partes[0]] = max(1.0, intervalo)
+    return programa
+
+
+class MonitorDaemon:
+    """
+    Monitorización continua de las tarifas: mantiene un navegador headless y el cliente HTTP de
+    OpenAI abiertos entre comprobaciones y vuelve a renderizar y extraer cada URL cuando vence su
+    intervalo de refresco. Cada resultado se guarda en cuanto llega (on_result).
+
+    Las comprobaciones se reparten en el tiempo: cada URL tiene una fase estable dentro de
+    spread_seconds, de modo que al arrancar (o tras una parada larga) no se lanzan todas a la vez.
+    El navegador se recicla cada recycle_pages renderizados o recycle_seconds segundos, tras esperar
+    a los renderizados en curso, para que la memoria de Chromium no crezca sin límite. La hora de la
+    última comprobación de cada URL se guarda en state_path, así que al reiniciar el daemon se
+    respetan los intervalos.
+
+    SIGINT/SIGTERM (Ctrl+C) detienen el daemon de forma ordenada: no se inician comprobaciones
+    nuevas, se terminan los renderizados y extracciones en curso y se guarda el estado. Una segunda
+    señal cancela los renderizados pendientes.
+
+    Una URL solo cuenta como comprobada cuando su extracción termina bien; si falla el renderizado
+    o la extracción, se reintenta tras retry_seconds.
+    """
+
+    def __init__(self, pdf_generator, parser, on_result=None, refresh_interval=86400.0, spread_seconds=600.0,
+                 retry_seconds=900.0, extraction_workers=4, queue_size=8, recycle_pages=200,
+                 recycle_seconds=3600.0, state_path=None, on_report=None, report_interval=900.0, metrics=None):
+        """
+        :param pdf_generator: Instancia de PDFGenerator (su concurrency fija los renderizados simultáneos)
+        :param parser: Instancia de OpenAIPDFExtractor.PDFParser
+        :param on_result: Función (ruta del documento, overview) llamada con cada resultado en cuanto llega
+        :param refresh_interval: Intervalo por defecto entre comprobaciones de una URL (segundos)
+        :param spread_seconds: Ventana en la que se reparten las comprobaciones vencidas
+        :param retry_seconds: Espera máxima antes de reintentar una URL cuyo renderizado o extracción ha fallado
+        :param extraction_workers: Número de extracciones simultáneas
+        :param queue_size: Tamaño máximo de la cola entre renderizado y extracción
+        :param recycle_pages: Renderizados tras los que se reinicia el navegador (0 = sin límite)
+        :param recycle_seconds: Segundos tras los que se reinicia el navegador (0 = sin límite)
+        :param state_path: Archivo JSON con la última comprobación de cada URL (None = sin persistencia)
+        :param on_report: Función llamada cada report_interval segundos y al terminar (p. ej. guardar métricas)
+        :param report_interval: Segundos entre informes
+        :param metrics: Metrics.RunMetrics; tras cada informe se vacían sus tramos para acotar la memoria
+        """
+        self.pdf_generator = pdf_generator
+        self.parser = parser
+        self.on_result = on_result
+        self.refresh_interval = refresh_interval
+        self.spread_seconds = max(0.0, spread_seconds)
+        self.retry_seconds = retry_seconds
+        self.pipeline = Pipeline(pdf_generator, parser, extraction_workers=extraction_workers,
+                                 queue_size=queue_size, on_result=on_result, on_done=self._extraction_done)
+        self.recycle_pages = recycle_pages
+        self.recycle_seconds = recycle_seconds
+        self.state_path = state_path
+        self.on_report = on_report
+        self.report_interval = report_interval
+        self.metrics = metrics
+
+        self.programa = {}  # URL -> intervalo
+        self.proximas = {}  # URL -> hora de la próxima comprobación
+        self.ultimas = self._load_state()  # URL -> hora de la última comprobación correcta
+        self._mtime_programa = None
+        self._parar = None
+        self._en_curso = set()
+        self._renders_navegador = 0
+        self._navegador_desde = 0.0
+        self.renderizados = 0
+        self.extraidos = 0
+        self.errores = 0
+
+    def _load_state(self) -> dict:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                return json.load(file).get("ultimas", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer el estado del daemon {self.state_path}: {e}")
+            return {}
+
+    def save_state(self):
+        """Guarda la última comprobación de cada URL (escritura atómica)."""
+        if not self.state_path:
+            return
+        carpeta = os.path.dirname(self.state_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = f"{self.state_path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as file:
+            json.dump({"ultimas": self.ultimas}, file, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.state_path)
+
+    def _fase(self, url: str) -> float:
+        """Desfase estable (0-1) de la URL para repartir las comprobaciones."""
+        return zlib.crc32(url.encode("utf-8")) % 10000 / 10000
+
+    def _plan(self, ahora: float):
+        """
+        Relee websites.txt si ha cambiado y programa las URLs nuevas: a su hora si se comprobaron
+        hace menos de su intervalo y, si no, repartidas en spread_seconds.
+        """
+        try:
+            mtime = os.path.getmtime(self.pdf_generator.websites_file)
+        except OSError as e:
+            logger.error(f"No se pudo leer {self.pdf_generator.websites_file}: {e}")
+            return
+        if mtime == self._mtime_programa:
+            return
+        self._mtime_programa = mtime
+        self.programa = load_schedule(self.pdf_generator.websites_file, self.refresh_interval)
+        for url in list(self.proximas):
+            if url not in self.programa:
+                del self.proximas[url]
+        nuevas = 0
+        for url, intervalo in self.programa.items():
+            if url in self.proximas:
+                continue
+            proxima = self.ultimas.get(url, 0.0) + intervalo
+            if proxima <= ahora:
+                proxima = ahora + self._fase(url) * min(intervalo, self.spread_seconds)
+            self.proximas[url] = proxima
+            nuevas += 1
+        logger.info(f"{len(self.programa)} URLs monitorizadas ({nuevas} programadas de nuevo)")
+
+    def stop(self):
+        """Pide la parada ordenada; si ya se había pedido, cancela los renderizados en curso."""
+        if self._parar is None:
+            return
+        if self._parar.is_set():
+            logger.warning("Segunda señal de parada: cancelando los renderizados en curso")
+            for tarea in self._en_curso:
+                tarea.cancel()
+            return
+        logger.info("Parada solicitada: terminando los renderizados y extracciones en curso")
+        self._parar.set()
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows no admite add_signal_handler
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(self.stop))
+
+    async def _launch_browser(self, p):
+        browser = await p.chromium.launch(headless=True)
+        self._renders_navegador = 0
+        self._navegador_desde = time.time()
+        return browser
+
+    def _needs_recycle(self) -> bool:
+        if self.recycle_pages and self._renders_navegador >= self.recycle_pages:
+            return True
+        return bool(self.recycle_seconds) and time.time() - self._navegador_desde >= self.recycle_seconds
+
+    async def _recycle_browser(self, p, browser):
+        """Espera a los renderizados en curso y reinicia el navegador."""
+        if self._en_curso:
+            await asyncio.wait(self._en_curso)
+        logger.info(f"Reciclando el navegador tras {self._renders_navegador} renderizados "
+                    f"y {time.time() - self._navegador_desde:.0f} s")
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.warning(f"No se pudo cerrar el navegador: {e}")
+        return await self._launch_browser(p)
+
+    def _reschedule(self, url, inicio, correcta):
+        intervalo = self.programa.get(url, self.refresh_interval)
+        if correcta:
+            self.ultimas[url] = inicio
+        else:
+            # Reintento antes del siguiente intervalo, sin insistir más de lo que tocaría
+            intervalo = min(intervalo, self.retry_seconds)
+        if url in self.proximas:
+            self.proximas[url] = inicio + intervalo
+
+    async def _render(self, url, browser, semaforo, cola):
+        inicio = time.time()
+        # Nombre de archivo con la hora de esta comprobación, no la del arranque del daemon
+        self.pdf_generator.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        try:
+            resultado = await self.pdf_generator.generate_pdf_limited(url, browser, semaforo)
+        except Exception as e:
+            logger.error(f"Error al renderizar {url}: {e}")
+            resultado = {"pdf": None, "captura": None}
+        self._renders_navegador += 1
+        if resultado["pdf"] or resultado["captura"]:
+            self.renderizados += 1
+            # La URL sigue sin programar hasta que termine su extracción (_extraction_done)
+            await cola.put({**resultado, "url": url, "inicio": inicio})
+        else:
+            self.errores += 1
+            self._reschedule(url, inicio, correcta=False)
+
+    def _extraction_done(self, item, error):
+        if error is None:
+            self.extraidos += 1
+        else:
+            self.errores += 1
+        self._reschedule(item["url"], item["inicio"], correcta=error is None)
+
+    def _dispatch(self, url, browser, semaforo, cola):
+        # Mientras se comprueba, la URL no vuelve a estar vencida
+        self.proximas[url] = float("inf")
+        tarea = asyncio.create_task(self._render(url, browser, semaforo, cola))
+        self._en_curso.add(tarea)
+        tarea.add_done_callback(self._en_curso.discard)
+
+    def _report(self):
+        logger.info(f"Daemon: {self.renderizados} renderizados, {self.extraidos} extraídos, {self.errores} errores, "
+                    f"{len(self._en_curso)} en curso")
+        if self.on_report is not None:
+            try:
+                self.on_report()
+            except Exception as e:
+                logger.error(f"Error en el informe periódico: {e}")
+        if self.metrics is not None:
+            self.metrics.reset()
+        self.save_state()
+
+    async def run(self):
+        """Comprueba las URLs según su intervalo hasta recibir una señal de parada."""
+        self._parar = asyncio.Event()
+        self._install_signal_handlers()
+        parada = asyncio.create_task(self._parar.wait())
+        cola = asyncio.Queue(maxsize=self.pipeline.queue_size)
+        workers = [asyncio.create_task(self.pipeline.extraction_worker(cola, i + 1))
+                   for i in range(self.pipeline.extraction_workers)]
+        semaforo = asyncio.Semaphore(self.pdf_generator.concurrency)
+        proximo_informe = time.time() + self.report_interval
+        logger.info(f"Daemon iniciado: intervalo por defecto {self.refresh_interval:.0f} s, "
+                    f"{self.pdf_generator.concurrency} renderizados simultáneos")
+
+        try:
+            async with async_playwright() as p:
+                browser = await self._launch_browser(p)
+                try:
+                    while not self._parar.is_set():
+                        ahora = time.time()
+                        self._plan(ahora)
+                        if ahora >= proximo_informe:
+                            self._report()
+                            proximo_informe = ahora + self.report_interval
+                        if self._needs_recycle():
+                            browser = await self._recycle_browser(p, browser)
+                            continue
+
+                        # Solo se lanzan tantas comprobaciones como renderizados simultáneos admite el pool
+                        vencidas = sorted((proxima, url) for url, proxima in self.proximas.items() if proxima <= ahora)
+                        for _, url in vencidas[:max(0, self.pdf_generator.concurrency - len(self._en_curso))]:
+                            self._dispatch(url, browser, semaforo, cola)
+
+                        # Esperar a la próxima URL vencida, a que acabe un renderizado o a la parada;
+                        # como mucho un minuto, para detectar cambios en websites.txt. Con el pool lleno
+                        # las URLs vencidas no se pueden lanzar: solo se espera a que se libere un hueco
+                        if len(self._en_curso) >= self.pdf_generator.concurrency:
+                            siguiente = ahora + 60
+                        else:
+                            siguiente = min(self.proximas.values(), default=ahora + 60)
+                        espera = min(max(0.0, siguiente - time.time()), max(0.0, proximo_informe - time.time()), 60.0)
+                        await asyncio.wait({parada, *self._en_curso}, timeout=espera,
+                                           return_when=asyncio.FIRST_COMPLETED)
+
+                    if self._en_curso:
+                        await asyncio.wait(self._en_curso)
+                finally:
+                    await browser.close()
+        finally:
+            parada.cancel()
+            for _ in workers:
+                await cola.put(None)
+            await asyncio.gather(*workers)
+            await self.parser.aclose()
+            self._report()
+            logger.info("Daemon detenido")
@@ -0,0 +1,333 @@
+import os
+import time
+import socket
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from playwright.async_api import async_playwright
+
+# Configurar el logger reutilizando la configuración del main
+logger = logging.getLogger(__name__)
+
+# Estados de cada etapa: (estado de entrada, estado mientras se procesa, estado de salida)
+STAGES = {
+    "render": ("pending", "rendering", "rendered"),
+    "extract": ("rendered", "extracting", "extracted"),
+}
+FAILED = "failed"
+
+
+class LeaseLost(Exception):
+    """El arrendamiento del trabajo caducó y lo tomó otro worker."""
+
+class JobQueue:
+    """
+    Cola de trabajos persistente en SQLite con el estado de cada URL y documento de una ejecución:
+    pending → rendering → rendered → extracting → extracted, o failed tras max_attempts intentos
+    fallidos en una etapa.
+
+    Los workers toman trabajos con un arrendamiento (lease) de lease_seconds segundos; si un worker
+    se cae, su trabajo vuelve a estar disponible al caducar el arrendamiento. Varios procesos, incluso
+    en máquinas distintas, pueden compartir la misma base de datos: se usa el journal clásico de
+    SQLite (no WAL), que funciona en discos compartidos con bloqueo de archivos.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 900, max_attempts: int = 3):
+        """
+        :param db_path: Ruta del archivo SQLite (se crea si no existe)
+        :param lease_seconds: Duración del arrendamiento de un trabajo
+        :param max_attempts: Intentos por etapa antes de marcar el trabajo como fallido
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        carpeta = os.path.dirname(db_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._lock = threading.Lock()
+        # Transacciones explícitas (BEGIN IMMEDIATE) para que el arrendamiento sea atómico entre procesos
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ejecucion TEXT NOT NULL,
+                url TEXT,
+                documento TEXT,
+                estado TEXT NOT NULL,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                worker TEXT,
+                lease_hasta REAL,
+                actualizado TEXT,
+                UNIQUE (ejecucion, url)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (ejecucion, estado)")
+
+    def _transaccion(self, fn):
+        """Ejecuta fn(conn) en una transacción de escritura exclusiva."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = fn(self.conn)
+                self.conn.execute("COMMIT")
+                return resultado
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _ahora():
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def enqueue_urls(self, ejecucion: str, urls) -> int:
+        """
+        Añade las URLs a la ejecución; las que ya existen conservan su estado (reanudación).
+        :return: Número de URLs nuevas
+        """
+        filas = [(ejecucion, url, "pending", self._ahora()) for url in urls]
+        return self._transaccion(lambda conn: conn.executemany(
+            "INSERT OR IGNORE INTO trabajos (ejecucion, url, estado, actualizado) VALUES (?, ?, ?, ?)", filas
+        ).rowcount)
+
+    def enqueue_documents(self, ejecucion: str, paths) -> int:
+        """
+        Añade documentos ya renderizados (sin URL) pendientes de extraer, salvo los que ya tienen trabajo
+        en esta ejecución. Los documentos que quedaron sin procesar en ejecuciones anteriores se
+        vuelven a añadir.
+        :return: Número de documentos nuevos
+        """
+        def insertar(conn):
+            nuevos = 0
+            for path in paths:
+                path = os.path.normpath(path)
+                if conn.execute("SELECT 1 FROM trabajos WHERE ejecucion = ? AND documento = ?",
+                                (ejecucion, path)).fetchone() is None:
+                    conn.execute("INSERT INTO trabajos (ejecucion, documento, estado, actualizado) VALUES (?, ?, ?, ?)",
+                                 (ejecucion, path, STAGES["extract"][0], self._ahora()))
+                    nuevos += 1
+            return nuevos
+        return self._transaccion(insertar)
+
+    def lease(self, ejecucion: str, etapa: str, worker: str):
+        """
+        Toma el siguiente trabajo disponible de la etapa: uno en el estado de entrada o uno en proceso
+        cuyo arrendamiento ha caducado. Un arrendamiento caducado cuenta como intento fallido (el
+        worker se cayó o se colgó con ese trabajo), así que un trabajo que tumba siempre al worker
+        acaba en failed.
+        :return: Diccionario con el trabajo o None si no hay ninguno disponible
+        """
+        entrada, en_proceso, _ = STAGES[etapa]
+
+        def tomar(conn):
+            ahora = time.time()
+            while True:
+                fila = conn.execute(
+                    "SELECT * FROM trabajos WHERE ejecucion = ? AND (estado = ? OR (estado = ? AND lease_hasta < ?)) "
+                    "ORDER BY id LIMIT 1", (ejecucion, entrada, en_proceso, ahora)
+                ).fetchone()
+                if fila is None:
+                    return None
+                intentos = fila["intentos"]
+                if fila["estado"] == en_proceso:
+                    intentos += 1
+                    if intentos >= self.max_attempts:
+                        conn.execute("UPDATE trabajos SET estado = ?, intentos = ?, error = ?, worker = NULL, "
+                                     "lease_hasta = NULL, actualizado = ? WHERE id = ?",
+                                     (FAILED, intentos, f"Arrendamiento caducado (worker {fila['worker']})",
+                                      self._ahora(), fila["id"]))
+                        continue
+                conn.execute("UPDATE trabajos SET estado = ?, intentos = ?, worker = ?, lease_hasta = ?, actualizado = ? "
+                             "WHERE id = ?",
+                             (en_proceso, intentos, worker, ahora + self.lease_seconds, self._ahora(), fila["id"]))
+                return {**dict(fila), "intentos": intentos}
+        return self._transaccion(tomar)
+
+    def renew(self, job_id: int, etapa: str, worker: str) -> bool:
+        """
+        Prolonga el arrendamiento si el worker todavía lo tiene. Se comprueba antes de efectos que no
+        se pueden repetir (guardar el resultado, mover el documento).
+        :return: False si el arrendamiento caducó y el trabajo lo tiene otro worker (o ya está terminado)
+        """
+        en_proceso = STAGES[etapa][1]
+        return self._transaccion(lambda conn: conn.execute(
+            "UPDATE trabajos SET lease_hasta = ?, actualizado = ? WHERE id = ? AND estado = ? AND worker = ?",
+            (time.time() + self.lease_seconds, self._ahora(), job_id, en_proceso, worker)).rowcount == 1)
+
+    def complete(self, job_id: int, etapa: str, worker: str, documento: str = None) -> bool:
+        """
+        Marca la etapa del trabajo como terminada y reinicia los intentos para la siguiente.
+        :return: False si el worker ya no tenía el arrendamiento (el trabajo no se modifica)
+        """
+        en_proceso, salida = STAGES[etapa][1:]
+        return self._transaccion(lambda conn: conn.execute(
+            "UPDATE trabajos SET estado = ?, documento = COALESCE(?, documento), intentos = 0, error = NULL, "
+            "worker = NULL, lease_hasta = NULL, actualizado = ? WHERE id = ? AND estado = ? AND worker = ?",
+            (salida, os.path.normpath(documento) if documento else None, self._ahora(), job_id, en_proceso, worker)
+        ).rowcount == 1)
+
+    def fail(self, job_id: int, etapa: str, worker: str, error: str):
+        """
+        Registra un intento fallido: el trabajo vuelve al estado de entrada de la etapa, o pasa a
+        failed al agotar max_attempts.
+        :return: Nuevo estado del trabajo, o None si el worker ya no tenía el arrendamiento
+        """
+        entrada, en_proceso, _ = STAGES[etapa]
+
+        def fallar(conn):
+            fila = conn.execute("SELECT intentos FROM trabajos WHERE id = ? AND estado = ? AND worker = ?",
+                                (job_id, en_proceso, worker)).fetchone()
+            if fila is None:
+                return None
+            intentos = fila[0] + 1
+            estado = FAILED if intentos >= self.max_attempts else entrada
+            conn.execute("UPDATE trabajos SET estado = ?, intentos = ?, error = ?, worker = NULL, lease_hasta = NULL, "
+                         "actualizado = ? WHERE id = ?", (estado, intentos, str(error), self._ahora(), job_id))
+            return estado
+        return self._transaccion(fallar)
+
+    def remaining(self, ejecucion: str, etapa: str) -> int:
+        """
+        Trabajos que todavía pueden llegar a la etapa (disponibles, en proceso o en etapas anteriores).
+        """
+        estados = ["pending", "rendering"] if etapa == "render" else ["pending", "rendering", "rendered", "extracting"]
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM trabajos WHERE ejecucion = ? AND estado IN ({', '.join('?' for _ in estados)})",
+                [ejecucion] + estados).fetchone()[0]
+
+    def summary(self, ejecucion: str) -> dict:
+        """Número de trabajos de la ejecución por estado."""
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT estado, COUNT(*) FROM trabajos WHERE ejecucion = ? GROUP BY estado", (ejecucion,)).fetchall())
+
+    def failures(self, ejecucion: str):
+        """Trabajos fallidos de la ejecución, con su último error."""
+        with self._lock:
+            return [dict(fila) for fila in self.conn.execute(
+                "SELECT * FROM trabajos WHERE ejecucion = ? AND estado = ? ORDER BY id", (ejecucion, FAILED))]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class QueueWorker:
+    """
+    Worker de la cola: renderiza y/o extrae los trabajos de una ejecución hasta que no queda
+    nada pendiente. Se pueden lanzar tantos workers como se quiera (procesos o máquinas) sobre
+    la misma base de datos; cada trabajo lo procesa uno solo gracias al arrendamiento.
+    """
+
+    def __init__(self, jobs: JobQueue, ejecucion: str, pdf_generator=None, parser=None, on_result=None,
+                 extraction_workers=4, poll_interval=5.0, worker_id=None):
+        """
+        :param jobs: Instancia de JobQueue
+        :param ejecucion: Identificador de la ejecución (p. ej. la fecha); reutilizarlo reanuda la ejecución
+        :param pdf_generator: PDFGenerator para la etapa de renderizado (None para no renderizar);
+                              su concurrency fija los renderizados simultáneos
+        :param parser: OpenAIPDFExtractor.PDFParser para la etapa de extracción (None para no extraer)
+        :param on_result: Función (ruta del documento, overview) llamada con cada resultado
+        :param extraction_workers: Número de extracciones simultáneas
+        :param poll_interval: Segundos de espera cuando no hay trabajos disponibles pero otros workers siguen
+        :param worker_id: Identificador del worker en la base de datos (por defecto máquina-pid)
+        """
+        self.jobs = jobs
+        self.ejecucion = ejecucion
+        self.pdf_generator = pdf_generator
+        self.parser = parser
+        self.on_result = on_result
+        self.extraction_workers = max(1, extraction_workers)
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.procesados = {"render": 0, "extract": 0}
+        self.errores = {"render": 0, "extract": 0}
+
+    async def _next_job(self, etapa):
+        """Espera al siguiente trabajo de la etapa; None cuando ya no quedará ninguno."""
+        while True:
+            trabajo = await asyncio.to_thread(self.jobs.lease, self.ejecucion, etapa, self.worker_id)
+            if trabajo is not None:
+                return trabajo
+            if await asyncio.to_thread(self.jobs.remaining, self.ejecucion, etapa) == 0:
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def _process(self, etapa, trabajo, fn):
+        """Ejecuta fn sobre el trabajo y registra el resultado en la cola."""
+        nombre = trabajo["url"] or trabajo["documento"]
+        try:
+            documento = await fn(trabajo)
+            if not await asyncio.to_thread(self.jobs.complete, trabajo["id"], etapa, self.worker_id, documento):
+                raise LeaseLost()
+            self.procesados[etapa] += 1
+        except LeaseLost:
+            logger.warning(f"Arrendamiento de {etapa} de {nombre} caducado; el trabajo lo continúa otro worker")
+        except Exception as e:
+            self.errores[etapa] += 1
+            estado = await asyncio.to_thread(self.jobs.fail, trabajo["id"], etapa, self.worker_id, e)
+            if estado is None:
+                logger.warning(f"Error en {etapa} de {nombre} tras caducar su arrendamiento: {e}")
+                return
+            logger.error(f"Error en {etapa} de {nombre} (intento {trabajo['intentos'] + 1}, estado {estado}): {e}")
+
+    async def _render_loop(self, browser, semaforo):
+        async def renderizar(trabajo):
+            resultado = await self.pdf_generator.generate_pdf_limited(trabajo["url"], browser, semaforo)
+            documento = resultado["captura"] or resultado["pdf"]
+            if not documento:
+                raise Exception(resultado["error"])
+            return documento
+
+        while (trabajo := await self._next_job("render")) is not None:
+            await self._process("render", trabajo, renderizar)
+
+    async def _extract_loop(self, numero):
+        async def extraer(trabajo):
+            inicio = time.perf_counter()
+            overview = await self.parser.aparse_pdf(trabajo["documento"])
+            # Guardar el resultado solo si el trabajo sigue siendo de este worker, para no duplicarlo
+            if not await asyncio.to_thread(self.jobs.renew, trabajo["id"], "extract", self.worker_id):
+                raise LeaseLost()
+            if self.on_result is not None:
+                self.on_result(trabajo["documento"], overview)
+            logger.info(f"Worker {numero}: {trabajo['documento']} extraído en {time.perf_counter() - inicio:.1f} s")
+            return None
+
+        while (trabajo := await self._next_job("extract")) is not None:
+            await self._process("extract", trabajo, extraer)
+
+    async def run(self):
+        """
+        Procesa trabajos hasta que la ejecución no tiene nada pendiente en las etapas de este worker.
+        :return: Resumen de la ejecución por estado (ver JobQueue.summary)
+        """
+        inicio = time.perf_counter()
+        tareas = []
+        if self.parser is not None:
+            tareas += [self._extract_loop(i + 1) for i in range(self.extraction_workers)]
+        try:
+            if self.pdf_generator is not None:
+                async with async_playwright() as p:
+                    browser = await p.chromium.launch(headless=self.pdf_generator.headless)
+                    try:
+                        semaforo = asyncio.Semaphore(self.pdf_generator.concurrency)
+                        tareas += [self._render_loop(browser, semaforo) for _ in range(self.pdf_generator.concurrency)]
+                        await asyncio.gather(*tareas)
+                    finally:
+                        await browser.close()
+            else:
+                await asyncio.gather(*tareas)
+        finally:
+            if self.parser is not None:
+                await self.parser.aclose()
+
+        resumen = await asyncio.to_thread(self.jobs.summary, self.ejecucion)
+        logger.info(f"Worker {self.worker_id} terminado en {time.perf_counter() - inicio:.1f} s: "
+                    f"{self.procesados['render']} renderizados, {self.procesados['extract']} extraídos, "
+                    f"{self.errores['render'] + self.errores['extract']} errores. Estado de la ejecución: {resumen}")
+        return resumen
@@ -0,0 +1,191 @@
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Configurar el logger reutilizando la configuración del main
+logger = logging.getLogger(__name__)
+
+# Prefijo de las métricas en formato Prometheus
+PROMETHEUS_PREFIX = "scraper"
+
+
+def percentile(valores, p: float) -> float:
+    """Percentil p (0-100) por el método del rango más cercano."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def _resumen(duraciones, errores: int) -> dict:
+    return {
+        "n": len(duraciones),
+        "errores": errores,
+        "p50": percentile(duraciones, 50),
+        "p95": percentile(duraciones, 95),
+        "max": max(duraciones, default=0.0),
+        "total": sum(duraciones),
+    }
+
+
+def _etiquetas(**etiquetas) -> str:
+    """Etiquetas de una muestra Prometheus, con los valores escapados."""
+    pares = []
+    for nombre, valor in etiquetas.items():
+        if valor is None:
+            continue
+        valor = str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pares.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class RunMetrics:
+    """
+    Métricas de una ejecución: tramos de tiempo por etapa (navegación, espera, PDF, subida,
+    asistente, parse...) para cada URL o documento, contadores (tokens, bytes, reintentos) y
+    valores puntuales. Se exportan como informe JSON y, opcionalmente, en formato de texto de
+    Prometheus, con los percentiles p50/p95 por etapa y por etapa y dominio.
+    """
+
+    def __init__(self, run_id: str = None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.inicio = time.time()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.counters = {}  # (nombre, dominio) -> valor
+        self.gauges = {}
+
+    def record(self, etapa: str, clave: str, dominio: str = None, duracion: float = 0.0,
+               ok: bool = True, error: str = None):
+        """Registra un tramo ya medido."""
+        with self._lock:
+            self.spans.append({"etapa": etapa, "clave": clave, "dominio": dominio,
+                               "duracion": duracion, "ok": ok, "error": error})
+
+    @contextmanager
+    def span(self, etapa: str, clave: str, dominio: str = None):
+        """Mide el bloque como un tramo de la etapa; si lanza una excepción se registra como error."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(etapa, clave, dominio, time.perf_counter() - inicio, ok=False, error=str(e))
+            raise
+        self.record(etapa, clave, dominio, time.perf_counter() - inicio)
+
+    def count(self, nombre: str, valor: float = 1, dominio: str = None):
+        """Suma valor al contador nombre (opcionalmente por dominio)."""
+        with self._lock:
+            self.counters[(nombre, dominio)] = self.counters.get((nombre, dominio), 0) + valor
+
+    def set(self, nombre: str, valor):
+        """Guarda un valor puntual (p. ej. estadísticas del planificador al terminar)."""
+        with self._lock:
+            self.gauges[nombre] = valor
+
+    def reset(self):
+        """
+        Vacía los tramos ya informados (procesos de larga duración); los contadores se mantienen
+        acumulados, como espera Prometheus.
+        """
+        with self._lock:
+            self.spans = []
+
+    def summary(self) -> dict:
+        """Percentiles de duración por etapa y por etapa y dominio."""
+        with self._lock:
+            spans = list(self.spans)
+        por_etapa, por_dominio = {}, {}
+        for tramo in spans:
+            por_etapa.setdefault(tramo["etapa"], []).append(tramo)
+            if tramo["dominio"]:
+                por_dominio.setdefault(tramo["etapa"], {}).setdefault(tramo["dominio"], []).append(tramo)
+
+        def resumir(lista):
+            return _resumen([s["duracion"] for s in lista], sum(1 for s in lista if not s["ok"]))
+
+        return {
+            "etapas": {etapa: resumir(lista) for etapa, lista in por_etapa.items()},
+            "etapas_por_dominio": {etapa: {dominio: resumir(lista) for dominio, lista in dominios.items()}
+                                   for etapa, dominios in por_dominio.items()},
+        }
+
+    def report(self) -> dict:
+        """Informe completo de la ejecución."""
+        with self._lock:
+            contadores = [{"nombre": nombre, "dominio": dominio, "valor": valor}
+                          for (nombre, dominio), valor in sorted(self.counters.items(), key=lambda c: (c[0][0], c[0][1] or ""))]
+            valores = dict(self.gauges)
+            spans = list(self.spans)
+        return {
+            "ejecucion": self.run_id,
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+            "duracion": time.time() - self.inicio,
+            "resumen": self.summary(),
+            "contadores": contadores,
+            "valores": valores,
+            "tramos": spans,
+        }
+
+    def write_json(self, path: str):
+        """Guarda el informe de la ejecución en JSON."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+        logger.info(f"Informe de métricas guardado en {path}")
+
+    def to_prometheus(self) -> str:
+        """Métricas en formato de texto de Prometheus (p. ej. para el textfile collector de node_exporter)."""
+        resumen = self.summary()
+        lineas = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_duration_seconds Duración de cada etapa por URL o documento.",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_duration_seconds summary",
+        ]
+        grupos = [({"stage": etapa}, datos) for etapa, datos in resumen["etapas"].items()]
+        grupos += [({"stage": etapa, "domain": dominio}, datos)
+                   for etapa, dominios in resumen["etapas_por_dominio"].items() for dominio, datos in dominios.items()]
+        for etiquetas, datos in grupos:
+            for cuantil in ("0.5", "0.95"):
+                valor = datos["p50"] if cuantil == "0.5" else datos["p95"]
+                lineas.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds{_etiquetas(**etiquetas, quantile=cuantil)} {valor}")
+            lineas.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds_sum{_etiquetas(**etiquetas)} {datos['total']}")
+            lineas.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds_count{_etiquetas(**etiquetas)} {datos['n']}")
+        lineas.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_errors_total counter")
+        for etapa, datos in resumen["etapas"].items():
+            lineas.append(f"{PROMETHEUS_PREFIX}_stage_errors_total{_etiquetas(stage=etapa)} {datos['errores']}")
+
+        with self._lock:
+            contadores = sorted(self.counters.items(), key=lambda c: (c[0][0], c[0][1] or ""))
+            valores = sorted(self.gauges.items())
+        tipos_declarados = set()
+        for (nombre, dominio), valor in contadores:
+            metrica = f"{PROMETHEUS_PREFIX}_{nombre}_total"
+            if metrica not in tipos_declarados:
+                lineas.append(f"# TYPE {metrica} counter")
+                tipos_declarados.add(metrica)
+            lineas.append(f"{metrica}{_etiquetas(domain=dominio)} {valor}")
+        for nombre, valor in valores:
+            if isinstance(valor, (int, float)):
+                lineas.append(f"# TYPE {PROMETHEUS_PREFIX}_{nombre} gauge")
+                lineas.append(f"{PROMETHEUS_PREFIX}_{nombre} {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Guarda las métricas en formato de texto de Prometheus."""
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        logger.info(f"Métricas Prometheus guardadas en {path}")
+
+    def log_summary(self):
+        """Escribe en el log los percentiles por etapa."""
+        for etapa, datos in sorted(self.summary()["etapas"].items()):
+            logger.info(f"Etapa {etapa}: {datos['n']} tramos, p50 {datos['p50']:.2f} s, p95 {datos['p95']:.2f} s, "
+                        f"máx. {datos['max']:.2f} s, {datos['errores']} errores")
+
+
+def span(metrics: RunMetrics, etapa: str, clave: str, dominio: str = None):
+    """metrics.span(...) o un contexto vacío si no hay métricas."""
+    return metrics.span(etapa, clave, dominio) if metrics is not None else nullcontext()
@@ -1,9 +1,20 @@
+import os
+import json
+import time
 import openai
-from openai import OpenAI
+import asyncio
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from openai.lib._parsing._completions import type_to_response_format_param
 from pydantic import BaseModel, Field, ValidationError, Extra
 from typing import List, Literal
 import logging  # Importar logging para reutilizar el logger global configurado
 import re
+import fitz  # PyMuPDF
+from .cache import ExtractionCache, hash_file, hash_schema, hash_text
+from .scheduler import RateLimitScheduler
+from .segmentation import PricingSegmenter
+from .rules import RuleExtractor, domain_key
+from Metrics import span
 
 # Configurar el logger reutilizando la configuración del main
 logger = logging.getLogger(__name__)
@@ -40,88 +51,478 @@ class Overview(BaseModel):
     class Config:
         extra = Extra.ignore  # Ignorar claves adicionales en el JSON
 
+class DocumentoOverview(BaseModel):
+    """Precios de uno de los documentos de una llamada agrupada"""
+    id: str = Field(description="Identificador del documento, tal y como aparece en su cabecera")
+    precios: List[Precio] = Field(description=Overview.model_fields["precios"].description)
+
+class PackedOverview(BaseModel):
+    """Resultados de varios documentos extraídos en una única llamada"""
+    documentos: List[DocumentoOverview] = Field(description=(
+        "Un elemento por cada documento recibido, con su identificador. "
+        "No mezcles precios de documentos distintos."
+    ))
+
+# Instrucciones comunes a todos los modos de extracción
+INSTRUCCIONES = (
+    "Eres un asistente experto en ofertas de electricidad. "
+    "Extrae la información en el esquema JSON proporcionado."
+)
+
+INSTRUCCIONES_AGRUPADAS = (
+    "Se incluyen varios documentos, cada uno precedido de una cabecera con su identificador. "
+    "Extrae los precios de cada documento por separado y devuelve un elemento por documento."
+)
+
+# Tokens estimados (entrada + salida) para el presupuesto del planificador
+SCHEMA_TOKENS = 2000
+ASSISTANT_RUN_TOKENS = 10000
+
+def estimate_tokens(text: str) -> int:
+    """Estimación aproximada de tokens de una llamada con el texto dado (≈3 caracteres por token en español)."""
+    return len(text) // 3 + SCHEMA_TOKENS
+
+# Línea de la fecha en el texto de una captura; no forma parte del hash de caché
+CAPTURE_DATE_PREFIX = "Fecha de captura:"
+
+def is_capture(path: str) -> bool:
+    """Indica si la ruta es una captura de texto de PDFGenerator (capture="text") en lugar de un PDF."""
+    return path.lower().endswith(".json")
+
+def capture_to_text(captura: dict) -> str:
+    """
+    Convierte una captura de texto de PDFGenerator en texto plano: títulos en Markdown,
+    tablas con celdas separadas por " | " y la URL y fecha de origen en la cabecera.
+    """
+    lineas = [f"Fuente: {captura.get('url', '')}", f"{CAPTURE_DATE_PREFIX} {captura.get('fecha', '')}"]
+    if captura.get("titulo"):
+        lineas.append(f"Título: {captura['titulo']}")
+    for bloque in captura.get("bloques", []):
+        if bloque["tipo"] == "titulo":
+            lineas.append(f"{'#' * bloque.get('nivel', 1)} {bloque['texto']}")
+        elif bloque["tipo"] == "tabla":
+            lineas.extend(" | ".join(fila) for fila in bloque["filas"])
+        else:
+            lineas.append(bloque["texto"])
+    return "\n".join(lineas)
+
+ASSISTANT_INSTRUCTIONS = (
+    "You are an expert analyzing electricity offers from websites and PDFs, "
+    "as well as extracting the prices and comparing them."
+)
+
 class PDFParser:
-    def __init__(self, openai_api_key: str):
-        """Inicializa el cliente OpenAI con la clave proporcionada."""
+    def __init__(self, openai_api_key: str, mode: Literal["assistants", "text"] = "assistants",
+                 model: str = "gpt-4o-2024-08-06", min_text_chars: int = 200,
+                 cache: ExtractionCache = None, scheduler: RateLimitScheduler = None, base_url: str = None,
+                 segmenter: PricingSegmenter = None, rules: RuleExtractor = None, metrics=None):
+        """
+        Inicializa el cliente OpenAI con la clave proporcionada.
+
+        Args:
+            openai_api_key (str): Clave de la API de OpenAI.
+            mode (str): "assistants" sube el PDF y usa file_search; "text" extrae la capa de texto
+                localmente con PyMuPDF y hace una única llamada estructurada.
+            model (str): Modelo utilizado en todas las llamadas.
+            min_text_chars (int): Mínimo de caracteres de texto para usar el modo "text"; por debajo
+                se recurre al modo "assistants" (PDFs escaneados o sin capa de texto).
+            cache (ExtractionCache): Caché de resultados; un acierto evita cualquier llamada a la API.
+            scheduler (RateLimitScheduler): Planificador de límites de uso; por defecto uno propio.
+            base_url (str): URL base de la API (p. ej. un servidor local de pruebas).
+            segmenter (PricingSegmenter): Si se indica, solo se envían al modelo las regiones de
+                precios del texto. La clave de caché se sigue calculando sobre el texto completo.
+            rules (RuleExtractor): Reglas deterministas por dominio; si encajan y validan, el
+                documento se extrae sin llamar a la API.
+            metrics (Metrics.RunMetrics): Registro de tiempos por etapa (texto, subida, asistente,
+                parse) y de tokens; si no se indica planificador, el propio también lo usa.
+        """
         openai.api_key = openai_api_key
-        self.client = OpenAI()
-        logger.info("PDFParser inicializado con la API de OpenAI")
+        self.openai_api_key = openai_api_key
+        self.base_url = base_url
+        self.metrics = metrics
+        self.scheduler = scheduler or RateLimitScheduler(metrics=metrics)
+        # Los reintentos los gestiona el planificador; el hook lee las cabeceras de límites de cada respuesta
+        self.client = OpenAI(
+            api_key=openai_api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=DefaultHttpxClient(event_hooks={"response": [self.scheduler.observe_response]}),
+        )
+        self._async_client = None
+        self._assistant_lock = None
+        self.mode = mode
+        self.model = model
+        self.min_text_chars = min_text_chars
+        self.cache = cache
+        self.segmenter = segmenter
+        self.rules = rules
+        self._assistant_id = None
+        logger.info(f"PDFParser inicializado con la API de OpenAI (modo {mode}, modelo {model})")
 
-    def parse_pdf(self, pdf_url: str) -> Overview:
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Cliente asíncrono, creado la primera vez que se usa (ver aparse_pdf)."""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.openai_api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(event_hooks={"response": [self.scheduler.aobserve_response]}),
+            )
+        return self._async_client
+
+    def extract_text(self, pdf_url: str) -> str:
         """
-        Procesa un PDF a partir de su URL, extrae información y devuelve un objeto Overview.
+        Extrae localmente la capa de texto del PDF con PyMuPDF, o el texto de una captura JSON.
 
         Args:
-            pdf_url (str): URL del PDF a analizar.
+            pdf_url (str): Ruta del PDF o de la captura.
 
         Returns:
-            Overview: Objeto Overview con los datos extraídos.
+            str: Texto de todas las páginas, sin líneas vacías.
+        """
+        if is_capture(pdf_url):
+            with open(pdf_url, "r", encoding="utf-8") as file:
+                return capture_to_text(json.load(file))
+        with fitz.open(pdf_url) as documento:
+            paginas = [pagina.get_text("text") for pagina in documento]
+        lineas = (linea.strip() for pagina in paginas for linea in pagina.splitlines())
+        return "\n".join(linea for linea in lineas if linea)
 
-        Raises:
-            Exception: Si ocurre un error durante el procesamiento o la validación.
+    def _text_messages(self, text: str) -> list:
+        """Mensajes de la llamada estructurada a partir del texto de la oferta."""
+        return [
+            {"role": "system", "content": INSTRUCCIONES},
+            {"role": "user", "content": f"Contenido de la oferta:\n\n{text}"},
+        ]
+
+    def _thread_messages(self, file_id: str) -> list:
+        """Mensajes del thread del asistente con el PDF adjunto."""
+        schema_json_string = Overview.model_json_schema()
+        return [
+            {
+                "role": "user",
+                "content": INSTRUCCIONES,
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Genera un output siguiendo el esquema: {schema_json_string}."
+                ),
+                "attachments": [{"file_id": file_id, "tools": [{"type": "file_search"}]}],
+            },
+        ]
+
+    def parse_text(self, text: str) -> Overview:
         """
-        try:
-            logger.info(f"Procesando el archivo PDF: {pdf_url}")
-            
-            # Descarga el archivo PDF y súbelo a OpenAI
-            file = openai.files.create(file=open(pdf_url, "rb"), purpose='assistants')
-            logger.info(f"Archivo PDF subido a OpenAI con ID: {file.id}")
+        Extrae un Overview a partir del texto de la oferta con una única llamada estructurada.
 
-            # Configura el asistente con herramientas y prompts
-            tools = [{"type": "file_search"}]
-            assistant = self.client.beta.assistants.create(
-                name="Price extractor",
-                instructions=(
-                    "You are an expert analyzing electricity offers from websites and PDFs, "
-                    "as well as extracting the prices and comparing them."
+        Args:
+            text (str): Texto de la página de la oferta.
+
+        Returns:
+            Overview: Objeto Overview con los datos extraídos.
+        """
+        completion = self.scheduler.call(
+            lambda: self.client.beta.chat.completions.parse(
+                model=self.model,
+                messages=self._text_messages(text),
+                response_format=Overview,
+            ),
+            estimated_tokens=estimate_tokens(text),
+        )
+        return completion.choices[0].message.parsed
+
+    async def aparse_text(self, text: str) -> Overview:
+        """Versión asíncrona de parse_text."""
+        completion = await self.scheduler.acall(
+            lambda: self.async_client.beta.chat.completions.parse(
+                model=self.model,
+                messages=self._text_messages(text),
+                response_format=Overview,
+            ),
+            estimated_tokens=estimate_tokens(text),
+        )
+        return completion.choices[0].message.parsed
+
+    def _get_assistant_id(self) -> str:
+        """Crea el asistente la primera vez y lo reutiliza en las siguientes llamadas."""
+        if self._assistant_id is None:
+            assistant = self.scheduler.call(
+                lambda: self.client.beta.assistants.create(
+                    name="Price extractor",
+                    instructions=ASSISTANT_INSTRUCTIONS,
+                    model=self.model,
+                    tools=[{"type": "file_search"}]
                 ),
-                model="gpt-4o-2024-08-06",
-                tools=tools
+                estimated_tokens=0,
             )
+            self._assistant_id = assistant.id
             logger.info("Asistente OpenAI configurado correctamente.")
+        return self._assistant_id
+
+    async def _aget_assistant_id(self) -> str:
+        """Versión asíncrona de _get_assistant_id; varios workers comparten un único asistente."""
+        if self._assistant_lock is None:
+            self._assistant_lock = asyncio.Lock()
+        async with self._assistant_lock:
+            if self._assistant_id is None:
+                assistant = await self.scheduler.acall(
+                    lambda: self.async_client.beta.assistants.create(
+                        name="Price extractor",
+                        instructions=ASSISTANT_INSTRUCTIONS,
+                        model=self.model,
+                        tools=[{"type": "file_search"}]
+                    ),
+                    estimated_tokens=0,
+                )
+                self._assistant_id = assistant.id
+                logger.info("Asistente OpenAI configurado correctamente.")
+        return self._assistant_id
+
+    def close(self):
+        """Elimina el asistente creado por este parser, si existe."""
+        if self._assistant_id is not None:
+            try:
+                self.client.beta.assistants.delete(self._assistant_id)
+            except Exception as e:
+                logger.warning(f"No se pudo eliminar el asistente {self._assistant_id}: {e}")
+            self._assistant_id = None
+        self.scheduler.log_stats()
+        if self.cache is not None:
+            self.cache.log_stats()
+        if self.segmenter is not None:
+            self.segmenter.log_stats()
+            self.segmenter.save()
+        if self.rules is not None:
+            self.rules.log_stats()
+
+    async def aclose(self):
+        """Versión asíncrona de close; además cierra el cliente asíncrono."""
+        if self._assistant_id is not None:
+            try:
+                await self.async_client.beta.assistants.delete(self._assistant_id)
+            except Exception as e:
+                logger.warning(f"No se pudo eliminar el asistente {self._assistant_id}: {e}")
+            self._assistant_id = None
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        self.scheduler.log_stats()
+        if self.cache is not None:
+            self.cache.log_stats()
+        if self.segmenter is not None:
+            self.segmenter.log_stats()
+            self.segmenter.save()
+        if self.rules is not None:
+            self.rules.log_stats()
+
+    def cache_key(self, pdf_url: str, text: str) -> str:
+        """
+        Clave de caché del documento: hash del texto normalizado (o del PDF si no tiene capa de
+        texto suficiente), hash del esquema Overview y modelo.
+        """
+        if is_capture(pdf_url):
+            # La fecha de captura cambia en cada ejecución aunque la página no cambie
+            document_hash = hash_text("\n".join(
+                linea for linea in text.splitlines() if not linea.startswith(CAPTURE_DATE_PREFIX)))
+        elif len(text) >= self.min_text_chars:
+            document_hash = hash_text(text)
+        else:
+            document_hash = hash_file(pdf_url)
+        return ExtractionCache.make_key(document_hash, hash_schema(Overview.model_json_schema()), self.model)
+
+    def _prepare(self, pdf_url: str, need_text: bool = False):
+        """
+        Extrae el texto si hace falta (modo "text", caché, reglas o need_text) y consulta la caché
+        y las reglas del dominio.
+
+        Returns:
+            tuple: (texto, clave de caché o None, Overview de la caché o de las reglas, o None)
+        """
+        if need_text or self.mode == "text" or self.cache is not None or self.rules is not None or is_capture(pdf_url):
+            text = self.extract_text(pdf_url)
+        else:
+            text = ""
+
+        clave = None
+        if self.cache is not None:
+            clave = self.cache_key(pdf_url, text)
+            cached = self.cache.get(clave)
+            if cached is not None:
+                try:
+                    overview = Overview.model_validate(cached)
+                    logger.info(f"Resultado recuperado de la caché para {pdf_url}")
+                    return text, clave, overview
+                except ValidationError:
+                    logger.warning(f"Entrada de caché inválida para {pdf_url}, se vuelve a extraer")
+
+        if self.rules is not None:
+            datos = self.rules.extract(pdf_url, text)
+            if datos is not None:
+                try:
+                    return text, clave, Overview.model_validate(datos)
+                except ValidationError as ve:
+                    logger.warning(f"El resultado de las reglas para {pdf_url} no es válido, se usa el modelo: {ve}")
+        return text, clave, None
+
+    def _use_text(self, pdf_url: str, text: str) -> bool:
+        """Indica si el documento se extrae a partir de su texto (siempre en las capturas)."""
+        if is_capture(pdf_url):
+            logger.info(f"Captura de texto ({len(text)} caracteres)")
+            return True
+        if self.mode != "text":
+            return False
+        if len(text) >= self.min_text_chars:
+            logger.info(f"Capa de texto extraída localmente ({len(text)} caracteres)")
+            return True
+        logger.info(f"Capa de texto insuficiente ({len(text)} caracteres), se usa el asistente")
+        return False
+
+    def _span(self, etapa: str, pdf_url: str):
+        """Tramo de métricas de una etapa del documento (contexto vacío si no hay métricas)."""
+        return span(self.metrics, etapa, pdf_url, domain_key(pdf_url, "") if self.metrics is not None else None)
+
+    def _segment(self, pdf_url: str, text: str) -> str:
+        """Reduce el texto a sus regiones de precios si hay segmentador."""
+        if self.segmenter is None:
+            return text
+        return self.segmenter.segment(pdf_url, text)
+
+    def _finish(self, pdf_url: str, clave: str, overview: Overview, text: str = "") -> Overview:
+        """Guarda el resultado en la caché, propone reglas para el dominio y lo registra."""
+        if clave is not None:
+            self.cache.put(clave, overview.model_dump(), model=self.model, source=pdf_url)
+        if self.rules is not None:
+            self.rules.propose(pdf_url, text, [precio.model_dump() for precio in overview.precios])
+        logger.info(f"Datos parseados correctamente: {overview.model_dump()}")
+        return overview
+
+    def _upload_pdf(self, pdf_url: str):
+        """Sube el PDF a OpenAI; el archivo se reabre en cada intento."""
+        with open(pdf_url, "rb") as pdf_file:
+            return self.client.files.create(file=pdf_file, purpose='assistants')
+
+    async def _aupload_pdf(self, pdf_url: str):
+        """Versión asíncrona de _upload_pdf."""
+        with open(pdf_url, "rb") as pdf_file:
+            return await self.async_client.files.create(file=pdf_file, purpose='assistants')
+
+    def _parse_pdf_assistants(self, pdf_url: str) -> Overview:
+        """
+        Sube el PDF a OpenAI y lo analiza con un asistente con file_search.
+        """
+        call = self.scheduler.call
+
+        # Descarga el archivo PDF y súbelo a OpenAI
+        with self._span("subida", pdf_url):
+            file = call(lambda: self._upload_pdf(pdf_url), estimated_tokens=0)
+        logger.info(f"Archivo PDF subido a OpenAI con ID: {file.id}")
+
+        try:
+            # Configura el asistente con herramientas y prompts
+            assistant_id = self._get_assistant_id()
 
             # Crea un thread con el archivo PDF como entrada
-            schema_json_string = Overview.model_json_schema()
-            thread = self.client.beta.threads.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": (
-                            "Eres un asistente experto en ofertas de electricidad. "
-                            "Extrae la información en el esquema JSON proporcionado."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": (
-                            f"Genera un output siguiendo el esquema: {schema_json_string}."
-                        ),
-                        "attachments": [{"file_id": file.id, "tools": [{"type": "file_search"}]}],
-                    },
-                ]
-            )
+            thread = call(lambda: self.client.beta.threads.create(messages=self._thread_messages(file.id)),
+                          estimated_tokens=0)
             logger.info("Thread creado con el asistente para el análisis del archivo.")
 
             # Ejecuta el proceso de análisis
-            run = self.client.beta.threads.runs.create_and_poll(
-                thread_id=thread.id, assistant_id=assistant.id)
+            with self._span("asistente", pdf_url):
+                run = call(lambda: self.client.beta.threads.runs.create_and_poll(
+                    thread_id=thread.id, assistant_id=assistant_id), estimated_tokens=ASSISTANT_RUN_TOKENS)
             logger.info("Análisis completado. Recuperando los mensajes.")
 
-            messages = list(self.client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id))
+            messages = call(lambda: list(self.client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id)),
+                            estimated_tokens=0)
             message_content = messages[0].content[0].text
-            openai.files.delete(file_id=file.id)
-
-            # Extraemos la información en formato JSON
-            completion = self.client.beta.chat.completions.parse(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "user", "content": f"Extrae la información en formato JSON: {message_content.value}"}
-                ],
-                response_format=Overview,
+        finally:
+            call(lambda: self.client.files.delete(file_id=file.id), estimated_tokens=0)
+
+        # Extraemos la información en formato JSON
+        with self._span("parse", pdf_url):
+            completion = call(
+                lambda: self.client.beta.chat.completions.parse(
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": f"Extrae la información en formato JSON: {message_content.value}"}
+                    ],
+                    response_format=Overview,
+                ),
+                estimated_tokens=estimate_tokens(message_content.value),
             )
-            overview = completion.choices[0].message.parsed
-            logger.info(f"Datos parseados correctamente: {overview.model_dump()}")
-            return overview
+        return completion.choices[0].message.parsed
+
+    async def _aparse_pdf_assistants(self, pdf_url: str) -> Overview:
+        """Versión asíncrona de _parse_pdf_assistants."""
+        acall = self.scheduler.acall
+        client = self.async_client
+
+        with self._span("subida", pdf_url):
+            file = await acall(lambda: self._aupload_pdf(pdf_url), estimated_tokens=0)
+        logger.info(f"Archivo PDF subido a OpenAI con ID: {file.id}")
+
+        try:
+            assistant_id = await self._aget_assistant_id()
+            thread = await acall(lambda: client.beta.threads.create(messages=self._thread_messages(file.id)),
+                                 estimated_tokens=0)
+            with self._span("asistente", pdf_url):
+                run = await acall(lambda: client.beta.threads.runs.create_and_poll(
+                    thread_id=thread.id, assistant_id=assistant_id), estimated_tokens=ASSISTANT_RUN_TOKENS)
+            logger.info(f"Análisis completado para {pdf_url}. Recuperando los mensajes.")
+
+            async def listar_mensajes():
+                return [m async for m in client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id)]
+
+            messages = await acall(listar_mensajes, estimated_tokens=0)
+            message_content = messages[0].content[0].text
+        finally:
+            await acall(lambda: client.files.delete(file_id=file.id), estimated_tokens=0)
+
+        with self._span("parse", pdf_url):
+            completion = await acall(
+                lambda: client.beta.chat.completions.parse(
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": f"Extrae la información en formato JSON: {message_content.value}"}
+                    ],
+                    response_format=Overview,
+                ),
+                estimated_tokens=estimate_tokens(message_content.value),
+            )
+        return completion.choices[0].message.parsed
+
+    def parse_pdf(self, pdf_url: str) -> Overview:
+        """
+        Procesa un PDF a partir de su URL, extrae información y devuelve un objeto Overview.
+        También acepta capturas de texto (.json) de PDFGenerator, que se envían directamente como texto.
+
+        Args:
+            pdf_url (str): URL del PDF o de la captura a analizar.
+
+        Returns:
+            Overview: Objeto Overview con los datos extraídos.
+
+        Raises:
+            Exception: Si ocurre un error durante el procesamiento o la validación.
+        """
+        try:
+            logger.info(f"Procesando el archivo PDF: {pdf_url}")
+
+            with self._span("extraccion", pdf_url):
+                with self._span("texto", pdf_url):
+                    text, clave, overview = self._prepare(pdf_url)
+                if overview is not None:
+                    return overview
+
+                if self._use_text(pdf_url, text):
+                    segmentado = self._segment(pdf_url, text)
+                    with self._span("parse", pdf_url):
+                        overview = self.parse_text(segmentado)
+                else:
+                    overview = self._parse_pdf_assistants(pdf_url)
+                return self._finish(pdf_url, clave, overview, text)
 
         except ValidationError as ve:
             logger.error(f"Error de validación al procesar los datos: {ve}")
@@ -129,3 +530,297 @@ class PDFParser:
         except Exception as e:
             logger.error(f"Error inesperado al procesar el PDF: {e}")
             raise Exception(f"Error inesperado al procesar el PDF: {e}")
+
+    async def aparse_pdf(self, pdf_url: str) -> Overview:
+        """
+        Versión asíncrona de parse_pdf con AsyncOpenAI, para procesar varios PDFs a la vez
+        desde un mismo bucle de eventos. La extracción local de texto se ejecuta en un hilo.
+        """
+        try:
+            logger.info(f"Procesando el archivo PDF: {pdf_url}")
+
+            with self._span("extraccion", pdf_url):
+                with self._span("texto", pdf_url):
+                    text, clave, overview = await asyncio.to_thread(self._prepare, pdf_url)
+                if overview is not None:
+                    return overview
+
+                if self._use_text(pdf_url, text):
+                    segmentado = self._segment(pdf_url, text)
+                    with self._span("parse", pdf_url):
+                        overview = await self.aparse_text(segmentado)
+                else:
+                    overview = await self._aparse_pdf_assistants(pdf_url)
+                return self._finish(pdf_url, clave, overview, text)
+
+        except ValidationError as ve:
+            logger.error(f"Error de validación al procesar los datos: {ve}")
+            raise Exception(f"Error de validación al procesar los datos: {ve}")
+        except Exception as e:
+            logger.error(f"Error inesperado al procesar el PDF: {e}")
+            raise Exception(f"Error inesperado al procesar el PDF: {e}")
+
+    def _batch_line(self, custom_id: str, text: str) -> dict:
+        """Petición de extracción estructurada en el formato JSONL de la Batch API."""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.model,
+                "messages": self._text_messages(text),
+                "response_format": type_to_response_format_param(Overview),
+            },
+        }
+
+    def _submit_batch(self, lineas: list, batch_folder: str):
+        """Escribe el JSONL, lo sube y crea el lote. Devuelve el objeto Batch."""
+        os.makedirs(batch_folder, exist_ok=True)
+        numero = len(os.listdir(batch_folder)) + 1
+        ruta = os.path.join(batch_folder, f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{numero}.jsonl")
+        with open(ruta, "w", encoding="utf-8") as file:
+            for linea in lineas:
+                file.write(json.dumps(linea, ensure_ascii=False) + "\n")
+
+        def subir():
+            with open(ruta, "rb") as batch_file:
+                return self.client.files.create(file=batch_file, purpose="batch")
+
+        input_file = self.scheduler.call(subir, estimated_tokens=0)
+        batch = self.scheduler.call(
+            lambda: self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            ),
+            estimated_tokens=0,
+        )
+        logger.info(f"Lote {batch.id} enviado con {len(lineas)} documentos ({ruta})")
+        return batch
+
+    def _wait_batch(self, batch_id: str, poll_interval: float, timeout: float):
+        """Consulta el estado del lote hasta que termina o se agota el tiempo."""
+        limite = time.monotonic() + timeout
+        while True:
+            batch = self.scheduler.call(lambda: self.client.batches.retrieve(batch_id), estimated_tokens=0)
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                logger.info(f"Lote {batch_id} terminado con estado {batch.status}")
+                return batch
+            if time.monotonic() > limite:
+                logger.warning(f"Tiempo agotado esperando el lote {batch_id} ({batch.status}), se cancela")
+                self.scheduler.call(lambda: self.client.batches.cancel(batch_id), estimated_tokens=0)
+                return batch
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info(f"Lote {batch_id} {batch.status}: {counts.completed}/{counts.total} completados")
+            time.sleep(poll_interval)
+
+    def _read_batch_output(self, file_id: str) -> list:
+        """Descarga un archivo de resultados del lote y devuelve sus líneas JSON."""
+        if not file_id:
+            return []
+        contenido = self.scheduler.call(lambda: self.client.files.content(file_id), estimated_tokens=0)
+        return [json.loads(linea) for linea in contenido.text.splitlines() if linea.strip()]
+
+    def parse_batch(self, pdf_urls: list, batch_folder: str = "batches", poll_interval: float = 60,
+                    timeout: float = 24 * 3600, max_rounds: int = 3):
+        """
+        Procesa muchos PDFs a la vez con la Batch API de OpenAI (más barata, sin conexiones abiertas).
+
+        Los documentos en caché no se envían. Los que no tienen capa de texto suficiente se procesan
+        con parse_pdf. Los elementos fallidos o que no validan contra Overview se reenvían en un
+        nuevo lote, hasta max_rounds lotes.
+
+        Args:
+            pdf_urls (list): Rutas de los PDFs.
+            batch_folder (str): Carpeta donde se guardan los JSONL enviados.
+            poll_interval (float): Segundos entre consultas del estado del lote.
+            timeout (float): Segundos máximos de espera por lote.
+            max_rounds (int): Número máximo de lotes (envío inicial + reenvíos).
+
+        Returns:
+            tuple: (dict ruta -> Overview con los resultados, dict ruta -> mensaje de error)
+        """
+        resultados = {}
+        errores = {}
+        pendientes = {}  # custom_id -> (ruta, texto segmentado, clave, texto completo)
+
+        for i, pdf_url in enumerate(pdf_urls):
+            try:
+                text, clave, overview = self._prepare(pdf_url, need_text=True)
+            except Exception as e:
+                errores[pdf_url] = f"Error al leer el PDF: {e}"
+                continue
+            if overview is not None:
+                resultados[pdf_url] = overview
+            elif len(text) >= self.min_text_chars or is_capture(pdf_url):
+                pendientes[f"doc-{i}"] = (pdf_url, self._segment(pdf_url, text), clave, text)
+            else:
+                # Sin capa de texto no se puede usar la Batch API
+                try:
+                    resultados[pdf_url] = self.parse_pdf(pdf_url)
+                except Exception as e:
+                    errores[pdf_url] = str(e)
+
+        for ronda in range(1, max_rounds + 1):
+            if not pendientes:
+                break
+            logger.info(f"Ronda {ronda} de la Batch API: {len(pendientes)} documentos")
+            lineas = [self._batch_line(custom_id, text) for custom_id, (_, text, _, _) in pendientes.items()]
+            with span(self.metrics, "lote", f"ronda {ronda}"):
+                batch = self._wait_batch(self._submit_batch(lineas, batch_folder).id, poll_interval, timeout)
+
+            fallidos = {}
+            for item in self._read_batch_output(batch.output_file_id) + self._read_batch_output(batch.error_file_id):
+                custom_id = item.get("custom_id")
+                if custom_id not in pendientes:
+                    continue
+                pdf_url, _, clave, text = pendientes[custom_id]
+                try:
+                    response = item.get("response") or {}
+                    if response.get("status_code") != 200:
+                        raise Exception(item.get("error") or response.get("body", {}).get("error"))
+                    if self.metrics is not None and response["body"].get("usage"):
+                        self.metrics.count("tokens_entrada", response["body"]["usage"].get("prompt_tokens", 0))
+                        self.metrics.count("tokens_salida", response["body"]["usage"].get("completion_tokens", 0))
+                    message = response["body"]["choices"][0]["message"]
+                    if message.get("refusal"):
+                        raise Exception(f"El modelo rechazó la petición: {message['refusal']}")
+                    overview = Overview.model_validate_json(message["content"])
+                    resultados[pdf_url] = self._finish(pdf_url, clave, overview, text)
+                except Exception as e:
+                    fallidos[custom_id] = str(e)
+                    logger.warning(f"Elemento {custom_id} ({pdf_url}) inválido en el lote {batch.id}: {e}")
+
+            # Se reenvían los fallidos y los que no aparecen en la salida (lote caducado o cancelado)
+            for custom_id in list(pendientes):
+                if pendientes[custom_id][0] in resultados:
+                    del pendientes[custom_id]
+                else:
+                    errores[pendientes[custom_id][0]] = fallidos.get(custom_id, f"Sin resultado en el lote {batch.id}")
+
+        for pdf_url in resultados:
+            errores.pop(pdf_url, None)
+        logger.info(f"Batch API: {len(resultados)} documentos extraídos, {len(errores)} con error")
+        return resultados, errores
+
+    def _packed_messages(self, documentos: dict) -> list:
+        """Mensajes de una llamada agrupada: un bloque por documento con su identificador."""
+        contenido = "\n\n".join(f"=== Documento {doc_id} ===\n{text}" for doc_id, text in documentos.items())
+        return [
+            {"role": "system", "content": f"{INSTRUCCIONES} {INSTRUCCIONES_AGRUPADAS}"},
+            {"role": "user", "content": f"Contenido de las ofertas:\n\n{contenido}"},
+        ]
+
+    def _parse_pack(self, documentos: dict) -> dict:
+        """
+        Extrae varios documentos con una única llamada estructurada.
+
+        La respuesta se valida documento a documento, de modo que un elemento inválido no
+        invalida el resto.
+
+        Args:
+            documentos (dict): Identificador -> texto de cada documento.
+
+        Returns:
+            dict: Identificador -> Overview de los documentos que validan.
+        """
+        completion = self.scheduler.call(
+            lambda: self.client.chat.completions.create(
+                model=self.model,
+                messages=self._packed_messages(documentos),
+                response_format=type_to_response_format_param(PackedOverview),
+            ),
+            estimated_tokens=estimate_tokens("".join(documentos.values())),
+        )
+        message = completion.choices[0].message
+        if message.refusal:
+            raise Exception(f"El modelo rechazó la petición: {message.refusal}")
+
+        overviews = {}
+        for parte in json.loads(message.content).get("documentos", []):
+            doc_id = parte.get("id") if isinstance(parte, dict) else None
+            if doc_id not in documentos or doc_id in overviews:
+                continue
+            try:
+                overviews[doc_id] = Overview.model_validate({"precios": parte.get("precios")})
+            except ValidationError as ve:
+                logger.warning(f"Resultado inválido para {doc_id} en la llamada agrupada: {ve}")
+        return overviews
+
+    def parse_packed(self, pdf_urls: list, pack_tokens: int = 8000):
+        """
+        Extrae varios documentos agrupando los pequeños en una única llamada estructurada.
+
+        Los documentos se agrupan hasta sumar pack_tokens tokens estimados de texto, de modo que
+        las instrucciones y el esquema se envían una vez por grupo en lugar de una vez por
+        documento. La respuesta se separa por identificador; los documentos que faltan en ella
+        o que no validan contra Overview se vuelven a extraer de forma individual. Los documentos
+        en caché no se envían y los que no tienen capa de texto suficiente se procesan con parse_pdf.
+
+        Args:
+            pdf_urls (list): Rutas de los PDFs o capturas.
+            pack_tokens (int): Tokens estimados máximos del texto de cada grupo.
+
+        Returns:
+            tuple: (dict ruta -> Overview con los resultados, dict ruta -> mensaje de error)
+        """
+        resultados = {}
+        errores = {}
+        pendientes = {}  # doc_id -> (ruta, texto segmentado, clave, texto completo)
+
+        for i, pdf_url in enumerate(pdf_urls):
+            try:
+                text, clave, overview = self._prepare(pdf_url, need_text=True)
+            except Exception as e:
+                errores[pdf_url] = f"Error al leer el PDF: {e}"
+                continue
+            if overview is not None:
+                resultados[pdf_url] = overview
+            elif len(text) >= self.min_text_chars or is_capture(pdf_url):
+                pendientes[f"doc-{i}"] = (pdf_url, self._segment(pdf_url, text), clave, text)
+            else:
+                # Sin capa de texto se procesa con el asistente
+                try:
+                    resultados[pdf_url] = self.parse_pdf(pdf_url)
+                except Exception as e:
+                    errores[pdf_url] = str(e)
+
+        # Agrupar en orden hasta llenar el presupuesto; un documento mayor que el presupuesto va solo
+        grupos, grupo, tokens = [], {}, 0
+        for doc_id, (_, text, _, _) in pendientes.items():
+            tokens_doc = len(text) // 3
+            if grupo and tokens + tokens_doc > pack_tokens:
+                grupos.append(grupo)
+                grupo, tokens = {}, 0
+            grupo[doc_id] = text
+            tokens += tokens_doc
+        if grupo:
+            grupos.append(grupo)
+
+        for grupo in grupos:
+            overviews = {}
+            if len(grupo) > 1:
+                try:
+                    with span(self.metrics, "agrupada", ",".join(grupo)):
+                        overviews = self._parse_pack(grupo)
+                    logger.info(f"Llamada agrupada: {len(overviews)} de {len(grupo)} documentos extraídos")
+                except Exception as e:
+                    logger.warning(f"Error en la llamada agrupada de {len(grupo)} documentos: {e}")
+
+            for doc_id, text in grupo.items():
+                pdf_url, _, clave, texto_completo = pendientes[doc_id]
+                try:
+                    overview = overviews.get(doc_id)
+                    if overview is None:
+                        # Reintento individual de los documentos sin resultado válido
+                        overview = self.parse_text(text)
+                    # Las propuestas de reglas se verifican con el texto completo, como en parse_pdf
+                    resultados[pdf_url] = self._finish(pdf_url, clave, overview, texto_completo)
+                except Exception as e:
+                    errores[pdf_url] = str(e)
+                    logger.error(f"Error al procesar {pdf_url}: {e}")
+
+        logger.info(f"Extracción agrupada: {len(pendientes)} documentos en {len(grupos)} grupos, "
+                    f"{len(resultados)} extraídos, {len(errores)} con error")
+        return resultados, errores
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cambiar si cambia el formato de las entradas para invalidar la caché existente
+CACHE_VERSION = 1
+
+# Nombre de archivo de una entrada (clave SHA-256); el resto de archivos de la carpeta no se desalojan
+ENTRY_FILENAME = re.compile(r"^[0-9a-f]{64}\.json$")
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza espacios y mayúsculas para que cambios irrelevantes no alteren el hash."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def hash_text(text: str) -> str:
+    """Hash SHA-256 del texto normalizado."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Hash SHA-256 del contenido binario de un archivo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for bloque in iter(lambda: file.read(1 << 20), b""):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def hash_schema(schema: dict) -> str:
+    """Hash SHA-256 de un esquema JSON (p. ej. Overview.model_json_schema())."""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Caché en disco de resultados de extracción, direccionada por contenido.
+
+    La clave combina el hash del documento, el hash del esquema de salida y el modelo, de modo
+    que un cambio en cualquiera de los tres produce un fallo de caché. Cada entrada es un JSON
+    en cache_folder; la fecha de modificación se actualiza en cada acierto y se usa para
+    desalojar por antigüedad (max_age_days) y, por tamaño total (max_bytes), las menos usadas.
+    El desalojo recorre la carpeta al crear la caché y cada evict_every escrituras, no en cada una.
+    """
+
+    def __init__(self, cache_folder: str = "cache", max_bytes: int = 100 * 1024 * 1024, max_age_days: float = 30,
+                 evict_every: int = 100):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.evict_every = max(1, evict_every)
+        self.hits = 0
+        self.misses = 0
+        self._escrituras = 0
+        os.makedirs(self.cache_folder, exist_ok=True)
+        self.evict()
+
+    @staticmethod
+    def make_key(document_hash: str, schema_hash: str, model: str) -> str:
+        """Construye la clave de caché a partir de sus tres componentes."""
+        return hashlib.sha256(f"{CACHE_VERSION}:{document_hash}:{schema_hash}:{model}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_folder, f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Devuelve el valor almacenado para la clave o None si no existe.
+        """
+        ruta = self._path(key)
+        try:
+            with open(ruta, "r", encoding="utf-8") as file:
+                entrada = json.load(file)
+            os.utime(ruta)  # Marcar como usada recientemente
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entrada["value"]
+
+    def put(self, key: str, value, **metadata):
+        """
+        Guarda el valor (serializable a JSON) bajo la clave, junto con metadatos opcionales.
+        """
+        entrada = {"value": value, "created": time.time(), **metadata}
+        ruta = self._path(key)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as file:
+            json.dump(entrada, file, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        self._escrituras += 1
+        if self._escrituras % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Elimina las entradas caducadas y, si se supera max_bytes, las usadas hace más tiempo.
+        Solo se consideran los archivos de entrada (<clave>.json); otros archivos de la carpeta,
+        como el estado del segmentador, no se tocan ni cuentan para max_bytes.
+        """
+        ahora = time.time()
+        entradas = []
+        for nombre in os.listdir(self.cache_folder):
+            if not ENTRY_FILENAME.match(nombre):
+                continue
+            ruta = os.path.join(self.cache_folder, nombre)
+            try:
+                stat = os.stat(ruta)
+            except OSError:
+                continue
+            if self.max_age_days is not None and ahora - stat.st_mtime > self.max_age_days * 86400:
+                self._remove(ruta)
+            else:
+                entradas.append((stat.st_mtime, stat.st_size, ruta))
+
+        total = sum(size for _, size, _ in entradas)
+        if self.max_bytes is not None and total > self.max_bytes:
+            for _, size, ruta in sorted(entradas):
+                self._remove(ruta)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _remove(self, ruta: str):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+    def log_stats(self):
+        """Escribe en el log los aciertos y fallos acumulados."""
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        logger.info(f"Caché de extracción: {self.hits} aciertos, {self.misses} fallos ({ratio:.0f}% aciertos)")
@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import logging
+from .segmentation import PricingSegmenter, GENERATED_FILENAME
+
+logger = logging.getLogger(__name__)
+
+# Número con decimales en formato español o inglés (0,119 / 0.119 / 12)
+NUMBER = r"\d+(?:[.,]\d+)?"
+# Número que no va pegado a una letra (no coincide con el 1 de "P1")
+NUMBER_TOKEN = rf"(?<![^\W\d_]){NUMBER}"
+
+# Campos numéricos de Precio, para los que se proponen expresiones regulares
+NUMERIC_FIELDS = ("precio_te1", "precio_te2", "precio_te3", "precio_tp1", "precio_tp2",
+                  "descuento_promo", "descuento_servicios", "abonos")
+# Campos de texto libre redactados por el modelo: no se copian a las reglas (quedarían fijos para siempre)
+FREE_TEXT_FIELDS = ("comentario", "analisis")
+
+
+def to_float(valor: str) -> float:
+    """Convierte un número del texto (coma o punto decimal, con o sin separador de miles) a float."""
+    valor = valor.replace(" ", "")
+    if "," in valor and "." in valor:
+        valor = valor.replace(".", "").replace(",", ".")
+    else:
+        valor = valor.replace(",", ".")
+    return float(valor)
+
+
+def domain_key(document_path: str, text: str):
+    """Dominio del documento con el formato de los nombres de archivo de PDFGenerator (www_ejemplo_es)."""
+    dominio, _ = PricingSegmenter.page_identity(document_path, text)
+    return dominio.replace(".", "_") if dominio else None
+
+
+def page_key(document_path: str, text: str):
+    """
+    Página del documento: <dominio>_<hash del path> del nombre de archivo de PDFGenerator (igual en
+    PDFs y capturas de la misma URL) o, si no lo tiene, la URL de la cabecera de la captura.
+    """
+    match = GENERATED_FILENAME.match(os.path.basename(document_path))
+    if match:
+        return match.group("pagina")
+    _, pagina = PricingSegmenter.page_identity(document_path, text)
+    return pagina
+
+
+def _literal_pattern(fragmento: str) -> str:
+    """Patrón de un fragmento de texto: literal, salvo los números (que cambian) y los espacios."""
+    # Los dígitos pegados a letras (P1, 2.0TD) se mantienen literales
+    partes = re.split(f"({NUMBER_TOKEN})", fragmento)
+    patron = "".join(NUMBER if i % 2 else re.escape(parte) for i, parte in enumerate(partes))
+    return re.sub(r"(\\ )+", r"\\s+", patron)
+
+
+class RuleExtractor:
+    """
+    Extracción determinista por dominio a partir del texto del documento (capa de texto del PDF
+    o captura de texto), sin llamar a la API.
+
+    Cada dominio conocido tiene un archivo rules_folder/<dominio>.json con una lista de reglas:
+
+        {"reglas": [{"pagina": "www_iberdrola_es_0123456789", "si": "Plan Estable",
+                     "precios": [{"nombre": "Iberdrola",
+                                  "precio_te1": {"regex": "Energía:\\s+(\\d+(?:[.,]\\d+)?)\\s+€/kWh",
+                                                 "tipo": "numero"},
+                                  ...}]}]}
+
+    Se aplica la primera regla de la página del documento ("pagina" opcional, ver page_key) cuyo
+    "si" (expresión regular opcional) aparece en el texto. Cada
+    campo es un valor fijo o una expresión regular cuyo grupo "grupo" (1 por defecto) da el valor.
+    Si una expresión no encuentra nada, la regla falla y el documento se extrae con el modelo.
+
+    Tras cada extracción con el modelo de un dominio sin reglas se guarda una propuesta de regla
+    en rules_folder/propuestas/<dominio>.json, que se revisa y se copia a rules_folder para activarla.
+    """
+
+    def __init__(self, rules_folder: str = "rules", propose: bool = True):
+        self.rules_folder = rules_folder
+        self.proposals_folder = os.path.join(rules_folder, "propuestas")
+        self.propose_rules = propose
+        self.hits = 0
+        self.misses = 0
+        self.reglas = {}
+        if os.path.isdir(rules_folder):
+            for archivo in sorted(os.listdir(rules_folder)):
+                if not archivo.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(rules_folder, archivo), "r", encoding="utf-8") as file:
+                        self.reglas[archivo[:-len(".json")]] = json.load(file).get("reglas", [])
+                except (OSError, ValueError) as e:
+                    logger.warning(f"No se pudieron leer las reglas {archivo}: {e}")
+        logger.info(f"Reglas de extracción cargadas para {len(self.reglas)} dominios")
+
+    @staticmethod
+    def _apply_field(spec, text: str):
+        """Valor de un campo según su definición; None si la expresión no encuentra nada."""
+        if not isinstance(spec, dict):
+            return spec
+        match = re.search(spec["regex"], text, re.MULTILINE | re.IGNORECASE)
+        if match is None:
+            return None
+        valor = match.group(spec.get("grupo", 1)).strip()
+        return to_float(valor) if spec.get("tipo") == "numero" else valor
+
+    @classmethod
+    def apply_rule(cls, regla: dict, text: str):
+        """
+        Aplica una regla al texto.
+
+        Returns:
+            list: Diccionarios con los campos de cada Precio, o None si algún campo no se encuentra
+            o la regla no se puede aplicar (expresión inválida, grupo inexistente, número ilegible).
+        """
+        precios = []
+        for plantilla in regla.get("precios", []):
+            precio = {}
+            for campo, spec in plantilla.items():
+                try:
+                    valor = cls._apply_field(spec, text)
+                except (ValueError, IndexError, KeyError, re.error) as e:
+                    logger.warning(f"No se pudo aplicar la regla al campo {campo}: {e}")
+                    return None
+                if valor is None:
+                    return None
+                precio[campo] = valor
+            precios.append(precio)
+        return precios or None
+
+    def extract(self, document_path: str, text: str):
+        """
+        Extrae los precios con las reglas del dominio del documento.
+
+        Returns:
+            dict: {"precios": [...]} para validar con Overview, o None si no hay regla aplicable.
+        """
+        dominio = domain_key(document_path, text)
+        pagina = page_key(document_path, text)
+        for regla in self.reglas.get(dominio, []):
+            # Las páginas de un mismo dominio tienen ofertas distintas: una regla solo vale para la suya
+            if regla.get("pagina") and regla["pagina"] != pagina:
+                continue
+            try:
+                if regla.get("si") and not re.search(regla["si"], text, re.IGNORECASE):
+                    continue
+            except re.error as e:
+                logger.warning(f"Condición de regla inválida para {dominio}: {e}")
+                continue
+            precios = self.apply_rule(regla, text)
+            if precios is not None:
+                self.hits += 1
+                logger.info(f"Reglas de {dominio} aplicadas a {os.path.basename(document_path)}")
+                return {"precios": precios}
+            logger.info(f"Las reglas de {dominio} no encajan con {os.path.basename(document_path)}")
+            break
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def _field_spec(campo: str, valor, text: str):
+        """
+        Propone la definición de un campo: una expresión regular si el número aparece en el texto,
+        vacío para el texto libre y el valor del modelo para el resto.
+        """
+        if campo in FREE_TEXT_FIELDS:
+            return ""
+        if campo not in NUMERIC_FIELDS or not valor:
+            return valor
+        for linea in text.splitlines():
+            for match in re.finditer(NUMBER_TOKEN, linea):
+                try:
+                    if abs(to_float(match.group()) - float(valor)) > 1e-9:
+                        continue
+                except ValueError:
+                    continue
+                # Contexto: hasta 30 caracteres antes (sin cortar palabras) y la unidad que sigue
+                prefijo = linea[max(0, match.start() - 30):match.start()]
+                if match.start() > 30 and " " in prefijo:
+                    prefijo = prefijo.split(" ", 1)[1]
+                sufijo = re.match(r"\s*\S*", linea[match.end():]).group()
+                if not prefijo.strip() and not sufijo.strip():
+                    continue
+                return {"regex": f"{_literal_pattern(prefijo)}({NUMBER}){_literal_pattern(sufijo)}", "tipo": "numero"}
+        return valor
+
+    def propose(self, document_path: str, text: str, precios: list):
+        """
+        Guarda una propuesta de regla a partir del resultado del modelo para un dominio sin reglas.
+
+        Args:
+            document_path (str): Ruta del documento.
+            text (str): Texto enviado al modelo.
+            precios (list): Diccionarios de los Precio extraídos.
+        """
+        if not self.propose_rules or not text or not precios:
+            return
+        dominio = domain_key(document_path, text)
+        if dominio is None or dominio in self.reglas:
+            return
+
+        regla = {"precios": [{campo: self._field_spec(campo, valor, text) for campo, valor in precio.items()}
+                             for precio in precios]}
+        pagina = page_key(document_path, text)
+        if pagina:
+            regla["pagina"] = pagina
+        titulo = next((linea for linea in text.splitlines() if linea.startswith("Título:")), None)
+        if titulo:
+            regla["si"] = re.escape(titulo[len("Título:"):].strip())
+        # Verificada si está limitada a su página (si no, se aplicaría a todo el dominio), todos los
+        # importes se leen del texto (un importe fijo quedaría obsoleto en cuanto cambie la tarifa) y la
+        # propuesta reproduce el resultado del modelo sobre el mismo texto
+        localizados = all(isinstance(spec, dict) for plantilla in regla["precios"]
+                          for campo, spec in plantilla.items() if campo in NUMERIC_FIELDS and spec)
+        aplicada = self.apply_rule(regla, text)
+        regla["verificada"] = bool(pagina) and localizados and aplicada is not None and [
+            {campo: valor for campo, valor in precio.items() if campo not in FREE_TEXT_FIELDS} for precio in aplicada
+        ] == [
+            {campo: (float(valor) if campo in NUMERIC_FIELDS and valor else valor)
+             for campo, valor in precio.items() if campo not in FREE_TEXT_FIELDS}
+            for precio in precios]
+
+        # Una regla por página del dominio: se sustituye la propuesta anterior de la misma página y condición
+        os.makedirs(self.proposals_folder, exist_ok=True)
+        ruta = os.path.join(self.proposals_folder, f"{dominio}.json")
+        reglas = []
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, "r", encoding="utf-8") as file:
+                    reglas = [r for r in json.load(file).get("reglas", [])
+                              if (r.get("pagina"), r.get("si")) != (regla.get("pagina"), regla.get("si"))]
+            except (OSError, ValueError):
+                reglas = []
+        with open(ruta, "w", encoding="utf-8") as file:
+            json.dump({"reglas": reglas + [regla]}, file, ensure_ascii=False, indent=2)
+        logger.info(f"Propuesta de reglas para {dominio} guardada en {ruta}")
+
+    def log_stats(self):
+        """Escribe en el log los documentos resueltos con reglas."""
+        total = self.hits + self.misses
+        logger.info(f"Reglas de extracción: {self.hits} de {total} documentos sin llamar al modelo")
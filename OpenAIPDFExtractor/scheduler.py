@@ -0,0 +1,266 @@
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Errores transitorios que se reintentan con espera exponencial
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+)
+
+
+def parse_reset(value: str) -> float:
+    """
+    Convierte las duraciones de las cabeceras x-ratelimit-reset-* ("1s", "6m0s", "120ms") a segundos.
+    """
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    unidades = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(n) * unidades[u] for n, u in re.findall(r"([\d.]+)(ms|h|m|s)", value))
+
+
+class TokenBucket:
+    """Cubo de tokens con capacidad por minuto y recarga continua."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        ahora = time.monotonic()
+        self.level = min(self.capacity, self.level + (ahora - self.updated) * self.capacity / 60)
+        self.updated = ahora
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos hasta que haya amount disponible (0 si ya lo hay)."""
+        self.refill()
+        # Una petición mayor que la capacidad solo necesita el cubo lleno
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def sync(self, limit: float = None, remaining: float = None, reset: float = None):
+        """Ajusta el cubo a los valores que informa el servidor en sus cabeceras."""
+        self.refill()
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+            if remaining <= 0 and reset:
+                # Nada disponible hasta el reinicio: el cubo se recarga justo en ese momento
+                self.level = -reset * self.capacity / 60
+
+
+class RateLimitScheduler:
+    """
+    Planificador compartido por todas las llamadas a OpenAI de un PDFParser.
+
+    - Presupuesto por cubos de tokens para peticiones y tokens estimados por minuto.
+    - Sincronización con las cabeceras x-ratelimit-* de cada respuesta (ver observe_response).
+    - Reintentos con espera exponencial con jitter ante 429, 5xx y errores de conexión,
+      respetando Retry-After cuando el servidor lo envía.
+    - Concurrencia adaptativa AIMD: +1 tras cada ventana de éxitos, mitad ante un 429. Una ráfaga
+      de 429 de las llamadas que ya estaban en vuelo cuenta como un único evento de congestión.
+
+    Sirve tanto para llamadas síncronas (call) como asíncronas (acall).
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 30000,
+                 initial_concurrency: int = 4, max_concurrency: int = 32, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0, metrics=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = float(max(1, initial_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.retries = 0
+        self.rate_limited = 0
+        # Se incrementa en cada reducción; un 429 de una llamada lanzada antes de la última
+        # reducción ya está contado en ella
+        self._epoca = 0
+        # Metrics.RunMetrics opcional: llamadas, reintentos y tokens consumidos según la API
+        self.metrics = metrics
+        self._lock = threading.Lock()
+
+    # --- Estado compartido -------------------------------------------------
+
+    def _try_acquire(self, estimated_tokens: int):
+        """
+        Reserva un hueco si es posible.
+
+        Returns:
+            tuple: (segundos a esperar, 0 si se ha reservado; época de la reserva para _release)
+        """
+        with self._lock:
+            if self.in_flight >= int(self.concurrency):
+                return 0.05, None
+            espera = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+            if espera > 0:
+                return espera, None
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+            self.in_flight += 1
+            return 0.0, self._epoca
+
+    def _acquire(self, estimated_tokens: int) -> int:
+        """Espera hasta reservar un hueco. Devuelve la época de la reserva."""
+        espera, epoca = self._try_acquire(estimated_tokens)
+        while espera > 0:
+            time.sleep(espera)
+            espera, epoca = self._try_acquire(estimated_tokens)
+        return epoca
+
+    async def _aacquire(self, estimated_tokens: int) -> int:
+        """Versión asíncrona de _acquire."""
+        espera, epoca = self._try_acquire(estimated_tokens)
+        while espera > 0:
+            await asyncio.sleep(espera)
+            espera, epoca = self._try_acquire(estimated_tokens)
+        return epoca
+
+    def _release(self, success: bool, rate_limited: bool = False, epoca: int = None):
+        """
+        Libera el hueco y ajusta la concurrencia. Con epoca (la de la reserva), un 429 solo reduce la
+        concurrencia si la llamada se lanzó después de la última reducción.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                if self.metrics is not None:
+                    self.metrics.count("respuestas_429_openai")
+                if epoca is None or epoca == self._epoca:
+                    self._epoca += 1
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    logger.warning(f"Límite de uso alcanzado, concurrencia reducida a {int(self.concurrency)}")
+            elif success:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Espera antes del siguiente intento: Retry-After si existe, si no exponencial con jitter completo."""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(self.max_delay, float(retry_after))
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def observe_response(self, response):
+        """
+        Hook de respuesta de httpx: sincroniza los cubos con las cabeceras x-ratelimit-*.
+        """
+        headers = response.headers
+
+        def numero(nombre):
+            valor = headers.get(nombre)
+            try:
+                return float(valor) if valor is not None else None
+            except ValueError:
+                return None
+
+        with self._lock:
+            if headers.get("x-ratelimit-remaining-requests") is not None:
+                self.requests.sync(numero("x-ratelimit-limit-requests"), numero("x-ratelimit-remaining-requests"),
+                                   parse_reset(headers.get("x-ratelimit-reset-requests")))
+            if headers.get("x-ratelimit-remaining-tokens") is not None:
+                self.tokens.sync(numero("x-ratelimit-limit-tokens"), numero("x-ratelimit-remaining-tokens"),
+                                 parse_reset(headers.get("x-ratelimit-reset-tokens")))
+
+    async def aobserve_response(self, response):
+        """Versión asíncrona de observe_response para httpx.AsyncClient."""
+        self.observe_response(response)
+
+    def _record_usage(self, resultado):
+        """Suma a las métricas los tokens que informa la API en la respuesta (chat o run del asistente)."""
+        if self.metrics is None:
+            return
+        self.metrics.count("llamadas_openai")
+        usage = getattr(resultado, "usage", None)
+        if usage is not None:
+            self.metrics.count("tokens_entrada", getattr(usage, "prompt_tokens", 0) or 0)
+            self.metrics.count("tokens_salida", getattr(usage, "completion_tokens", 0) or 0)
+
+    # --- Ejecución ---------------------------------------------------------
+
+    def call(self, fn, estimated_tokens: int = 1000):
+        """
+        Ejecuta fn() respetando los límites y reintentando los errores transitorios.
+        """
+        for attempt in range(self.max_retries + 1):
+            epoca = self._acquire(estimated_tokens)
+            try:
+                resultado = fn()
+            except RETRYABLE_ERRORS as e:
+                self._release(False, rate_limited=isinstance(e, openai.RateLimitError), epoca=epoca)
+                # Sin saldo no tiene sentido reintentar
+                if attempt == self.max_retries or getattr(e, "code", None) == "insufficient_quota":
+                    raise
+                self.retries += 1
+                if self.metrics is not None:
+                    self.metrics.count("reintentos_openai")
+                retraso = self._backoff(attempt, e)
+                logger.warning(f"Error transitorio de OpenAI ({e.__class__.__name__}), reintento en {retraso:.1f} s")
+                time.sleep(retraso)
+            except BaseException:
+                self._release(False)
+                raise
+            else:
+                self._release(True)
+                self._record_usage(resultado)
+                return resultado
+
+    async def acall(self, coro_fn, estimated_tokens: int = 1000):
+        """
+        Versión asíncrona de call: coro_fn() debe devolver una corrutina nueva en cada intento.
+        """
+        for attempt in range(self.max_retries + 1):
+            epoca = await self._aacquire(estimated_tokens)
+            try:
+                resultado = await coro_fn()
+            except RETRYABLE_ERRORS as e:
+                self._release(False, rate_limited=isinstance(e, openai.RateLimitError), epoca=epoca)
+                # Sin saldo no tiene sentido reintentar
+                if attempt == self.max_retries or getattr(e, "code", None) == "insufficient_quota":
+                    raise
+                self.retries += 1
+                if self.metrics is not None:
+                    self.metrics.count("reintentos_openai")
+                retraso = self._backoff(attempt, e)
+                logger.warning(f"Error transitorio de OpenAI ({e.__class__.__name__}), reintento en {retraso:.1f} s")
+                await asyncio.sleep(retraso)
+            except BaseException:
+                self._release(False)
+                raise
+            else:
+                self._release(True)
+                self._record_usage(resultado)
+                return resultado
+
+    def log_stats(self):
+        """Escribe en el log el estado del planificador."""
+        logger.info(f"Planificador OpenAI: concurrencia {int(self.concurrency)}, {self.retries} reintentos, "
+                    f"{self.rate_limited} respuestas 429")
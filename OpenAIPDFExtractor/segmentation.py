@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from urllib.parse import urlparse
+from .cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Líneas que indican una región de precios de la oferta
+PRICING_PATTERNS = re.compile(
+    r"€\s*/\s*kwh|€\s*/\s*kw|kw\s*/?\s*(día|dia|mes|año)|c€|cént|"
+    r"\bP[1-6]\b|\b(punta|llano|valle)\b|t[ée]rmino\s+de\s+(energ[íi]a|potencia)|"
+    r"\d+[.,]\d{2,6}\s*€|€\s*\d|\d+\s*%|descuento|permanencia|abono",
+    re.IGNORECASE,
+)
+
+# Nombre de los archivos de PDFGenerator: <dominio>_<hash del path>_<YYYYMMDD_HHMMSS>.<ext>
+GENERATED_FILENAME = re.compile(r"^(?P<pagina>(?P<dominio>.+)_[^_]+)_\d{8}_\d{6}\.\w+$")
+
+# Líneas de cabecera de las capturas de texto que siempre se conservan
+HEADER_PREFIXES = ("Fuente:", "Título:")
+
+
+def count_tokens(text: str) -> int:
+    """Estimación de tokens del texto (≈3 caracteres por token en español)."""
+    return len(text) // 3
+
+
+def _line_hash(linea: str) -> str:
+    return hashlib.sha1(normalize_text(linea).encode("utf-8")).hexdigest()[:16]
+
+
+class PricingSegmenter:
+    """
+    Reduce el texto de una página a las regiones relevantes para la tarifa antes de enviarlo al modelo.
+
+    - Conserva las líneas con patrones de precios (€/kWh, €/kW/día, P1/P2/P3, punta/llano/valle,
+      porcentajes, descuentos...) y las filas de tablas, con context_lines líneas alrededor y el
+      título anterior más cercano.
+    - Descarta las líneas que se repiten en al menos min_pages páginas distintas del mismo dominio
+      (menús, pies, banners), salvo que contengan precios. El recuento se guarda en state_file
+      para que se aprenda entre ejecuciones.
+    - Si no encuentra ninguna región de precios devuelve el texto completo sin la parte repetida.
+    """
+
+    def __init__(self, state_file: str = None, context_lines: int = 3, min_pages: int = 3):
+        self.state_file = state_file
+        self.context_lines = context_lines
+        self.min_pages = min_pages
+        self.tokens_before = 0
+        self.tokens_after = 0
+        # dominio -> hash de línea -> páginas distintas (como mucho min_pages) en las que aparece
+        self._lineas = {}
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file, "r", encoding="utf-8") as file:
+                    self._lineas = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning(f"No se pudo leer el estado de segmentación {state_file}: {e}")
+
+    @staticmethod
+    def page_identity(document_path: str, text: str):
+        """
+        Devuelve (dominio, página) del documento: la URL de la cabecera en las capturas o el
+        nombre de archivo de PDFGenerator en los PDFs.
+        """
+        for linea in text.splitlines()[:3]:
+            if linea.startswith("Fuente:"):
+                url = linea[len("Fuente:"):].strip()
+                if url:
+                    return urlparse(url).netloc, url
+        match = GENERATED_FILENAME.match(os.path.basename(document_path))
+        if match:
+            return match.group("dominio"), match.group("pagina")
+        return None, None
+
+    def _observe(self, dominio: str, pagina: str, lineas: list):
+        """Registra las líneas de la página en el recuento de su dominio."""
+        recuento = self._lineas.setdefault(dominio, {})
+        for h in {_line_hash(linea) for linea in lineas}:
+            paginas = recuento.setdefault(h, [])
+            if pagina not in paginas and len(paginas) < self.min_pages:
+                paginas.append(pagina)
+
+    def _is_boilerplate(self, dominio: str, pagina: str, linea: str) -> bool:
+        """Una línea es repetida si, contando esta página, aparece en al menos min_pages páginas."""
+        paginas = self._lineas.get(dominio, {}).get(_line_hash(linea), [])
+        return len([p for p in paginas if p != pagina]) + 1 >= self.min_pages
+
+    def segment(self, document_path: str, text: str) -> str:
+        """
+        Devuelve solo las regiones de precios del texto y registra los tokens antes y después.
+        """
+        lineas = text.splitlines()
+        dominio, pagina = self.page_identity(document_path, text)
+
+        repetidas = set()
+        if dominio:
+            repetidas = {i for i, linea in enumerate(lineas) if self._is_boilerplate(dominio, pagina, linea)}
+            self._observe(dominio, pagina, lineas)
+
+        relevantes = [i for i, linea in enumerate(lineas)
+                      if PRICING_PATTERNS.search(linea) or (" | " in linea and re.search(r"\d", linea))]
+
+        if relevantes:
+            conservar = set()
+            for i in relevantes:
+                conservar.update(range(max(0, i - self.context_lines), min(len(lineas), i + self.context_lines + 1)))
+                # Título anterior más cercano (capturas de texto)
+                for j in range(i - 1, -1, -1):
+                    if lineas[j].startswith("#"):
+                        conservar.add(j)
+                        break
+            conservar -= repetidas - set(relevantes)
+        else:
+            conservar = set(range(len(lineas))) - repetidas
+        conservar.update(i for i, linea in enumerate(lineas[:3]) if linea.startswith(HEADER_PREFIXES))
+
+        salida = []
+        anterior = -1
+        for i in sorted(conservar):
+            if salida and i != anterior + 1:
+                salida.append("...")
+            salida.append(lineas[i])
+            anterior = i
+        segmentado = "\n".join(salida) if salida else text
+
+        antes, despues = count_tokens(text), count_tokens(segmentado)
+        self.tokens_before += antes
+        self.tokens_after += despues
+        reduccion = (1 - despues / antes) * 100 if antes else 0.0
+        logger.info(f"Segmentación de {os.path.basename(document_path)}: ≈{antes} → ≈{despues} tokens "
+                    f"({reduccion:.0f}% menos)")
+        return segmentado
+
+    def save(self):
+        """Guarda el recuento de líneas repetidas por dominio."""
+        if not self.state_file:
+            return
+        carpeta = os.path.dirname(self.state_file)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as file:
+            json.dump(self._lineas, file)
+        os.replace(temporal, self.state_file)
+
+    def log_stats(self):
+        """Escribe en el log los tokens totales antes y después de segmentar."""
+        reduccion = (1 - self.tokens_after / self.tokens_before) * 100 if self.tokens_before else 0.0
+        logger.info(f"Segmentación: ≈{self.tokens_before} → ≈{self.tokens_after} tokens en total "
+                    f"({reduccion:.0f}% menos)")
@@ -1,30 +1,168 @@
 import os
+import json
+import hashlib
+import time
 import asyncio
 from playwright.async_api import async_playwright
 from datetime import datetime
 from urllib.parse import urlparse
+from Metrics import span
+
+# Condiciones de disponibilidad de la página. La espera termina en cuanto se cumplen todas
+# o al agotar "timeout" (ms), en lugar de dormir un tiempo fijo.
+DEFAULT_READINESS = {
+    "network_idle": True,   # Sin peticiones de red activas durante 500 ms
+    "selector": None,       # Selector que debe estar visible
+    "stable_dom": True,     # Sin mutaciones del DOM durante "stable_ms"
+    "stable_ms": 500,
+    "timeout": 10000,
+}
+
+# Margen mínimo de un clic (cookies, 'Ver más información') aunque se haya agotado el límite de la página
+CLICK_MIN_MS = 1000
+
+# Ajustes por dominio, se combinan con DEFAULT_READINESS
+DOMAIN_READINESS = {
+    "iberdrola.es": {
+        "selector": "button:has-text('Más información'), a:has-text('Más información')",
+        "timeout": 12000,
+    },
+}
+
+# Modo de navegación ligera: tipos de recurso y dominios de analítica que no se descargan
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_DOMAINS = {
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googleadservices.com",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "bing.com",
+    "tiktok.com",
+    "linkedin.com",
+    "adobedtm.com",
+    "omtrdc.net",
+}
+
+# Extrae el texto visible de la página como bloques estructurados (títulos, textos y tablas)
+CAPTURE_SCRIPT = '''
+() => {
+    const SKIP = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "SVG", "TEMPLATE", "IFRAME", "CANVAS", "VIDEO", "IMG"]);
+    const bloques = [];
+    const limpiar = t => (t || "").replace(/\\s+/g, " ").trim();
+    // offsetParent es siempre null en <body> y en elementos fijos, así que se comprueba si el elemento tiene cajas
+    const visible = el => {
+        const style = getComputedStyle(el);
+        if (style.display === "none" || style.visibility === "hidden") return false;
+        return el === document.body || style.display === "contents" || el.getClientRects().length > 0;
+    };
+    const esBloque = el => !getComputedStyle(el).display.startsWith("inline");
+    const agregarTexto = texto => {
+        texto = limpiar(texto);
+        const ultimo = bloques[bloques.length - 1];
+        if (texto && !(ultimo && ultimo.tipo === "texto" && ultimo.texto === texto)) {
+            bloques.push({ tipo: "texto", texto });
+        }
+    };
+    const recorrer = el => {
+        if (SKIP.has(el.tagName.toUpperCase()) || !visible(el)) return;
+        if (/^H[1-6]$/.test(el.tagName)) {
+            const texto = limpiar(el.innerText);
+            if (texto) bloques.push({ tipo: "titulo", nivel: Number(el.tagName[1]), texto });
+            return;
+        }
+        if (el.tagName === "TABLE") {
+            const filas = Array.from(el.rows)
+                .map(fila => Array.from(fila.cells).map(celda => limpiar(celda.innerText)))
+                .filter(fila => fila.some(celda => celda));
+            if (filas.length) bloques.push({ tipo: "tabla", filas });
+            return;
+        }
+        const hijosBloque = Array.from(el.children).some(hijo => !SKIP.has(hijo.tagName.toUpperCase()) && esBloque(hijo));
+        if (!hijosBloque) {
+            agregarTexto(el.innerText);
+            return;
+        }
+        for (const nodo of el.childNodes) {
+            if (nodo.nodeType === Node.TEXT_NODE) agregarTexto(nodo.textContent);
+            else if (nodo.nodeType === Node.ELEMENT_NODE) {
+                if (esBloque(nodo)) recorrer(nodo);
+                else if (visible(nodo)) agregarTexto(nodo.innerText);
+            }
+        }
+    };
+    recorrer(document.body);
+    return { titulo: document.title, bloques };
+}
+'''
 
 class PDFGenerator:
-    def __init__(self, websites_file, output_folder="temp_pdf"):
+    def __init__(self, websites_file, output_folder="temp_pdf", concurrency=1, max_per_domain=2, headless=False,
+                 readiness=None, lean=False, blocked_resource_types=None, blocked_domains=None,
+                 storage_state_folder="storage_state", capture="pdf", archive_folder="archived_pdfs", metrics=None):
+        """
+        :param concurrency: Número de contextos del navegador renderizando en paralelo (1 = secuencial)
+        :param max_per_domain: Máximo de páginas simultáneas contra un mismo dominio
+        :param headless: Lanzar Chromium sin interfaz gráfica
+        :param readiness: Condiciones de disponibilidad por dominio que sustituyen a DOMAIN_READINESS
+        :param lean: Navegación ligera: bloquea recursos pesados y analítica y reutiliza el consentimiento de cookies
+        :param blocked_resource_types: Tipos de recurso bloqueados en modo ligero (por defecto BLOCKED_RESOURCE_TYPES)
+        :param blocked_domains: Dominios bloqueados en modo ligero (por defecto BLOCKED_DOMAINS)
+        :param storage_state_folder: Carpeta donde se guarda el storage_state de Playwright por dominio
+        :param capture: "pdf" imprime la página a PDF; "text" guarda solo el texto visible estructurado (JSON);
+                        "both" guarda el texto para la extracción y el PDF en archive_folder para su archivo
+        :param archive_folder: Carpeta de los PDFs de archivo en modo "both"
+        :param metrics: Metrics.RunMetrics donde registrar los tiempos por etapa, los bytes y los reintentos
+        """
         self.websites_file = websites_file
         self.output_folder = output_folder
+        self.concurrency = max(1, concurrency)
+        self.max_per_domain = max(1, max_per_domain)
+        self.headless = headless
+        self.readiness = {**DOMAIN_READINESS, **(readiness or {})}
+        self.lean = lean
+        self.blocked_resource_types = set(BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else blocked_resource_types)
+        self.blocked_domains = set(BLOCKED_DOMAINS if blocked_domains is None else blocked_domains)
+        self.storage_state_folder = storage_state_folder
+        self.capture = capture
+        self.archive_folder = archive_folder
+        self.metrics = metrics
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._semaforos_dominio = {}
 
         # Crear carpeta de salida si no existe
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
+        if self.capture == "both":
+            os.makedirs(self.archive_folder, exist_ok=True)
 
     def fetch_websites(self):
         """
         Lee las URLs desde el archivo y devuelve una lista de URLs.
+        La segunda columna opcional de cada línea (intervalo de refresco del modo daemon) se ignora.
         """
         with open(self.websites_file, "r") as file:
-            websites = [line.strip() for line in file if line.strip()]
+            websites = [line.split()[0] for line in file if line.strip()]
         return websites
 
-    async def accept_cookies(self, page):
+    @staticmethod
+    def remaining_ms(limite, minimo=1):
+        """
+        Milisegundos que quedan hasta limite (time.perf_counter()), o None si no hay límite.
+        Playwright interpreta timeout=0 como "sin límite", así que nunca se devuelve menos de minimo.
+        """
+        if limite is None:
+            return None
+        return max(minimo, (limite - time.perf_counter()) * 1000)
+
+    async def accept_cookies(self, page, limite=None):
         """
         Busca y hace clic en un botón de aceptación de cookies si está presente.
+        :param limite: Instante (time.perf_counter()) en que se agota el tiempo de espera de la página
+        :return: True si se aceptaron las cookies
         """
         try:
             selectors = [
@@ -33,17 +171,25 @@ class PDFGenerator:
                 "button:has-text('Accept')",
                 "button:has-text('Accept all')"
             ]
-            for selector in selectors:
-                if await page.query_selector(selector):
-                    await page.click(selector)
-                    print("Cookies aceptadas")
-                    break
+            # Un único localizador con todos los selectores evita una consulta por selector
+            boton = page.locator(", ".join(selectors)).first
+            if await boton.is_visible():
+                await boton.click(timeout=self.remaining_ms(limite, CLICK_MIN_MS))
+                print("Cookies aceptadas")
+                # Esperar a que el banner desaparezca en lugar de una pausa fija, dentro del límite de la página
+                try:
+                    await boton.wait_for(state="hidden", timeout=min(5000, self.remaining_ms(limite) or 5000))
+                except Exception:
+                    print("El banner de cookies sigue visible tras aceptar")
+                return True
         except Exception as e:
             print(f"No se pudieron aceptar cookies: {e}")
+        return False
 
-    async def click_ver_mas_info(self, page):
+    async def click_ver_mas_info(self, page, limite=None):
         """
         Si la URL es de Iberdrola, busca y hace clic en un botón 'Ver más información' o similar.
+        :param limite: Instante (time.perf_counter()) en que se agota el tiempo de espera de la página
         """
         try:
             # Verificar si la URL es de Iberdrola
@@ -58,57 +204,229 @@ class PDFGenerator:
                 for selector in selectors:
                     element = await page.query_selector(selector)
                     if element:
-                        await element.click()
+                        await element.click(timeout=self.remaining_ms(limite, CLICK_MIN_MS))
                         print(f"Se hizo clic en 'Ver más información' para {page.url}")
-                        await asyncio.sleep(3)  # Esperar a que la información se cargue
+                        # Esperar a que la información desplegada termine de cargarse
+                        reglas = self.readiness_for(page.url)
+                        await self.wait_for_stable_dom(page, reglas["stable_ms"],
+                                                       self.remaining_ms(limite) or reglas["timeout"])
                         break
         except Exception as e:
             print(f"No se pudo hacer clic en 'Ver más información': {e}")
 
+    def readiness_for(self, url):
+        """
+        Devuelve las condiciones de disponibilidad aplicables al dominio de la URL.
+        """
+        dominio = urlparse(url).netloc
+        reglas = dict(DEFAULT_READINESS)
+        for sufijo, ajustes in self.readiness.items():
+            if dominio == sufijo or dominio.endswith("." + sufijo):
+                reglas.update(ajustes)
+        return reglas
+
+    async def wait_for_stable_dom(self, page, stable_ms, timeout):
+        """
+        Espera hasta que el DOM no cambie durante stable_ms milisegundos o hasta timeout.
+        """
+        try:
+            await page.evaluate('''
+                ([stableMs, timeoutMs]) => new Promise(resolve => {
+                    const observer = new MutationObserver(() => {
+                        clearTimeout(quiet);
+                        quiet = setTimeout(done, stableMs);
+                    });
+                    let quiet = setTimeout(done, stableMs);
+                    const limit = setTimeout(done, timeoutMs);
+                    function done() {
+                        observer.disconnect();
+                        clearTimeout(quiet);
+                        clearTimeout(limit);
+                        resolve(true);
+                    }
+                    observer.observe(document.documentElement, { childList: true, subtree: true, characterData: true });
+                })
+            ''', [stable_ms, timeout])
+        except Exception as e:
+            print(f"No se pudo comprobar la estabilidad del DOM: {e}")
+
+    async def wait_until_ready(self, page, url, limite=None):
+        """
+        Espera a que la página esté lista según las condiciones de su dominio.
+        Todas las condiciones comparten un único límite de tiempo; al agotarlo se continúa igualmente.
+        :param limite: Instante (time.perf_counter()) en que se agota el tiempo; por defecto, el
+                       timeout del dominio a partir de ahora
+        :return: Segundos esperados
+        """
+        reglas = self.readiness_for(url)
+        inicio = time.perf_counter()
+        if limite is None:
+            limite = inicio + reglas["timeout"] / 1000
+
+        def restante():
+            return self.remaining_ms(limite)
+
+        if reglas["network_idle"]:
+            try:
+                await page.wait_for_load_state("networkidle", timeout=restante())
+            except Exception:
+                print(f"{url} no alcanzó networkidle dentro del límite")
+        if reglas["selector"]:
+            try:
+                await page.wait_for_selector(reglas["selector"], state="visible", timeout=restante())
+            except Exception:
+                print(f"Selector {reglas['selector']} no visible en {url} dentro del límite")
+        if reglas["stable_dom"]:
+            await self.wait_for_stable_dom(page, reglas["stable_ms"], restante())
+
+        esperado = time.perf_counter() - inicio
+        print(f"Página lista en {esperado:.1f} s: {url}")
+        return esperado
+
+    async def prepare_page(self, page, context, url):
+        """
+        Espera a que la página esté lista, acepta las cookies y despliega la información adicional.
+        Todas las esperas comparten un único límite: el timeout del dominio.
+        """
+        reglas = self.readiness_for(url)
+        limite = time.perf_counter() + reglas["timeout"] / 1000
+
+        # Esperar a que la página esté lista (red inactiva, selector objetivo, DOM estable)
+        await self.wait_until_ready(page, url, limite)
+
+        # Aceptar cookies, si es necesario, y recordar el consentimiento para el dominio
+        if await self.accept_cookies(page, limite) and self.lean:
+            await self.save_storage_state(context, url)
+
+        # Si la página es de Iberdrola, intentar hacer clic en el botón 'Ver más información'
+        await self.click_ver_mas_info(page, limite)
+
+        # Espera breve a que el DOM se asiente tras aceptar cookies y hacer clic en 'Ver más información'
+        await self.wait_for_stable_dom(page, reglas["stable_ms"], self.remaining_ms(limite))
+
+    def _storage_state_path(self, url):
+        """
+        Ruta del storage_state guardado para el dominio de la URL.
+        """
+        dominio = urlparse(url).netloc.replace(".", "_")
+        return os.path.join(self.storage_state_folder, f"{dominio}.json")
+
+    async def save_storage_state(self, context, url):
+        """
+        Guarda cookies y localStorage del contexto para reutilizar el consentimiento en el mismo dominio.
+        """
+        try:
+            os.makedirs(self.storage_state_folder, exist_ok=True)
+            estado = await context.storage_state()
+            ruta = self._storage_state_path(url)
+            # Escritura atómica: varios contextos del mismo dominio pueden guardar a la vez
+            temporal = f"{ruta}.{os.getpid()}.{id(context)}.tmp"
+            with open(temporal, "w", encoding="utf-8") as file:
+                json.dump(estado, file)
+            os.replace(temporal, ruta)
+        except Exception as e:
+            print(f"No se pudo guardar el storage_state de {url}: {e}")
+
+    def _es_dominio_bloqueado(self, url):
+        """
+        Indica si la URL pertenece a alguno de los dominios bloqueados (o a un subdominio).
+        """
+        host = urlparse(url).hostname or ""
+        return any(host == d or host.endswith("." + d) for d in self.blocked_domains)
+
+    async def _enable_lean_routing(self, context, estadisticas):
+        """
+        Intercepta las peticiones del contexto y aborta las de recursos pesados y analítica.
+        """
+        async def filtrar(route):
+            request = route.request
+            if request.resource_type in self.blocked_resource_types or self._es_dominio_bloqueado(request.url):
+                estadisticas["bloqueadas"] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", filtrar)
+
+    async def capture_text(self, page, url, filepath):
+        """
+        Guarda el texto visible de la página (títulos, textos y tablas en orden) como JSON,
+        junto con la URL de origen y la fecha de captura.
+        """
+        captura = await page.evaluate(CAPTURE_SCRIPT)
+        if not captura["bloques"]:
+            raise ValueError("La captura no contiene texto visible")
+        captura = {"url": url, "fecha": datetime.now().isoformat(timespec="seconds"), **captura}
+        with open(filepath, "w", encoding="utf-8") as file:
+            json.dump(captura, file, ensure_ascii=False)
+        print(f"Texto capturado para {url}: {filepath} ({len(captura['bloques'])} bloques)")
+
     async def generate_pdf(self, url, browser):
         """
-        Genera un PDF desde una URL utilizando Playwright.
+        Genera un PDF (o una captura de texto, según self.capture) desde una URL utilizando Playwright.
+        Devuelve un diccionario con la URL, la ruta del PDF y de la captura (o None), el error y la duración en segundos.
         """
+        inicio = time.perf_counter()
+        resultado = {"url": url, "pdf": None, "captura": None, "error": None, "duracion": None, "bloqueadas": 0}
+        context = None
+        dominio = urlparse(url).netloc.replace(".", "_")
         try:
+            opciones_contexto = {}
+            if self.lean and os.path.exists(self._storage_state_path(url)):
+                # Reutilizar el consentimiento de cookies guardado para este dominio
+                opciones_contexto["storage_state"] = self._storage_state_path(url)
             context = await browser.new_context(
                 viewport={"width": 1920, "height": 1080},
                 device_scale_factor=1,
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36"  # User-agent estándar
+                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36",  # User-agent estándar
+                **opciones_contexto
             )
+            if self.lean:
+                await self._enable_lean_routing(context, resultado)
             page = await context.new_page()
 
             # Reintento de navegación en caso de error
-            for attempt in range(3):
-                try:
-                    print(f"Intento {attempt + 1} de navegación para {url}")
-                    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    await asyncio.sleep(5)  # Espera adicional
-                    break
-                except Exception as e:
-                    print(f"Intento {attempt + 1} fallido para {url}: {e}")
-                    if attempt == 2:
-                        raise
-
-            # Aceptar cookies, si es necesario
-            await self.accept_cookies(page)
-
-            # Si la página es de Iberdrola, intentar hacer clic en el botón 'Ver más información'
-            await self.click_ver_mas_info(page)
+            with span(self.metrics, "navegacion", url, dominio):
+                for attempt in range(3):
+                    try:
+                        print(f"Intento {attempt + 1} de navegación para {url}")
+                        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                        break
+                    except Exception as e:
+                        print(f"Intento {attempt + 1} fallido para {url}: {e}")
+                        if self.metrics is not None:
+                            self.metrics.count("reintentos_navegacion", dominio=dominio)
+                        if attempt == 2:
+                            raise
 
-            await asyncio.sleep(3)  # Espera tras aceptar cookies y hacer clic en 'Ver más información'
+            with span(self.metrics, "espera", url, dominio):
+                await self.prepare_page(page, context, url)
 
             # Verificar contenido visible
             content = await page.content()
             if not content.strip():
                 print(f"El contenido de la página {url} está vacío.")
-                return
+                resultado["error"] = "Contenido vacío"
+                return resultado
 
             # Generar nombre del archivo único
             parsed_url = urlparse(url)
             domain = parsed_url.netloc.replace(".", "_")
-            path_hash = hash(parsed_url.path)  # Crear identificador único basado en el path
-            filename = f"{domain}_{path_hash}_{self.timestamp}.pdf"
-            filepath = os.path.join(self.output_folder, filename)
+            # Identificador estable del path (hash() cambia entre ejecuciones)
+            path_hash = hashlib.md5(parsed_url.path.encode("utf-8")).hexdigest()[:10]
+            filename = f"{domain}_{path_hash}_{self.timestamp}"
+
+            if self.capture in ("text", "both"):
+                capturepath = os.path.join(self.output_folder, f"{filename}.json")
+                with span(self.metrics, "captura_texto", url, dominio):
+                    await self.capture_text(page, url, capturepath)
+                resultado["captura"] = capturepath
+                if self.capture == "text":
+                    return resultado
+
+            # En modo "both" el PDF es solo de archivo y no se deja en la carpeta de extracción
+            carpeta_pdf = self.archive_folder if self.capture == "both" else self.output_folder
+            filepath = os.path.join(carpeta_pdf, f"{filename}.pdf")
 
             # Obtener las dimensiones del contenido para ajustar el tamaño del PDF
             content_box = await page.evaluate('''
@@ -122,32 +440,97 @@ class PDFGenerator:
             ''')
 
             # Guardar la página como un PDF de una sola página ajustando el tamaño a las dimensiones del contenido
-            await page.pdf(
-                path=filepath,
-                width=f"{content_box['width']}px",  # Ajuste del ancho al contenido
-                height=f"{content_box['height']}px",  # Ajuste de la altura para que se capture todo el contenido
-                scale=1,
-                margin={"top": "0px", "right": "0px", "bottom": "0px", "left": "0px"},  # Márgenes a cero como cadenas
-                print_background=True
-            )
+            with span(self.metrics, "pdf", url, dominio):
+                await page.pdf(
+                    path=filepath,
+                    width=f"{content_box['width']}px",  # Ajuste del ancho al contenido
+                    height=f"{content_box['height']}px",  # Ajuste de la altura para que se capture todo el contenido
+                    scale=1,
+                    margin={"top": "0px", "right": "0px", "bottom": "0px", "left": "0px"},  # Márgenes a cero como cadenas
+                    print_background=True
+                )
+            resultado["pdf"] = filepath
             print(f"PDF generado para {url}: {filepath}")
-
-            await context.close()
         except Exception as e:
             print(f"Error procesando {url}: {e}")
+            resultado["error"] = str(e)
+        finally:
+            # Cerrar siempre el contexto para devolver su hueco al pool
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    print(f"No se pudo cerrar el contexto de {url}: {e}")
+            resultado["duracion"] = time.perf_counter() - inicio
+            if self.metrics is not None:
+                generado = resultado["captura"] or resultado["pdf"]
+                self.metrics.record("render", url, dominio, resultado["duracion"], ok=bool(generado),
+                                    error=resultado["error"])
+                for ruta in (resultado["captura"], resultado["pdf"]):
+                    if ruta and os.path.exists(ruta):
+                        self.metrics.count("bytes_renderizados", os.path.getsize(ruta), dominio=dominio)
+                if resultado["bloqueadas"]:
+                    self.metrics.count("peticiones_bloqueadas", resultado["bloqueadas"], dominio=dominio)
+        return resultado
+
+    def _semaforo_dominio(self, url):
+        """
+        Devuelve el semáforo que limita las páginas simultáneas contra el dominio de la URL.
+        """
+        dominio = urlparse(url).netloc
+        if dominio not in self._semaforos_dominio:
+            self._semaforos_dominio[dominio] = asyncio.Semaphore(self.max_per_domain)
+        return self._semaforos_dominio[dominio]
 
-    async def process_all_websites(self):
+    async def generate_pdf_limited(self, url, browser, semaforo_global, queue=None):
+        """
+        Genera el PDF respetando el límite por dominio y el tamaño del pool de contextos.
+        """
+        # Primero el límite por dominio, para no ocupar un hueco del pool mientras se espera
+        async with self._semaforo_dominio(url):
+            async with semaforo_global:
+                resultado = await self.generate_pdf(url, browser)
+        if queue is not None:
+            await queue.put(resultado)
+        return resultado
+
+    async def process_all_websites(self, queue=None):
         """
         Procesa todas las URLs y genera un PDF para cada una.
+        Con concurrency > 1 se renderizan varias URLs en paralelo sobre un único navegador.
+        :param queue: asyncio.Queue opcional donde se publica cada resultado en cuanto está listo.
+                      Si la cola está llena, el renderizado espera (contrapresión).
+        :return: Lista de resultados por URL (ver generate_pdf), en el orden de websites.txt
         """
         websites = self.fetch_websites()
+        inicio = time.perf_counter()
 
-        # Lanzar el navegador en modo no headless
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False)  # Cambiado a no headless
-            for url in websites:
-                await self.generate_pdf(url, browser)
-            await browser.close()
+            browser = await p.chromium.launch(headless=self.headless)
+            try:
+                if self.concurrency == 1:
+                    resultados = []
+                    for url in websites:
+                        resultado = await self.generate_pdf(url, browser)
+                        if queue is not None:
+                            await queue.put(resultado)
+                        resultados.append(resultado)
+                else:
+                    semaforo_global = asyncio.Semaphore(self.concurrency)
+                    resultados = await asyncio.gather(
+                        *(self.generate_pdf_limited(url, browser, semaforo_global, queue) for url in websites)
+                    )
+            finally:
+                await browser.close()
+
+        generados = sum(1 for r in resultados if r["pdf"] or r["captura"])
+        for r in resultados:
+            estado = "OK" if r["pdf"] or r["captura"] else f"ERROR ({r['error']})"
+            print(f"{r['url']}: {estado} en {r['duracion']:.1f} s"
+                  + (f", {r['bloqueadas']} peticiones bloqueadas" if self.lean else ""))
+        print(f"{generados}/{len(resultados)} páginas capturadas en {time.perf_counter() - inicio:.1f} s "
+              f"(concurrencia {self.concurrency}, máx. {self.max_per_domain} por dominio)")
+        return list(resultados)
 
 if __name__ == "__main__":
     pdf_generator = PDFGenerator("websites.txt")
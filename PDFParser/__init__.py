@@ -1,36 +1,100 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
-#from PIL import Image
-#import pytesseract
+from PIL import Image
+import pytesseract
 
 # Configura la ruta de Tesseract en tu sistema si es necesario
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'  # Si usas Windows
 
+def _ocr_tile(tarea):
+    """
+    Rasteriza una franja de una página y le aplica OCR. Se ejecuta en un proceso del pool:
+    cada proceso abre el PDF por su cuenta y solo mantiene en memoria una franja a la vez.
+    :param tarea: Tupla (pdf_path, pagina_num, clip, dpi, lang)
+    :return: Texto extraído de la franja
+    """
+    pdf_path, pagina_num, clip, dpi, lang = tarea
+    with fitz.open(pdf_path) as documento:
+        pagina = documento.load_page(pagina_num)
+        imagen = pagina.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), clip=fitz.Rect(*clip))
+    pil_imagen = Image.frombytes("RGB", (imagen.width, imagen.height), imagen.samples)
+    del imagen
+    return pytesseract.image_to_string(pil_imagen, lang=lang)
+
 class PDFParser:
-    def __init__(self, pdf_folder, dpi=300):
+    def __init__(self, pdf_folder, dpi=300, min_dpi=100, max_width=4000, tile_height=4000, tile_overlap=60,
+                 min_text_chars=50, lang="spa", workers=None):
+        """
+        :param pdf_folder: Carpeta que contiene los PDFs
+        :param dpi: Resolución máxima en DPI para la conversión de PDF a imagen
+        :param min_dpi: Resolución mínima; la resolución se reduce hasta aquí en páginas muy anchas
+        :param max_width: Ancho máximo en píxeles de la imagen rasterizada
+        :param tile_height: Alto en píxeles de cada franja horizontal en que se divide una página
+        :param tile_overlap: Solape en píxeles entre franjas, para no cortar líneas de texto
+        :param min_text_chars: Mínimo de caracteres en la capa de texto para no aplicar OCR a la página
+        :param lang: Idioma(s) de Tesseract
+        :param workers: Procesos de OCR en paralelo (por defecto, todos los núcleos)
+        """
         self.pdf_folder = pdf_folder  # Carpeta que contiene los PDFs
         self.dpi = dpi  # Resolución en DPI para la conversión de PDF a imagen
-    
+        self.min_dpi = min_dpi
+        self.max_width = max_width
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+        self.min_text_chars = min_text_chars
+        self.lang = lang
+        self.workers = workers or os.cpu_count()
+
+    def calcular_dpi(self, pagina):
+        """
+        Elige la resolución de una página: self.dpi salvo que la imagen supere max_width píxeles
+        de ancho (las páginas de generate_pdf miden lo mismo que la web), sin bajar de min_dpi.
+        :param pagina: Página de PyMuPDF
+        :return: DPI a utilizar
+        """
+        dpi_por_ancho = self.max_width * 72 / pagina.rect.width
+        return max(self.min_dpi, min(self.dpi, dpi_por_ancho))
+
+    def calcular_franjas(self, pagina, dpi):
+        """
+        Divide la página en franjas horizontales de como mucho tile_height píxeles a la resolución dada.
+        :return: Lista de rectángulos (x0, y0, x1, y1) en coordenadas de la página
+        """
+        rect = pagina.rect
+        alto = self.tile_height * 72 / dpi
+        solape = self.tile_overlap * 72 / dpi
+        franjas = []
+        y0 = rect.y0
+        while y0 < rect.y1:
+            y1 = min(rect.y1, y0 + alto)
+            franjas.append((rect.x0, y0, rect.x1, y1))
+            if y1 >= rect.y1:
+                break
+            y0 = y1 - solape
+        return franjas
+
+    def iterar_imagenes_pdf(self, pdf_path):
+        """
+        Genera de forma perezosa las imágenes de las franjas de cada página, de una en una.
+        :param pdf_path: Ruta del archivo PDF
+        :return: Generador de tuplas (número de página, imagen)
+        """
+        with fitz.open(pdf_path) as documento:
+            for pagina_num in range(documento.page_count):
+                pagina = documento.load_page(pagina_num)
+                dpi = self.calcular_dpi(pagina)
+                for clip in self.calcular_franjas(pagina, dpi):
+                    yield pagina_num, pagina.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), clip=fitz.Rect(*clip))
+
     def extraer_imagenes_pdf(self, pdf_path):
         """
-        Convierte cada página de un archivo PDF en una imagen de alta calidad usando PyMuPDF.
+        Convierte cada página de un archivo PDF en imágenes usando PyMuPDF.
+        Mantiene todas las imágenes en memoria; para documentos grandes usar iterar_imagenes_pdf.
         :param pdf_path: Ruta del archivo PDF
-        :return: Lista de imágenes (cada página convertida a una imagen)
-        """
-        # Abre el archivo PDF
-        documento = fitz.open(pdf_path)
-        
-        # Lista para almacenar las imágenes de las páginas
-        imagenes = []
-        
-        # Iterar sobre las páginas
-        for pagina_num in range(documento.page_count):
-            pagina = documento.load_page(pagina_num)  # Cargar la página
-            # Convertir la página a una imagen (pixmap)
-            imagen = pagina.get_pixmap(matrix=fitz.Matrix(self.dpi / 72, self.dpi / 72))  # Ajustar resolución (DPI)
-            imagenes.append(imagen)  # Añadir imagen a la lista
-        
-        return imagenes
+        :return: Lista de imágenes (franjas de cada página)
+        """
+        return [imagen for _, imagen in self.iterar_imagenes_pdf(pdf_path)]
 
     def extraer_texto_imagen(self, imagen):
         """
@@ -39,43 +103,79 @@ class PDFParser:
         :return: El texto extraído de la imagen
         """
         pil_imagen = Image.frombytes("RGB", (imagen.width, imagen.height), imagen.samples)
-        return pytesseract.image_to_string(pil_imagen)
+        return pytesseract.image_to_string(pil_imagen, lang=self.lang)
+
+    def planificar_pdf(self, pdf_path):
+        """
+        Decide qué páginas tienen capa de texto y cuáles necesitan OCR, sin rasterizar nada.
+        :param pdf_path: Ruta del archivo PDF
+        :return: Lista por página: el texto de la página o una lista de tareas de OCR (ver _ocr_tile)
+        """
+        plan = []
+        with fitz.open(pdf_path) as documento:
+            for pagina_num in range(documento.page_count):
+                pagina = documento.load_page(pagina_num)
+                texto = pagina.get_text("text")
+                if len(texto.strip()) >= self.min_text_chars:
+                    plan.append(texto)
+                else:
+                    dpi = self.calcular_dpi(pagina)
+                    plan.append([(pdf_path, pagina_num, clip, dpi, self.lang)
+                                 for clip in self.calcular_franjas(pagina, dpi)])
+        return plan
+
+    def _ejecutar_planes(self, planes):
+        """
+        Ejecuta en el pool de procesos las tareas de OCR de varios planes y compone el texto de cada página.
+        :param planes: Lista de planes (ver planificar_pdf)
+        :return: Lista de listas de textos por página, en el mismo orden
+        """
+        tareas = [tarea for plan in planes for pagina in plan if isinstance(pagina, list) for tarea in pagina]
+        if tareas and self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                textos_ocr = iter(list(executor.map(_ocr_tile, tareas)))
+        else:
+            textos_ocr = map(_ocr_tile, tareas)
+
+        resultados = []
+        for plan in planes:
+            textos = []
+            for pagina in plan:
+                if isinstance(pagina, list):
+                    textos.append("\n".join(next(textos_ocr) for _ in pagina))
+                else:
+                    textos.append(pagina)
+            resultados.append(textos)
+        return resultados
 
     def procesar_pdf(self, pdf_path):
         """
-        Procesa un archivo PDF, convierte sus páginas a imágenes y extrae el texto de las imágenes usando OCR.
+        Procesa un archivo PDF: usa la capa de texto de las páginas que la tienen y aplica OCR
+        (en paralelo y por franjas) al resto.
         :param pdf_path: Ruta del archivo PDF
         :return: Lista de textos extraídos de cada página
         """
-        # Extraer imágenes de las páginas del PDF
-        imagenes = self.extraer_imagenes_pdf(pdf_path)
-        
-        # Extraer el texto de cada imagen usando Tesseract
-        textos = [self.extraer_texto_imagen(imagen) for imagen in imagenes]
-        
-        return textos
+        return self._ejecutar_planes([self.planificar_pdf(pdf_path)])[0]
 
     def analizar_ofertas(self):
         """
-        Procesa todos los PDFs de una carpeta dada, convirtiendo las páginas a imágenes y extrayendo el texto.
+        Procesa todos los PDFs de una carpeta dada, repartiendo el OCR de todas sus páginas entre todos los núcleos.
         :return: Lista con los textos extraídos de todos los PDFs
         """
-        ofertas = []
-        
-        # Iterar sobre todos los archivos PDF en la carpeta
-        for archivo_pdf in os.listdir(self.pdf_folder):
+        planes = []
+
+        # Planificar todos los PDFs de la carpeta (solo lectura de la capa de texto)
+        for archivo_pdf in sorted(os.listdir(self.pdf_folder)):
             if archivo_pdf.endswith(".pdf"):
                 pdf_path = os.path.join(self.pdf_folder, archivo_pdf)
                 print(f"Procesando {pdf_path}...")
-                
-                # Procesar el PDF y extraer textos
-                textos = self.procesar_pdf(pdf_path)
-                
-                # Aquí puedes agregar más lógica para extraer la información específica de los textos
-                for texto in textos:
-                    print(texto)  # Imprimir el texto extraído (aquí puedes adaptarlo a lo que necesitas)
-                
-                # Añadir los textos extraídos a la lista de ofertas
-                ofertas.append(textos)
-        
-        return ofertas
\ No newline at end of file
+                planes.append(self.planificar_pdf(pdf_path))
+
+        ofertas = self._ejecutar_planes(planes)
+
+        # Aquí puedes agregar más lógica para extraer la información específica de los textos
+        for textos in ofertas:
+            for texto in textos:
+                print(texto)  # Imprimir el texto extraído (aquí puedes adaptarlo a lo que necesitas)
+
+        return ofertas
@@ -0,0 +1,87 @@
+import time
+import asyncio
+import logging
+
+# Configurar el logger reutilizando la configuración del main
+logger = logging.getLogger(__name__)
+
+class Pipeline:
+    """
+    Encadena el renderizado y la extracción mediante una cola asyncio acotada: cada PDF que
+    genera PDFGenerator pasa directamente a un pool de workers de extracción asíncronos, de modo
+    que ambas etapas trabajan a la vez y el tiempo total se aproxima al de la etapa más lenta.
+    """
+
+    def __init__(self, pdf_generator, parser, extraction_workers=4, queue_size=8, on_result=None, on_done=None):
+        """
+        :param pdf_generator: Instancia de PDFGenerator (su concurrency fija los workers de renderizado)
+        :param parser: Instancia de OpenAIPDFExtractor.PDFParser
+        :param extraction_workers: Número de extracciones simultáneas
+        :param queue_size: Tamaño máximo de la cola entre etapas; al llenarse, el renderizado espera
+        :param on_result: Función (ruta del documento, overview) llamada con cada resultado en cuanto llega
+        :param on_done: Función (resultado del renderizado, excepción o None) llamada al terminar cada extracción
+        """
+        self.pdf_generator = pdf_generator
+        self.parser = parser
+        self.extraction_workers = max(1, extraction_workers)
+        self.queue_size = max(1, queue_size)
+        self.on_result = on_result
+        self.on_done = on_done
+        self.extraidos = 0
+        self.errores = 0
+
+    async def extraction_worker(self, cola, numero):
+        """
+        Consume PDFs de la cola hasta recibir None.
+        """
+        while True:
+            item = await cola.get()
+            try:
+                if item is None:
+                    return
+                # Se extrae la captura de texto si existe; si no, el PDF
+                documento = item.get("captura") or item["pdf"]
+                if not documento:
+                    # El renderizado ya informó del error
+                    continue
+                inicio = time.perf_counter()
+                error = None
+                try:
+                    overview = await self.parser.aparse_pdf(documento)
+                    if self.on_result is not None:
+                        self.on_result(documento, overview)
+                    self.extraidos += 1
+                    logger.info(f"Worker {numero}: {documento} extraído en {time.perf_counter() - inicio:.1f} s")
+                except Exception as e:
+                    error = e
+                    self.errores += 1
+                    logger.error(f"Worker {numero}: error al procesar {documento}: {e}")
+                if self.on_done is not None:
+                    self.on_done(item, error)
+            finally:
+                cola.task_done()
+
+    async def run(self, pending_pdfs=()):
+        """
+        Ejecuta el pipeline completo.
+        :param pending_pdfs: Documentos (PDFs o capturas) ya existentes que se extraen además de los que se rendericen
+        :return: Lista de resultados del renderizado (ver PDFGenerator.generate_pdf)
+        """
+        inicio = time.perf_counter()
+        cola = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.create_task(self.extraction_worker(cola, i + 1)) for i in range(self.extraction_workers)]
+
+        try:
+            for pdf_path in pending_pdfs:
+                await cola.put({"url": None, "pdf": pdf_path, "error": None, "duracion": None})
+            resultados = await self.pdf_generator.process_all_websites(queue=cola)
+        finally:
+            # Una marca de fin por worker; esperan a vaciar la cola antes de terminar
+            for _ in workers:
+                await cola.put(None)
+            await asyncio.gather(*workers)
+            await self.parser.aclose()
+
+        logger.info(f"Pipeline completado en {time.perf_counter() - inicio:.1f} s: "
+                    f"{self.extraidos} PDFs extraídos, {self.errores} errores")
+        return resultados
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+# Configurar el logger reutilizando la configuración del main
+logger = logging.getLogger(__name__)
+
+def _q(nombre: str) -> str:
+    """Entrecomilla un nombre de columna para SQLite."""
+    return '"' + nombre.replace('"', '""') + '"'
+
+# Nombre de la columna de fecha en el Excel exportado (compatible con resultados_procesados.xlsx)
+EXCEL_DATE_COLUMN = "Fecha de Ejecucion"
+
+class ResultStore:
+    """
+    Almacén incremental de resultados en SQLite.
+
+    Cada documento procesado se añade en una única transacción (una fila por Precio) sin
+    reescribir los datos anteriores. El Excel deja de ser el almacenamiento y pasa a ser una
+    exportación bajo demanda (ver export_excel).
+
+    Varios procesos pueden escribir a la vez (p. ej. los workers de QUEUE_MODE): cada escritura
+    toma el bloqueo de escritura de SQLite antes de comprobar y añadir columnas. Con wal=False se
+    usa el journal clásico, necesario si la base de datos está en un disco compartido.
+    """
+
+    def __init__(self, db_path: str, wal: bool = True):
+        """
+        :param db_path: Ruta del archivo SQLite (se crea si no existe)
+        :param wal: Usar el modo WAL (lecturas sin bloquear las escrituras; solo en disco local)
+        """
+        self.db_path = db_path
+        carpeta = os.path.dirname(db_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS precios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_ejecucion TEXT NOT NULL,
+                documento TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_precios_fecha ON precios (fecha_ejecucion)")
+        self.conn.commit()
+        self._columnas = self._leer_columnas()
+
+    def _leer_columnas(self):
+        return [fila[1] for fila in self.conn.execute("PRAGMA table_info(precios)")]
+
+    def _asegurar_columnas(self, nombres):
+        """
+        Añade las columnas que falten, para admitir cambios en el esquema Precio. Se llama con el
+        bloqueo de escritura tomado: otro proceso puede haberlas añadido ya, así que se releen.
+        """
+        if any(nombre not in self._columnas for nombre in nombres):
+            self._columnas = self._leer_columnas()
+        for nombre in nombres:
+            if nombre not in self._columnas:
+                self.conn.execute(f"ALTER TABLE precios ADD COLUMN {_q(nombre)}")
+                self._columnas.append(nombre)
+                if nombre == "nombre":
+                    self.conn.execute("CREATE INDEX IF NOT EXISTS idx_precios_nombre ON precios (nombre)")
+
+    def _insertar(self, filas, execution_date: str, documento: str = None) -> int:
+        """Inserta las filas dentro de la transacción en curso."""
+        filas = [dict(fila) for fila in filas]
+        if not filas:
+            return 0
+        # Orden de los campos (el de Precio), para que las columnas del Excel sigan el formato histórico
+        nombres = list(dict.fromkeys(clave for fila in filas for clave in fila))
+        columnas = ["fecha_ejecucion", "documento"] + nombres
+        sql = (f"INSERT INTO precios ({', '.join(_q(c) for c in columnas)}) "
+               f"VALUES ({', '.join('?' for _ in columnas)})")
+        valores = [[execution_date, documento] + [fila.get(n) for n in nombres] for fila in filas]
+        self._asegurar_columnas(nombres)
+        self.conn.executemany(sql, valores)
+        return len(filas)
+
+    def _transaccion(self, fn):
+        """Ejecuta fn() en una transacción con el bloqueo de escritura tomado desde el principio."""
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.execute("BEGIN IMMEDIATE")
+                    return fn()
+            except Exception:
+                # Las columnas añadidas en la transacción fallida se han deshecho
+                self._columnas = self._leer_columnas()
+                raise
+
+    def add_rows(self, filas, execution_date: str, documento: str = None) -> int:
+        """
+        Añade varias filas (diccionarios) en una única transacción.
+        :return: Número de filas añadidas
+        """
+        return self._transaccion(lambda: self._insertar(filas, execution_date, documento))
+
+    def add_document(self, overview, execution_date: str, documento: str = None) -> int:
+        """
+        Añade los precios de un Overview como un lote.
+        :return: Número de filas añadidas
+        """
+        return self.add_rows((precio.model_dump() for precio in overview.precios), execution_date, documento)
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM precios").fetchone()[0]
+
+    def import_excel(self, excel_path: str, if_empty: bool = False) -> int:
+        """
+        Importa un Excel generado por versiones anteriores (resultados_procesados.xlsx) en una única
+        transacción. Si no tiene la columna de fecha de ejecución, se usa la fecha de modificación del archivo.
+        :param if_empty: Importar solo si la base de datos está vacía (comprobado dentro de la transacción,
+            para que dos procesos que arrancan a la vez no importen el histórico dos veces)
+        :return: Número de filas importadas
+        """
+        import pandas as pd
+
+        df = pd.read_excel(excel_path)
+        if df.empty:
+            return 0
+        if EXCEL_DATE_COLUMN not in df.columns:
+            fecha = datetime.fromtimestamp(os.path.getmtime(excel_path)).strftime('%Y-%m-%d %H:%M:%S')
+            logger.warning(f"{excel_path} no tiene la columna '{EXCEL_DATE_COLUMN}', se usa la fecha {fecha}")
+            df[EXCEL_DATE_COLUMN] = fecha
+        df = df.astype(object).where(df.notna(), None)
+        grupos = [(str(fecha), grupo.drop(columns=[EXCEL_DATE_COLUMN]).to_dict(orient="records"))
+                  for fecha, grupo in df.groupby(EXCEL_DATE_COLUMN, dropna=False)]
+
+        def importar():
+            if if_empty and self.conn.execute("SELECT COUNT(*) FROM precios").fetchone()[0]:
+                return 0
+            return sum(self._insertar(filas, fecha, documento=os.path.basename(excel_path)) for fecha, filas in grupos)
+
+        total = self._transaccion(importar)
+        if total:
+            logger.info(f"{total} filas importadas desde {excel_path}")
+        return total
+
+    def query(self, desde: str = None, hasta: str = None, comercializadora: str = None):
+        """
+        Devuelve un DataFrame con los resultados, filtrados opcionalmente por fecha y comercializadora.
+        :param desde: Fecha mínima (YYYY-MM-DD), incluida
+        :param hasta: Fecha máxima (YYYY-MM-DD), incluida
+        :param comercializadora: Texto contenido en el nombre de la empresa (sin distinguir mayúsculas)
+        """
+        import pandas as pd
+
+        condiciones, parametros = [], []
+        if desde:
+            condiciones.append("fecha_ejecucion >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("fecha_ejecucion < date(?, '+1 day')")
+            parametros.append(hasta)
+        with self._lock:
+            # Otro proceso puede haber creado las columnas después de abrir el almacén
+            self._columnas = self._leer_columnas()
+            if comercializadora and "nombre" in self._columnas:
+                condiciones.append("nombre LIKE ?")
+                parametros.append(f"%{comercializadora}%")
+            where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+            df = pd.read_sql_query(f"SELECT * FROM precios{where} ORDER BY id", self.conn, params=parametros)
+        return df.drop(columns=["id"])
+
+    def export_excel(self, excel_path: str, desde: str = None, hasta: str = None, comercializadora: str = None) -> int:
+        """
+        Exporta los resultados (filtrados con los mismos criterios que query) a un Excel.
+        :return: Número de filas exportadas
+        """
+        import pandas as pd
+
+        df = self.query(desde, hasta, comercializadora)
+        # Mismo formato que el Excel histórico: la fecha de ejecución como última columna
+        df = df.drop(columns=["documento"]).rename(columns={"fecha_ejecucion": EXCEL_DATE_COLUMN})
+        df = df[[c for c in df.columns if c != EXCEL_DATE_COLUMN] + [EXCEL_DATE_COLUMN]]
+        with pd.ExcelWriter(excel_path, mode='w', engine='openpyxl') as writer:
+            df.to_excel(writer, index=False)
+        logger.info(f"{len(df)} filas exportadas a {excel_path}")
+        return len(df)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    """Exportación bajo demanda desde la línea de comandos."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta a Excel los resultados almacenados.")
+    parser.add_argument("--db", default=os.path.join("output", "resultados.db"), help="Archivo SQLite de resultados")
+    parser.add_argument("--excel", default=None, help="Archivo Excel de salida")
+    parser.add_argument("--desde", default=None, help="Fecha mínima YYYY-MM-DD")
+    parser.add_argument("--hasta", default=None, help="Fecha máxima YYYY-MM-DD")
+    parser.add_argument("--comercializadora", default=None, help="Filtro por nombre de la empresa")
+    args = parser.parse_args(argv)
+
+    excel = args.excel or os.path.join("output", f"resultados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+    store = ResultStore(args.db)
+    try:
+        filas = store.export_excel(excel, args.desde, args.hasta, args.comercializadora)
+    finally:
+        store.close()
+    print(f"{filas} filas exportadas a {excel}")
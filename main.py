@@ -1,23 +1,58 @@
 import os
 import shutil
 import asyncio
-import pandas as pd
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
 from PDFGenerator import PDFGenerator
-from OpenAIPDFExtractor import PDFParser
+from OpenAIPDFExtractor import PDFParser, ExtractionCache, RateLimitScheduler, PricingSegmenter, RuleExtractor
+from Pipeline import Pipeline
+from JobQueue import JobQueue, QueueWorker
+from Daemon import MonitorDaemon, parse_interval
+from ResultStore import ResultStore
+from Metrics import RunMetrics, span
 
 # Cargar variables del archivo .env
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
+pdf_concurrency = int(os.getenv("PDF_CONCURRENCY", "1"))  # 1 = renderizado secuencial
+pdf_lean = os.getenv("PDF_LEAN", "0") == "1"  # Navegación ligera (bloqueo de recursos y consentimiento persistente)
+extraction_mode = os.getenv("EXTRACTION_MODE", "assistants")  # "assistants" o "text"
+extraction_cache = os.getenv("EXTRACTION_CACHE", "1") == "1"  # Caché de resultados por contenido
+extraction_segment = os.getenv("EXTRACTION_SEGMENT", "0") == "1"  # Enviar solo las regiones de precios
+extraction_rules = os.getenv("EXTRACTION_RULES", "0") == "1"  # Reglas deterministas por dominio antes del modelo
+pipeline_mode = os.getenv("PIPELINE_MODE", "0") == "1"  # Renderizado y extracción simultáneos
+queue_mode = os.getenv("QUEUE_MODE", "0") == "1"  # Cola de trabajos persistente y reanudable
+queue_stages = os.getenv("QUEUE_STAGES", "render,extract").split(",")  # Etapas que procesa este worker
+jobs_db = os.getenv("JOBS_DB", os.path.join("output", "trabajos.db"))  # Base de datos compartida por los workers
+run_id = os.getenv("RUN_ID", datetime.now().strftime('%Y-%m-%d'))  # Reutilizarlo reanuda la ejecución
+pause_on_exit = os.getenv("PAUSE_ON_EXIT", "0") == "1"  # Esperar a Enter al terminar (ejecución manual)
+metrics_prometheus = os.getenv("METRICS_PROMETHEUS")  # Ruta opcional de las métricas en formato Prometheus
+batch_mode = os.getenv("BATCH_MODE", "0") == "1"  # Extracción con la Batch API (ejecuciones nocturnas)
+pack_tokens = int(os.getenv("PACK_TOKENS", "0"))  # > 0: agrupar documentos pequeños en una llamada hasta estos tokens
+export_excel = os.getenv("EXPORT_EXCEL", "0") == "1"  # Exportar todos los resultados a Excel al terminar
+capture_mode = os.getenv("CAPTURE_MODE", "pdf")  # "pdf", "text" (solo texto visible) o "both"
+extraction_workers = int(os.getenv("EXTRACTION_WORKERS", "4"))  # Extracciones simultáneas en modo pipeline
+pipeline_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))  # PDFs en espera entre etapas
+openai_rpm = float(os.getenv("OPENAI_RPM", "500"))  # Peticiones por minuto de la cuenta
+openai_tpm = float(os.getenv("OPENAI_TPM", "30000"))  # Tokens por minuto de la cuenta
+daemon_mode = os.getenv("DAEMON_MODE", "0") == "1"  # Monitorización continua con navegador y cliente abiertos
+refresh_interval = parse_interval(os.getenv("REFRESH_INTERVAL", "1d"))  # Intervalo por defecto entre comprobaciones
+refresh_spread = parse_interval(os.getenv("REFRESH_SPREAD", "10m"))  # Ventana en la que se reparten las comprobaciones
+browser_recycle_pages = int(os.getenv("BROWSER_RECYCLE_PAGES", "200"))  # Renderizados antes de reiniciar Chromium
+browser_recycle_interval = parse_interval(os.getenv("BROWSER_RECYCLE_INTERVAL", "1h"))  # Tiempo antes de reiniciarlo
+metrics_interval = parse_interval(os.getenv("METRICS_INTERVAL", "15m"))  # Informe de métricas del daemon
 
 # Configuración de carpetas y archivos
 websites_file = "websites.txt"
 input_folder = './temp_pdf'
 processed_folder = './processed_pdfs'
+archive_folder = './archived_pdfs'
 output_folder = './output'
 logs_folder = './logs'
+cache_folder = './cache'
+batch_folder = './batches'
+rules_folder = './rules'
 
 # Crear carpetas necesarias si no existen
 os.makedirs(processed_folder, exist_ok=True)
@@ -35,55 +70,149 @@ logging.basicConfig(level=logging.INFO,
                     ])
 logger = logging.getLogger()
 
-# Paso 1: Generar PDFs desde sitios web
-logger.info("Iniciando generación de PDFs a partir de las URLs")
-try:
-    pdf_generator = PDFGenerator(websites_file)
-    asyncio.run(pdf_generator.process_all_websites())
-    logger.info("Generación de PDFs completada")
-except Exception as e:
-    logger.error(f"Error al generar PDFs: {e}")
-
-# Paso 2: Procesar PDFs y extraer datos
-logger.info("Iniciando procesamiento de PDFs")
-parser = PDFParser(openai_api_key=openai_api_key)
+metrics = RunMetrics(timestamp)
+cache = ExtractionCache(cache_folder) if extraction_cache else None
+scheduler = RateLimitScheduler(requests_per_minute=openai_rpm, tokens_per_minute=openai_tpm, metrics=metrics)
+segmenter = PricingSegmenter(os.path.join(cache_folder, 'segmentacion.json')) if extraction_segment else None
+rules = RuleExtractor(rules_folder) if extraction_rules else None
+parser = PDFParser(openai_api_key=openai_api_key, mode=extraction_mode, cache=cache, scheduler=scheduler,
+                   segmenter=segmenter, rules=rules, metrics=metrics)
 execution_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+db_file_path = os.path.join(output_folder, 'resultados.db')
 excel_file_path = os.path.join(output_folder, 'resultados_procesados.xlsx')
 
-# Leer el archivo existente si ya existe
-if os.path.exists(excel_file_path):
-    df = pd.read_excel(excel_file_path)
-    logger.info("Archivo Excel existente cargado")
+# Los resultados se añaden de forma incremental a la base de datos; el Excel es solo una exportación
+# Los workers de la cola pueden compartir ./output en un disco de red, donde WAL no funciona
+store = ResultStore(db_file_path, wal=not queue_mode)
+if store.count() == 0 and os.path.exists(excel_file_path):
+    # Primera ejecución con la base de datos: importar el histórico del Excel (una sola vez aunque
+    # arranquen varios workers a la vez)
+    try:
+        store.import_excel(excel_file_path, if_empty=True)
+    except Exception as e:
+        logger.error(f"No se pudo importar el histórico de {excel_file_path}: {e}")
+
+def es_documento(filename):
+    """PDFs y capturas de texto pendientes de extraer."""
+    return filename.endswith('.pdf') or filename.endswith('.json')
+
+def guardar_resultado(pdf_path, overview):
+    """Añade los precios extraídos con la fecha de ejecución y mueve el PDF a procesados."""
+    filename = os.path.basename(pdf_path)
+    # En modo daemon cada resultado lleva la fecha de su comprobación
+    fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S') if daemon_mode else execution_date
+    with span(metrics, "guardado", filename):
+        store.add_document(overview, fecha, documento=filename)
+
+        # Mover archivo procesado
+        shutil.move(pdf_path, os.path.join(processed_folder, filename))
+    logger.info(f"{filename} procesado y movido a {processed_folder}")
+
+def guardar_metricas():
+    """Informe JSON de la ejecución y, opcionalmente, métricas Prometheus."""
+    metrics.set("openai_concurrencia_final", int(scheduler.concurrency))
+    metrics.write_json(os.path.join(logs_folder, f'metricas_{timestamp}.json'))
+    if metrics_prometheus:
+        metrics.write_prometheus(metrics_prometheus)
+    metrics.log_summary()
+
+pdf_generator = PDFGenerator(websites_file, concurrency=pdf_concurrency, headless=pdf_concurrency > 1 or daemon_mode or queue_mode,
+                             lean=pdf_lean, capture=capture_mode, archive_folder=archive_folder, metrics=metrics)
+
+if daemon_mode:
+    # Monitorización continua: cada URL se vuelve a comprobar al vencer su intervalo de refresco
+    logger.info("Iniciando el daemon de monitorización de tarifas")
+    daemon = MonitorDaemon(pdf_generator, parser, on_result=guardar_resultado, refresh_interval=refresh_interval,
+                           spread_seconds=refresh_spread, extraction_workers=extraction_workers,
+                           queue_size=pipeline_queue_size, recycle_pages=browser_recycle_pages,
+                           recycle_seconds=browser_recycle_interval,
+                           state_path=os.path.join(output_folder, 'monitorizacion.json'),
+                           on_report=guardar_metricas, report_interval=metrics_interval, metrics=metrics)
+    try:
+        asyncio.run(daemon.run())
+    except Exception as e:
+        logger.error(f"Error en el daemon: {e}")
+elif queue_mode:
+    # Worker de la cola de trabajos: reanuda la ejecución run_id donde se quedó
+    logger.info(f"Iniciando worker de la cola {jobs_db} (ejecución {run_id}, etapas {', '.join(queue_stages)})")
+    jobs = JobQueue(jobs_db)
+    try:
+        nuevas = jobs.enqueue_urls(run_id, pdf_generator.fetch_websites())
+        nuevos = jobs.enqueue_documents(
+            run_id, [os.path.join(input_folder, f) for f in os.listdir(input_folder) if es_documento(f)])
+        logger.info(f"{nuevas} URLs y {nuevos} documentos añadidos a la cola")
+        worker = QueueWorker(jobs, run_id,
+                             pdf_generator=pdf_generator if "render" in queue_stages else None,
+                             parser=parser if "extract" in queue_stages else None,
+                             on_result=guardar_resultado, extraction_workers=extraction_workers)
+        asyncio.run(worker.run())
+        for trabajo in jobs.failures(run_id):
+            logger.error(f"Fallido tras {trabajo['intentos']} intentos: {trabajo['url'] or trabajo['documento']}: "
+                         f"{trabajo['error']}")
+    except Exception as e:
+        logger.error(f"Error en el worker de la cola: {e}")
+    finally:
+        jobs.close()
+elif pipeline_mode:
+    # Renderizado y extracción simultáneos: cada PDF se extrae en cuanto se genera
+    logger.info("Iniciando pipeline de generación y procesamiento de PDFs")
+    pdfs_pendientes = [os.path.join(input_folder, f) for f in os.listdir(input_folder) if es_documento(f)]
+    pipeline = Pipeline(pdf_generator, parser, extraction_workers=extraction_workers,
+                        queue_size=pipeline_queue_size, on_result=guardar_resultado)
+    try:
+        asyncio.run(pipeline.run(pending_pdfs=pdfs_pendientes))
+    except Exception as e:
+        logger.error(f"Error en el pipeline: {e}")
 else:
-    df = pd.DataFrame()
-    logger.info("Nuevo archivo Excel creado")
+    # Paso 1: Generar PDFs desde sitios web
+    logger.info("Iniciando generación de PDFs a partir de las URLs")
+    try:
+        with span(metrics, "generacion", "ejecucion"):
+            asyncio.run(pdf_generator.process_all_websites())
+        logger.info("Generación de PDFs completada")
+    except Exception as e:
+        logger.error(f"Error al generar PDFs: {e}")
 
-for filename in os.listdir(input_folder):
-    if filename.endswith('.pdf'):
-        pdf_path = os.path.join(input_folder, filename)
+    # Paso 2: Procesar PDFs y extraer datos
+    logger.info("Iniciando procesamiento de PDFs")
+    if batch_mode or pack_tokens > 0:
+        pdfs = [os.path.join(input_folder, f) for f in os.listdir(input_folder) if es_documento(f)]
         try:
-            logger.info(f"Procesando archivo: {filename}")
-            overview = parser.parse_pdf(pdf_path)
-            
-            # Extraer y transformar los datos, añadiendo la fecha de ejecución
-            for precio in overview.precios:
-                precio_data = precio.model_dump()
-                precio_data['Fecha de Ejecucion'] = execution_date
-                df = pd.concat([df, pd.DataFrame([precio_data])], ignore_index=True)
-            
-            # Mover archivo procesado
-            shutil.move(pdf_path, os.path.join(processed_folder, filename))
-            logger.info(f"{filename} procesado y movido a {processed_folder}")
+            if batch_mode:
+                resultados, errores = parser.parse_batch(pdfs, batch_folder=batch_folder)
+            else:
+                resultados, errores = parser.parse_packed(pdfs, pack_tokens=pack_tokens)
+            for pdf_path, overview in resultados.items():
+                guardar_resultado(pdf_path, overview)
+            for pdf_path, error in errores.items():
+                logger.error(f"Error al procesar {os.path.basename(pdf_path)}: {error}")
         except Exception as e:
-            logger.error(f"Error al procesar {filename}: {e}")
+            logger.error(f"Error en el procesamiento por lotes: {e}")
+    else:
+        for filename in os.listdir(input_folder):
+            if es_documento(filename):
+                pdf_path = os.path.join(input_folder, filename)
+                try:
+                    logger.info(f"Procesando archivo: {filename}")
+                    overview = parser.parse_pdf(pdf_path)
+                    guardar_resultado(pdf_path, overview)
+                except Exception as e:
+                    logger.error(f"Error al procesar {filename}: {e}")
+
+    parser.close()
+
+if export_excel:
+    try:
+        store.export_excel(excel_file_path)
+        logger.info(f"Datos exportados al archivo Excel: {excel_file_path}")
+    except Exception as e:
+        logger.error(f"Error al exportar el archivo Excel: {e}")
+store.close()
 
-# Guardar el DataFrame en el archivo Excel existente sin borrar datos anteriores
-try:
-    with pd.ExcelWriter(excel_file_path, mode='w', engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
-    logger.info(f"Datos guardados en el archivo Excel: {excel_file_path}")
-except Exception as e:
-    logger.error(f"Error al guardar el archivo Excel: {e}")
+# Informe de tiempos por etapa, tokens, bytes y reintentos de la ejecución (el daemon ya lo guarda al parar)
+if not daemon_mode:
+    guardar_metricas()
 
 logger.info("Proceso completado")
-input("Presiona Enter para cerrar...")
\ No newline at end of file
+if pause_on_exit:
+    input("Presiona Enter para cerrar...")
\ No newline at end of file
@@ -0,0 +1,97 @@
+import json
+from types import SimpleNamespace
+from OpenAIPDFExtractor import PDFParser, capture_to_text
+from OpenAIPDFExtractor.cache import ExtractionCache
+
+PRECIO = dict(nombre="Octopus Energy", nombre_oferta="Octopus Relax", precio_te1=0.119, precio_te2=0.0,
+              precio_te3=0.0, precio_tp1=0.089, precio_tp2=0.026, descuento_promo=0.0, descuento_servicios=0.0,
+              tipo_producto="Fijo", calendario="ATR", abonos=0.0, permanencia="Sin permanencia",
+              comentario="", analisis="")
+
+
+def _captura(carpeta, nombre, oferta):
+    ruta = carpeta / nombre
+    ruta.write_text(json.dumps({
+        "url": f"https://octopusenergy.es/{nombre}", "fecha": "2024-06-01 10:00:00", "titulo": "Tarifas",
+        "bloques": [{"tipo": "titulo", "nivel": 2, "texto": oferta},
+                    {"tipo": "tabla", "filas": [["Energía", "0,119 €/kWh"]]}],
+    }))
+    return str(ruta)
+
+
+def _salida(custom_id, contenido, status_code=200):
+    body = {"choices": [{"message": {"content": contenido}}]}
+    return {"custom_id": custom_id, "response": {"status_code": status_code, "body": body}}
+
+
+class LotesFalsos:
+    """Sustituye el envío a la Batch API: cada ronda devuelve las salidas indicadas."""
+
+    def __init__(self, parser, rondas):
+        self.rondas = list(rondas)
+        self.enviados = []
+        self.salidas = {}
+        parser._submit_batch = self.submit
+        parser._wait_batch = lambda batch_id, poll_interval, timeout: SimpleNamespace(
+            id=batch_id, status="completed", output_file_id=batch_id, error_file_id=None)
+        parser._read_batch_output = lambda file_id: self.salidas.pop(file_id, [])
+
+    def submit(self, lineas, batch_folder):
+        batch_id = f"lote-{len(self.enviados) + 1}"
+        self.enviados.append([linea["custom_id"] for linea in lineas])
+        self.salidas[batch_id] = self.rondas.pop(0)
+        return SimpleNamespace(id=batch_id)
+
+
+def test_capture_to_text():
+    texto = capture_to_text({"url": "https://a.es", "fecha": "hoy", "titulo": "Luz", "bloques": [
+        {"tipo": "titulo", "nivel": 2, "texto": "Tarifa"},
+        {"tipo": "tabla", "filas": [["P1", "0,1"], ["P2", "0,2"]]},
+        {"tipo": "texto", "texto": "Sin permanencia"}]})
+    assert texto.splitlines() == ["Fuente: https://a.es", "Fecha de captura: hoy", "Título: Luz",
+                                  "## Tarifa", "P1 | 0,1", "P2 | 0,2", "Sin permanencia"]
+
+
+def test_batch_line_usa_el_esquema_estructurado():
+    parser = PDFParser("sk-test", model="modelo")
+    linea = parser._batch_line("doc-0", "texto")
+    assert linea["custom_id"] == "doc-0" and linea["url"] == "/v1/chat/completions"
+    assert linea["body"]["model"] == "modelo"
+    assert linea["body"]["response_format"]["type"] == "json_schema"
+
+
+def test_parse_batch_reenvia_los_elementos_invalidos(tmp_path):
+    parser = PDFParser("sk-test")
+    a = _captura(tmp_path, "a.json", "Octopus Relax")
+    b = _captura(tmp_path, "b.json", "Octopus 3")
+    valido = json.dumps({"precios": [PRECIO]})
+    lotes = LotesFalsos(parser, [
+        [_salida("doc-0", valido), _salida("doc-1", '{"precios": [{"nombre": "incompleto"}]}')],
+        [_salida("doc-1", valido)],
+    ])
+
+    resultados, errores = parser.parse_batch([a, b], batch_folder=str(tmp_path / "lotes"), max_rounds=2)
+    assert lotes.enviados == [["doc-0", "doc-1"], ["doc-1"]]
+    assert set(resultados) == {a, b} and errores == {}
+
+
+def test_parse_batch_informa_los_que_siguen_fallando(tmp_path):
+    parser = PDFParser("sk-test")
+    a = _captura(tmp_path, "a.json", "Octopus Relax")
+    LotesFalsos(parser, [[_salida("doc-0", "{}", status_code=500)], []])
+
+    resultados, errores = parser.parse_batch([a], batch_folder=str(tmp_path / "lotes"), max_rounds=2)
+    assert resultados == {}
+    assert errores[a] == "Sin resultado en el lote lote-2"
+
+
+def test_parse_batch_no_envia_lo_que_esta_en_cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    parser = PDFParser("sk-test", cache=cache)
+    a = _captura(tmp_path, "a.json", "Octopus Relax")
+    cache.put(parser.cache_key(a, parser.extract_text(a)), {"precios": [PRECIO]})
+    lotes = LotesFalsos(parser, [])
+
+    resultados, errores = parser.parse_batch([a], batch_folder=str(tmp_path / "lotes"))
+    assert lotes.enviados == []
+    assert resultados[a].precios[0].nombre_oferta == "Octopus Relax" and errores == {}
@@ -0,0 +1,66 @@
+import os
+import time
+from OpenAIPDFExtractor.cache import ExtractionCache, hash_text
+
+
+def _envejecer(ruta, dias):
+    antes = time.time() - dias * 86400
+    os.utime(ruta, (antes, antes))
+
+
+def test_hash_text_ignora_espacios_y_mayusculas():
+    assert hash_text("Precio  0,119\n€/kWh") == hash_text("precio 0,119 €/kwh")
+
+
+def test_make_key_cambia_con_el_modelo():
+    assert ExtractionCache.make_key("doc", "esquema", "a") != ExtractionCache.make_key("doc", "esquema", "b")
+
+
+def test_put_y_get(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    clave = ExtractionCache.make_key("doc", "esquema", "modelo")
+    assert cache.get(clave) is None
+    cache.put(clave, {"precios": []}, model="modelo")
+    assert cache.get(clave) == {"precios": []}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_por_antiguedad_respeta_otros_archivos(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_age_days=30)
+    antigua = ExtractionCache.make_key("antigua", "esquema", "modelo")
+    reciente = ExtractionCache.make_key("reciente", "esquema", "modelo")
+    cache.put(antigua, {})
+    cache.put(reciente, {})
+    segmentacion = tmp_path / "segmentacion.json"
+    segmentacion.write_text("{}")
+    _envejecer(cache._path(antigua), 40)
+    _envejecer(segmentacion, 40)
+
+    ExtractionCache(str(tmp_path), max_age_days=30)
+    assert not os.path.exists(cache._path(antigua))
+    assert os.path.exists(cache._path(reciente))
+    assert segmentacion.exists()
+
+
+def test_evict_por_tamano_elimina_las_menos_usadas(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=None)
+    claves = [ExtractionCache.make_key(str(i), "esquema", "modelo") for i in range(3)]
+    for i, clave in enumerate(claves):
+        cache.put(clave, {"relleno": "x" * 1000})
+        _envejecer(cache._path(clave), 3 - i)
+    (tmp_path / "segmentacion.json").write_text("x" * 10000)
+    # Caben justo las dos entradas más recientes
+    limite = sum(os.path.getsize(cache._path(c)) for c in claves[1:])
+
+    ExtractionCache(str(tmp_path), max_bytes=limite)
+    assert [os.path.exists(cache._path(c)) for c in claves] == [False, True, True]
+    assert (tmp_path / "segmentacion.json").exists()
+
+
+def test_put_solo_desaloja_cada_evict_every_escrituras(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path), evict_every=10)
+    llamadas = []
+    monkeypatch.setattr(cache, "evict", lambda: llamadas.append(1))
+    for i in range(25):
+        cache.put(ExtractionCache.make_key(str(i), "esquema", "modelo"), {})
+    assert len(llamadas) == 2
@@ -0,0 +1,37 @@
+import json
+import asyncio
+import pytest
+from Benchmark.sites import SiteFixtureServer
+from PDFGenerator import PDFGenerator
+
+async_api = pytest.importorskip("playwright.async_api")
+
+
+def test_captura_de_texto_de_una_pagina_de_prueba(tmp_path):
+    websites = tmp_path / "websites.txt"
+
+    async def capturar(url):
+        generador = PDFGenerator(str(websites), output_folder=str(tmp_path / "temp_pdf"), headless=True,
+                                 capture="text", storage_state_folder=str(tmp_path / "storage_state"))
+        async with async_api.async_playwright() as p:
+            try:
+                browser = await p.chromium.launch(headless=True)
+            except Exception as e:
+                pytest.skip(f"Chromium no disponible: {e}")
+            try:
+                return await generador.generate_pdf(url, browser)
+            finally:
+                await browser.close()
+
+    with SiteFixtureServer(js_delay_ms=0) as sites:
+        url = sites.urls(1)[0]
+        websites.write_text(url)
+        resultado = asyncio.run(capturar(url))
+
+    assert resultado["error"] is None
+    with open(resultado["captura"], encoding="utf-8") as file:
+        bloques = json.load(file)["bloques"]
+    assert bloques
+    assert any(b["tipo"] == "titulo" and "Tarifa" in b["texto"] for b in bloques)
+    tablas = [b for b in bloques if b["tipo"] == "tabla"]
+    assert tablas and any("€/kWh" in celda for fila in tablas[0]["filas"] for celda in fila)
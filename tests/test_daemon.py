@@ -0,0 +1,130 @@
+import time
+import asyncio
+from Daemon import MonitorDaemon, parse_interval, load_schedule
+
+
+class Generador:
+    websites_file = None
+    concurrency = 1
+    timestamp = None
+
+    def __init__(self, resultado):
+        self.resultado = resultado
+
+    async def generate_pdf_limited(self, url, browser, semaforo, queue=None):
+        return self.resultado
+
+
+class Parser:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def aparse_pdf(self, documento):
+        if self.error is not None:
+            raise self.error
+        return "overview"
+
+
+def _comprobar(daemon, url):
+    """Renderiza y extrae una URL como lo haría el bucle del daemon."""
+    async def _ejecutar():
+        cola = asyncio.Queue()
+        worker = asyncio.create_task(daemon.pipeline.extraction_worker(cola, 1))
+        daemon.proximas[url] = float("inf")
+        await daemon._render(url, None, asyncio.Semaphore(1), cola)
+        await cola.put(None)
+        await worker
+    asyncio.run(_ejecutar())
+
+
+def _daemon(resultado, parser, guardados):
+    daemon = MonitorDaemon(Generador(resultado), parser, on_result=lambda d, o: guardados.append(d),
+                           retry_seconds=60)
+    daemon.programa = {"https://a": 3600.0}
+    return daemon
+
+
+def test_comprobacion_correcta_programa_el_intervalo():
+    guardados = []
+    daemon = _daemon({"pdf": "a.pdf", "captura": None}, Parser(), guardados)
+    _comprobar(daemon, "https://a")
+    assert guardados == ["a.pdf"]
+    assert daemon.proximas["https://a"] - daemon.ultimas["https://a"] == 3600.0
+    assert (daemon.renderizados, daemon.extraidos, daemon.errores) == (1, 1, 0)
+
+
+def test_extraccion_fallida_reintenta_sin_marcar_la_url():
+    guardados = []
+    daemon = _daemon({"pdf": "a.pdf", "captura": None}, Parser(error=RuntimeError("API")), guardados)
+    _comprobar(daemon, "https://a")
+    assert guardados == []
+    assert "https://a" not in daemon.ultimas
+    assert daemon.proximas["https://a"] <= time.time() + 60
+    assert (daemon.renderizados, daemon.extraidos, daemon.errores) == (1, 0, 1)
+
+
+def test_renderizado_fallido_reintenta():
+    daemon = _daemon({"pdf": None, "captura": None}, Parser(), [])
+    _comprobar(daemon, "https://a")
+    assert "https://a" not in daemon.ultimas
+    assert daemon.proximas["https://a"] <= time.time() + 60
+    assert daemon.errores == 1
+
+
+def test_parse_interval_y_load_schedule(tmp_path):
+    assert parse_interval("90") == 90
+    assert parse_interval("30m") == 1800
+    assert parse_interval("1d") == 86400
+    websites = tmp_path / "websites.txt"
+    websites.write_text("https://a 6h\n\nhttps://b\nhttps://c mañana\n")
+    assert load_schedule(str(websites), 100.0) == {"https://a": 21600.0, "https://b": 100.0, "https://c": 100.0}
+
+
+class PlaywrightFalso:
+    """Sustituye async_playwright: el navegador no hace nada, los renderizados los simula Generador."""
+
+    def __init__(self):
+        self.chromium = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def launch(self, headless=True):
+        return self
+
+    async def close(self):
+        pass
+
+
+class GeneradorLento(Generador):
+    async def generate_pdf_limited(self, url, browser, semaforo, queue=None):
+        await asyncio.sleep(0.2)
+        return {"pdf": f"{url[-1]}.pdf", "captura": None}
+
+
+def test_run_no_gira_en_vacio_con_el_pool_lleno(tmp_path, monkeypatch):
+    websites = tmp_path / "websites.txt"
+    websites.write_text("https://a/1\nhttps://a/2\nhttps://a/3\nhttps://a/4\n")
+    generador = GeneradorLento(None)
+    generador.websites_file = str(websites)
+    parser = Parser()
+    parser.aclose = lambda: asyncio.sleep(0)
+    guardados = []
+    daemon = MonitorDaemon(generador, parser, on_result=lambda d, o: guardados.append(d), spread_seconds=0)
+    monkeypatch.setattr("Daemon.async_playwright", PlaywrightFalso)
+    vueltas = []
+    plan = daemon._plan
+    monkeypatch.setattr(daemon, "_plan", lambda ahora: (vueltas.append(ahora), plan(ahora)))
+
+    async def _ejecutar():
+        # Cuatro URLs vencidas y un único hueco de renderizado durante ~0,9 s
+        asyncio.get_running_loop().call_later(0.9, daemon.stop)
+        await daemon.run()
+
+    asyncio.run(_ejecutar())
+    assert sorted(guardados) == ["1.pdf", "2.pdf", "3.pdf", "4.pdf"]
+    # Una vuelta por renderizado terminado (más la inicial), no miles
+    assert len(vueltas) < 10
@@ -0,0 +1,103 @@
+import time
+import asyncio
+from JobQueue import JobQueue, QueueWorker, FAILED
+
+
+def _cola(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "trabajos.db"), **kwargs)
+
+
+def _caducar(jobs, job_id):
+    jobs.conn.execute("UPDATE trabajos SET lease_hasta = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_enqueue_conserva_el_estado_al_reanudar(tmp_path):
+    jobs = _cola(tmp_path)
+    assert jobs.enqueue_urls("d1", ["https://a/1", "https://a/2"]) == 2
+    trabajo = jobs.lease("d1", "render", "w1")
+    assert jobs.complete(trabajo["id"], "render", "w1", documento=str(tmp_path / "a.pdf"))
+    assert jobs.enqueue_urls("d1", ["https://a/1", "https://a/2", "https://a/3"]) == 1
+    assert jobs.summary("d1") == {"pending": 2, "rendered": 1}
+
+
+def test_documentos_pendientes_se_reencolan_en_otra_ejecucion(tmp_path):
+    jobs = _cola(tmp_path, max_attempts=1)
+    documento = str(tmp_path / "temp_pdf" / "a.pdf")
+    assert jobs.enqueue_documents("d1", [documento]) == 1
+    assert jobs.enqueue_documents("d1", [documento]) == 0
+    trabajo = jobs.lease("d1", "extract", "w1")
+    assert jobs.fail(trabajo["id"], "extract", "w1", "error") == FAILED
+    # Al día siguiente el documento que quedó en temp_pdf se vuelve a intentar
+    assert jobs.enqueue_documents("d2", [documento]) == 1
+
+
+def test_lease_no_entrega_un_trabajo_arrendado(tmp_path):
+    jobs = _cola(tmp_path)
+    jobs.enqueue_documents("d1", ["a.pdf"])
+    assert jobs.lease("d1", "extract", "w1") is not None
+    assert jobs.lease("d1", "extract", "w2") is None
+
+
+def test_arrendamiento_caducado_solo_lo_completa_el_nuevo_worker(tmp_path):
+    jobs = _cola(tmp_path)
+    jobs.enqueue_documents("d1", ["a.pdf"])
+    primero = jobs.lease("d1", "extract", "w1")
+    _caducar(jobs, primero["id"])
+    segundo = jobs.lease("d1", "extract", "w2")
+    assert segundo["id"] == primero["id"]
+    assert segundo["intentos"] == 1
+
+    assert not jobs.renew(primero["id"], "extract", "w1")
+    assert not jobs.complete(primero["id"], "extract", "w1")
+    assert jobs.fail(primero["id"], "extract", "w1", "tarde") is None
+    assert jobs.renew(segundo["id"], "extract", "w2")
+    assert jobs.complete(segundo["id"], "extract", "w2")
+    assert not jobs.complete(segundo["id"], "extract", "w2")
+    assert jobs.summary("d1") == {"extracted": 1}
+
+
+def test_arrendamientos_caducados_cuentan_como_intentos(tmp_path):
+    jobs = _cola(tmp_path, max_attempts=2)
+    jobs.enqueue_documents("d1", ["a.pdf"])
+    for worker in ("w1", "w2"):
+        trabajo = jobs.lease("d1", "extract", worker)
+        _caducar(jobs, trabajo["id"])
+    assert jobs.lease("d1", "extract", "w3") is None
+    fallido, = jobs.failures("d1")
+    assert fallido["intentos"] == 2
+    assert "Arrendamiento caducado" in fallido["error"]
+
+
+def test_fallos_hasta_max_attempts(tmp_path):
+    jobs = _cola(tmp_path, max_attempts=2)
+    jobs.enqueue_urls("d1", ["https://a/1"])
+    trabajo = jobs.lease("d1", "render", "w1")
+    assert jobs.fail(trabajo["id"], "render", "w1", "timeout") == "pending"
+    trabajo = jobs.lease("d1", "render", "w1")
+    assert jobs.fail(trabajo["id"], "render", "w1", "timeout") == FAILED
+    assert jobs.remaining("d1", "render") == 0
+
+
+def test_worker_no_guarda_si_pierde_el_arrendamiento(tmp_path, monkeypatch):
+    jobs = _cola(tmp_path)
+    jobs.enqueue_documents("d1", ["a.pdf"])
+    guardados = []
+
+    class Parser:
+        async def aparse_pdf(self, documento):
+            # Mientras se extrae, el arrendamiento caduca y otro worker toma el trabajo
+            _caducar(jobs, 1)
+            jobs.lease("d1", "extract", "otro")
+            return "overview"
+
+        async def aclose(self):
+            pass
+
+    worker = QueueWorker(jobs, "d1", parser=Parser(), on_result=lambda d, o: guardados.append(d),
+                         extraction_workers=1, poll_interval=0, worker_id="w1")
+    # El trabajo sigue en manos del otro worker: este termina en lugar de esperar
+    monkeypatch.setattr(jobs, "remaining", lambda ejecucion, etapa: 0)
+    asyncio.run(worker.run())
+    assert guardados == []
+    assert worker.procesados["extract"] == 0 and worker.errores["extract"] == 0
+    assert jobs.summary("d1") == {"extracting": 1}
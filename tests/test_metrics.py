@@ -0,0 +1,55 @@
+import pytest
+from Metrics import RunMetrics, percentile
+
+
+def test_percentile_rango_mas_cercano():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 95) == 3.0
+    valores = list(range(1, 21))
+    assert percentile(valores, 50) == 10
+    assert percentile(valores, 95) == 19
+    assert percentile(valores, 100) == 20
+    assert percentile([4, 1, 3, 2], 50) == 2
+
+
+def test_summary_por_etapa_y_dominio():
+    metricas = RunMetrics("prueba")
+    metricas.record("espera", "u1", "a.es", 1.0)
+    metricas.record("espera", "u2", "a.es", 3.0)
+    metricas.record("espera", "u3", "b.es", 2.0, ok=False, error="timeout")
+    with pytest.raises(RuntimeError):
+        with metricas.span("parse", "d1"):
+            raise RuntimeError("API")
+
+    resumen = metricas.summary()
+    assert resumen["etapas"]["espera"] == {"n": 3, "errores": 1, "p50": 2.0, "p95": 3.0, "max": 3.0, "total": 6.0}
+    assert resumen["etapas"]["parse"]["errores"] == 1
+    assert resumen["etapas_por_dominio"]["espera"]["a.es"]["n"] == 2
+    assert "parse" not in resumen["etapas_por_dominio"]
+
+
+def test_reset_conserva_los_contadores():
+    metricas = RunMetrics()
+    metricas.record("pdf", "u1", duracion=1.0)
+    metricas.count("tokens_entrada", 100)
+    metricas.reset()
+    assert metricas.summary()["etapas"] == {}
+    assert metricas.counters == {("tokens_entrada", None): 100}
+
+
+def test_to_prometheus():
+    metricas = RunMetrics()
+    metricas.record("espera", "u1", 'dominio"raro', 2.0)
+    metricas.count("bytes_pdf", 10, dominio="a.es")
+    metricas.count("bytes_pdf", 5, dominio="b.es")
+    metricas.set("concurrencia_openai", 4)
+    metricas.set("modo", "batch")
+    lineas = metricas.to_prometheus().splitlines()
+
+    assert 'scraper_stage_duration_seconds{stage="espera",quantile="0.95"} 2.0' in lineas
+    assert 'scraper_stage_duration_seconds_count{stage="espera",domain="dominio\\"raro"} 1' in lineas
+    assert 'scraper_stage_errors_total{stage="espera"} 0' in lineas
+    assert lineas.count("# TYPE scraper_bytes_pdf_total counter") == 1
+    assert 'scraper_bytes_pdf_total{domain="b.es"} 5' in lineas
+    assert "scraper_concurrencia_openai 4" in lineas
+    assert not any("modo" in linea for linea in lineas)
@@ -0,0 +1,72 @@
+import time
+import asyncio
+from PDFGenerator import PDFGenerator
+
+
+class PaginaInquieta:
+    """Página simulada que nunca llega a networkidle ni deja de mutar: cada espera agota su timeout."""
+
+    url = "https://www.iberdrola.es/luz/plan-estable"
+
+    def __init__(self):
+        self.esperas = []
+
+    async def _esperar(self, timeout):
+        self.esperas.append(timeout)
+        await asyncio.sleep(timeout / 1000)
+
+    async def wait_for_load_state(self, state, timeout):
+        await self._esperar(timeout)
+        raise TimeoutError(state)
+
+    async def wait_for_selector(self, selector, state, timeout):
+        await self._esperar(timeout)
+        raise TimeoutError(selector)
+
+    async def evaluate(self, script, args):
+        await self._esperar(args[1])
+
+    def locator(self, selector):
+        return BotonVisible(self)
+
+    async def query_selector(self, selector):
+        return BotonVisible(self)
+
+
+class BotonVisible:
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.first = self
+
+    async def is_visible(self):
+        return True
+
+    async def click(self, timeout=None):
+        pass
+
+    async def wait_for(self, state, timeout):
+        await self.pagina._esperar(timeout)
+        raise TimeoutError(state)
+
+
+def test_prepare_page_respeta_un_unico_limite(tmp_path):
+    websites = tmp_path / "websites.txt"
+    websites.write_text(PaginaInquieta.url)
+    generador = PDFGenerator(str(websites), output_folder=str(tmp_path / "temp_pdf"),
+                             readiness={"iberdrola.es": {"timeout": 400, "selector": "button"}})
+    pagina = PaginaInquieta()
+
+    inicio = time.perf_counter()
+    asyncio.run(generador.prepare_page(pagina, None, pagina.url))
+    duracion = time.perf_counter() - inicio
+
+    # Red, selector, DOM estable, banner de cookies, 'Ver más' y DOM final comparten los 400 ms
+    assert len(pagina.esperas) == 6
+    assert duracion < 0.6
+
+
+def test_remaining_ms():
+    assert PDFGenerator.remaining_ms(None) is None
+    assert PDFGenerator.remaining_ms(time.perf_counter() - 1) == 1
+    assert PDFGenerator.remaining_ms(time.perf_counter() - 1, minimo=1000) == 1000
+    assert 1500 < PDFGenerator.remaining_ms(time.perf_counter() + 2) <= 2000
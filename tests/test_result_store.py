@@ -0,0 +1,75 @@
+import os
+import shutil
+import pandas as pd
+from OpenAIPDFExtractor import Overview, Precio
+from ResultStore import ResultStore, EXCEL_DATE_COLUMN
+
+EJEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output", "output_example.xlsx")
+
+PRECIO = dict(nombre="Octopus Energy", nombre_oferta="Octopus Relax", precio_te1=0.119, precio_te2=0.0,
+              precio_te3=0.0, precio_tp1=0.089, precio_tp2=0.026, descuento_promo=0.0, descuento_servicios=0.0,
+              tipo_producto="Fijo", calendario="ATR", abonos=0.0, permanencia="Sin permanencia",
+              comentario="", analisis="")
+
+
+def test_export_mantiene_el_orden_de_precio(tmp_path):
+    store = ResultStore(str(tmp_path / "resultados.db"))
+    store.add_document(Overview(precios=[Precio(**PRECIO)]), "2024-06-01 10:00:00", documento="a.pdf")
+    excel = tmp_path / "resultados.xlsx"
+    assert store.export_excel(str(excel)) == 1
+    store.close()
+
+    columnas = pd.read_excel(excel).columns.tolist()
+    assert columnas == list(Precio.model_fields) + [EXCEL_DATE_COLUMN]
+
+
+def test_import_excel_sin_columna_de_fecha(tmp_path):
+    excel = tmp_path / "resultados_procesados.xlsx"
+    shutil.copy(EJEMPLO, excel)
+    store = ResultStore(str(tmp_path / "resultados.db"))
+    assert store.import_excel(str(excel)) == len(pd.read_excel(EJEMPLO))
+
+    df = store.query()
+    store.close()
+    assert df["fecha_ejecucion"].notna().all()
+    assert df.columns.tolist()[2:5] == ["nombre", "nombre_oferta", "precio_te1"]
+
+
+def test_import_y_export_conservan_las_filas(tmp_path):
+    origen = ResultStore(str(tmp_path / "origen.db"))
+    origen.add_rows([PRECIO, {**PRECIO, "nombre_oferta": "Octopus 3"}], "2024-06-01 10:00:00")
+    origen.add_rows([{**PRECIO, "nombre": "Endesa"}], "2024-06-02 10:00:00")
+    excel = tmp_path / "historico.xlsx"
+    origen.export_excel(str(excel))
+    origen.close()
+
+    destino = ResultStore(str(tmp_path / "destino.db"))
+    assert destino.import_excel(str(excel)) == 3
+    assert destino.query(desde="2024-06-02")["nombre"].tolist() == ["Endesa"]
+    assert destino.query(comercializadora="octopus")["nombre_oferta"].tolist() == ["Octopus Relax", "Octopus 3"]
+    destino.close()
+
+
+def test_dos_procesos_sobre_una_base_de_datos_nueva(tmp_path):
+    ruta = str(tmp_path / "resultados.db")
+    primero, segundo = ResultStore(ruta, wal=False), ResultStore(ruta, wal=False)
+    # El primero crea las columnas de Precio; el segundo las abrió sin ellas
+    assert primero.add_document(Overview(precios=[Precio(**PRECIO)]), "2024-06-01 10:00:00", documento="a.pdf") == 1
+    assert segundo.add_document(Overview(precios=[Precio(**PRECIO)]), "2024-06-01 10:00:00", documento="b.pdf") == 1
+    assert segundo.query(comercializadora="octopus")["documento"].tolist() == ["a.pdf", "b.pdf"]
+    assert primero.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    primero.close()
+    segundo.close()
+
+
+def test_import_excel_if_empty_importa_una_sola_vez(tmp_path):
+    ruta = str(tmp_path / "resultados.db")
+    primero, segundo = ResultStore(ruta), ResultStore(ruta)
+    # Los dos workers ven la base de datos vacía al arrancar
+    assert primero.count() == segundo.count() == 0
+    filas = primero.import_excel(EJEMPLO, if_empty=True)
+    assert filas == len(pd.read_excel(EJEMPLO))
+    assert segundo.import_excel(EJEMPLO, if_empty=True) == 0
+    assert segundo.count() == filas
+    primero.close()
+    segundo.close()
@@ -0,0 +1,152 @@
+import json
+import pytest
+from OpenAIPDFExtractor import PDFParser
+from OpenAIPDFExtractor.rules import RuleExtractor, to_float
+
+TEXTO = "\n".join([
+    "Fuente: https://www.iberdrola.es/luz/plan-estable",
+    "Fecha de captura: 2024-06-01T10:00:00",
+    "Título: Plan Estable",
+    "# Plan Estable",
+    "Energía: 0,119 €/kWh",
+    "Potencia P1 | 0,0866 €/kW día",
+    "Potencia P2 | 0,0129 €/kW día",
+    "Descuento 10% el primer año",
+])
+DOCUMENTO = "www_iberdrola_es_0123456789_20240601_100000.json"
+
+PRECIO = {
+    "nombre": "Iberdrola", "nombre_oferta": "Plan Estable",
+    "precio_te1": 0.119, "precio_te2": 0.119, "precio_te3": 0.119,
+    "precio_tp1": 0.0866, "precio_tp2": 0.0129,
+    "descuento_promo": 10.0, "descuento_servicios": 0.0, "tipo_producto": "fijo", "calendario": "ATR",
+    "abonos": 0.0, "permanencia": "Sin permanencia",
+    "comentario": "Precio fijo 12 meses", "analisis": "Oferta competitiva frente a la media del mercado.",
+}
+
+
+def _propuesta(tmp_path):
+    with open(tmp_path / "propuestas" / "www_iberdrola_es.json", encoding="utf-8") as file:
+        return json.load(file)["reglas"][0]
+
+
+def test_to_float_formatos():
+    assert to_float("0,119") == 0.119
+    assert to_float("1.234,5") == 1234.5
+    assert to_float("12") == 12.0
+
+
+@pytest.mark.parametrize("spec", [
+    {"regex": r"Título:\s+(\w+)", "tipo": "numero"},  # captura texto, no un número
+    {"regex": r"Energía: (\d+", "tipo": "numero"},  # expresión inválida
+    {"regex": r"Energía: \d+", "grupo": 2, "tipo": "numero"},  # grupo inexistente
+])
+def test_apply_rule_devuelve_none_si_la_regla_no_se_puede_aplicar(spec):
+    assert RuleExtractor.apply_rule({"precios": [{"precio_te1": spec}]}, TEXTO) is None
+
+
+def test_apply_rule_lee_los_importes():
+    regla = {"precios": [{"nombre": "Iberdrola",
+                          "precio_te1": {"regex": r"Energía:\s+(\d+(?:[.,]\d+)?)\s+€/kWh", "tipo": "numero"}}]}
+    assert RuleExtractor.apply_rule(regla, TEXTO) == [{"nombre": "Iberdrola", "precio_te1": 0.119}]
+
+
+def test_extract_con_regla_invalida_no_lanza(tmp_path):
+    (tmp_path / "www_iberdrola_es.json").write_text(json.dumps({"reglas": [
+        {"si": "Plan Estable", "precios": [{"precio_te1": {"regex": r"Título:\s+(\w+)", "tipo": "numero"}}]},
+    ]}), encoding="utf-8")
+    reglas = RuleExtractor(str(tmp_path))
+    assert reglas.extract(DOCUMENTO, TEXTO) is None
+    assert reglas.misses == 1
+
+
+def test_prepare_usa_el_modelo_si_la_regla_falla(tmp_path):
+    (tmp_path / "www_iberdrola_es.json").write_text(json.dumps({"reglas": [
+        {"precios": [{"precio_te1": {"regex": r"(Plan) Estable", "tipo": "numero"}}]},
+    ]}), encoding="utf-8")
+    documento = tmp_path / DOCUMENTO
+    documento.write_text(json.dumps({"url": "https://www.iberdrola.es/luz/plan-estable", "fecha": "2024-06-01",
+                                     "titulo": "Plan Estable",
+                                     "bloques": [{"tipo": "texto", "texto": "Energía: 0,119 €/kWh"}]}), encoding="utf-8")
+    parser = PDFParser("sk-test", mode="text", rules=RuleExtractor(str(tmp_path)))
+    texto, clave, overview = parser._prepare(str(documento))
+    assert overview is None
+    assert "0,119" in texto
+
+
+def test_propuesta_verificada_lee_los_importes_del_texto(tmp_path):
+    RuleExtractor(str(tmp_path)).propose(DOCUMENTO, TEXTO, [PRECIO])
+    regla = _propuesta(tmp_path)
+    assert regla["verificada"] is True
+    assert regla["si"] == "Plan\\ Estable"
+    plantilla = regla["precios"][0]
+    for campo in ("precio_te1", "precio_tp1", "precio_tp2", "descuento_promo"):
+        assert isinstance(plantilla[campo], dict), campo
+    # El texto libre del modelo no se copia a la regla
+    assert plantilla["comentario"] == "" and plantilla["analisis"] == ""
+    # La regla sigue la tarifa cuando cambia el precio
+    aplicada = RuleExtractor.apply_rule(regla, TEXTO.replace("0,119", "0,125"))
+    assert aplicada[0]["precio_te1"] == 0.125
+
+
+def test_propuesta_con_importes_fijos_no_se_verifica(tmp_path):
+    precio = {**PRECIO, "precio_te1": 0.2, "precio_te2": 0.2, "precio_te3": 0.2}
+    RuleExtractor(str(tmp_path)).propose(DOCUMENTO, TEXTO, [precio])
+    regla = _propuesta(tmp_path)
+    assert regla["precios"][0]["precio_te1"] == 0.2
+    assert regla["verificada"] is False
+
+
+def test_propuestas_se_combinan_por_condicion(tmp_path):
+    reglas = RuleExtractor(str(tmp_path))
+    reglas.propose(DOCUMENTO, TEXTO, [PRECIO])
+    reglas.propose(DOCUMENTO, TEXTO.replace("Plan Estable", "Plan Online"), [{**PRECIO, "nombre_oferta": "Plan Online"}])
+    reglas.propose(DOCUMENTO, TEXTO, [PRECIO])
+    with open(tmp_path / "propuestas" / "www_iberdrola_es.json", encoding="utf-8") as file:
+        condiciones = [r["si"] for r in json.load(file)["reglas"]]
+    assert sorted(condiciones) == ["Plan\\ Estable", "Plan\\ Online"]
+
+
+
+def _texto_pdf(oferta, energia, potencia):
+    # Capa de texto de un PDF: sin cabecera "Fuente:" ni "Título:"
+    return "\n".join([oferta, f"Término de energía {energia} €/kWh", f"Término de potencia P1 {potencia} €/kW día",
+                      f"Término de potencia P2 {potencia} €/kW día"])
+
+
+def _precio_endesa(oferta, energia, potencia):
+    energia, potencia = to_float(energia), to_float(potencia)
+    return {**PRECIO, "nombre": "Endesa", "nombre_oferta": oferta, "precio_te1": energia, "precio_te2": energia,
+            "precio_te3": energia, "precio_tp1": potencia, "precio_tp2": potencia, "descuento_promo": 0.0}
+
+
+def test_reglas_de_dos_pdfs_del_mismo_dominio_no_se_mezclan(tmp_path):
+    paginas = [("www_endesa_com_aaaaaaaaaa", "One Luz", "0,1299", "0,0904"),
+               ("www_endesa_com_bbbbbbbbbb", "Conecta", "0,1449", "0,1041")]
+    reglas = RuleExtractor(str(tmp_path))
+    for pagina, oferta, energia, potencia in paginas:
+        reglas.propose(f"{pagina}_20240601_100000.pdf", _texto_pdf(oferta, energia, potencia),
+                       [_precio_endesa(oferta, energia, potencia)])
+
+    propuesta = tmp_path / "propuestas" / "www_endesa_com.json"
+    with open(propuesta, encoding="utf-8") as file:
+        propuestas = json.load(file)["reglas"]
+    assert [r["pagina"] for r in propuestas] == [pagina for pagina, *_ in paginas]
+    assert all(r["verificada"] for r in propuestas)
+
+    # Activada la propuesta, cada PDF usa solo la regla de su página
+    (tmp_path / "www_endesa_com.json").write_text(propuesta.read_text(encoding="utf-8"), encoding="utf-8")
+    activas = RuleExtractor(str(tmp_path))
+    for pagina, oferta, _, _ in paginas:
+        precio, = activas.extract(f"{pagina}_20240701_100000.pdf", _texto_pdf(oferta, "0,2", "0,1"))["precios"]
+        assert (precio["nombre_oferta"], precio["precio_te1"], precio["precio_tp1"]) == (oferta, 0.2, 0.1)
+    # Una página nueva del dominio no tiene regla
+    assert activas.extract("www_endesa_com_cccccccccc_20240701_100000.pdf", _texto_pdf("Tempo", "0,2", "0,1")) is None
+
+
+def test_propuesta_sin_pagina_no_se_verifica(tmp_path, monkeypatch):
+    monkeypatch.setattr("OpenAIPDFExtractor.rules.page_key", lambda document_path, text: None)
+    RuleExtractor(str(tmp_path)).propose(DOCUMENTO, TEXTO, [PRECIO])
+    regla = _propuesta(tmp_path)
+    assert "pagina" not in regla
+    assert regla["verificada"] is False
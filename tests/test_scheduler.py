@@ -0,0 +1,118 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from OpenAIPDFExtractor.scheduler import RateLimitScheduler, TokenBucket, parse_reset
+
+
+def _respuesta(**cabeceras):
+    return httpx.Response(200, headers=cabeceras, request=httpx.Request("POST", "https://api.openai.com/v1"))
+
+
+def test_parse_reset():
+    assert parse_reset("") == 0.0
+    assert parse_reset("2.5") == 2.5
+    assert parse_reset("1s") == 1.0
+    assert parse_reset("120ms") == pytest.approx(0.12)
+    assert parse_reset("6m0s") == 360.0
+    assert parse_reset("1h2m3s") == 3723.0
+
+
+def test_token_bucket_espera_proporcional():
+    cubo = TokenBucket(60)
+    assert cubo.wait_time(60) == 0.0
+    cubo.take(60)
+    # 60 por minuto: uno por segundo
+    assert 9.9 < cubo.wait_time(10) <= 10.0
+    # Una petición mayor que la capacidad solo espera a que el cubo se llene
+    assert cubo.wait_time(1000) <= 60.0
+
+
+def test_token_bucket_sync_sin_saldo_espera_al_reinicio():
+    cubo = TokenBucket(600)
+    cubo.sync(limit=1200, remaining=0, reset=30)
+    assert cubo.capacity == 1200
+    assert 29.9 < cubo.wait_time(1) <= 30.1
+
+
+def test_observe_response_ajusta_los_cubos():
+    planificador = RateLimitScheduler(requests_per_minute=500, tokens_per_minute=30000)
+    planificador.observe_response(_respuesta(**{
+        "x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "10",
+        "x-ratelimit-reset-requests": "1s", "x-ratelimit-limit-tokens": "20000",
+        "x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "6s",
+    }))
+    assert planificador.requests.capacity == 100
+    assert planificador.requests.level <= 10
+    assert planificador.tokens.capacity == 20000
+    assert planificador.tokens.wait_time(1) > 5
+
+
+def test_concurrencia_aimd():
+    planificador = RateLimitScheduler(initial_concurrency=8, max_concurrency=9)
+    planificador.in_flight = 2
+    planificador._release(False, rate_limited=True)
+    assert planificador.concurrency == 4
+    planificador._release(True)
+    assert planificador.concurrency == 4.25
+    assert planificador.rate_limited == 1
+
+
+def test_rafaga_de_429_reduce_la_concurrencia_una_vez():
+    planificador = RateLimitScheduler(initial_concurrency=16, max_concurrency=32)
+    epocas = [planificador._acquire(1) for _ in range(16)]
+    # Las 16 llamadas en vuelo reciben un 429: un único evento de congestión
+    for epoca in epocas:
+        planificador._release(False, rate_limited=True, epoca=epoca)
+    assert planificador.concurrency == 8
+    assert planificador.rate_limited == 16 and planificador.in_flight == 0
+
+    # Un 429 de una llamada lanzada después de la reducción sí vuelve a reducir
+    planificador._release(False, rate_limited=True, epoca=planificador._acquire(1))
+    assert planificador.concurrency == 4
+
+
+def test_rafaga_de_429_concurrentes():
+    planificador = RateLimitScheduler(initial_concurrency=16, max_concurrency=32, base_delay=0, max_retries=1)
+    peticion = httpx.Request("POST", "https://api.openai.com/v1")
+    limitadas = set()
+
+    async def llamada(numero):
+        await asyncio.sleep(0.01)
+        if numero not in limitadas:
+            limitadas.add(numero)
+            raise openai.RateLimitError("429", response=httpx.Response(429, request=peticion), body=None)
+        return numero
+
+    async def _ejecutar():
+        return await asyncio.gather(*(planificador.acall(lambda n=n: llamada(n), estimated_tokens=1) for n in range(16)))
+
+    assert asyncio.run(_ejecutar()) == list(range(16))
+    assert planificador.rate_limited == 16
+    assert planificador.concurrency >= 8
+
+
+def test_call_reintenta_errores_transitorios():
+    planificador = RateLimitScheduler(base_delay=0, max_retries=2)
+    intentos = []
+
+    def llamada():
+        intentos.append(1)
+        if len(intentos) < 3:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1"))
+        return "ok"
+
+    assert planificador.call(llamada) == "ok"
+    assert len(intentos) == 3 and planificador.retries == 2
+    assert planificador.in_flight == 0
+
+
+def test_call_no_reintenta_otros_errores():
+    planificador = RateLimitScheduler(base_delay=0)
+
+    def llamada():
+        raise ValueError("esquema")
+
+    with pytest.raises(ValueError):
+        planificador.call(llamada)
+    assert planificador.retries == 0 and planificador.in_flight == 0
@@ -0,0 +1,60 @@
+from OpenAIPDFExtractor.segmentation import PricingSegmenter
+
+MENU = ["Inicio", "Luz", "Gas", "Atención al cliente", "Aviso legal"]
+
+
+def _captura(url, cuerpo):
+    return "\n".join([f"Fuente: {url}", "Título: Tarifas", *MENU, *cuerpo])
+
+
+def test_page_identity():
+    assert PricingSegmenter.page_identity("x.txt", "Fuente: https://www.endesa.com/luz\nTítulo: Luz") == \
+        ("www.endesa.com", "https://www.endesa.com/luz")
+    assert PricingSegmenter.page_identity("temp_pdf/endesa.com_ab12cd_20240601_100000.pdf", "texto") == \
+        ("endesa.com", "endesa.com_ab12cd")
+    assert PricingSegmenter.page_identity("otro.pdf", "texto") == (None, None)
+
+
+def test_conserva_precios_con_contexto_y_titulo():
+    segmentador = PricingSegmenter(context_lines=1)
+    relleno = [f"Texto promocional {i}" for i in range(10)]
+    texto = "\n".join(["Fuente: https://a.es/luz", "Título: Luz", *relleno[:5],
+                       "## Tarifa Estable", "Sin sorpresas", "Energía 0,119 €/kWh", "Ventajas", *relleno[5:]])
+    segmentado = segmentador.segment("a.txt", texto).splitlines()
+
+    assert segmentado[:2] == ["Fuente: https://a.es/luz", "Título: Luz"]
+    assert "## Tarifa Estable" in segmentado and "Energía 0,119 €/kWh" in segmentado
+    assert "Texto promocional 0" not in segmentado and "Texto promocional 9" not in segmentado
+    assert "..." in segmentado
+    assert segmentador.tokens_after < segmentador.tokens_before
+
+
+def test_sin_precios_devuelve_el_texto():
+    segmentador = PricingSegmenter()
+    texto = "Fuente: https://a.es/x\nTítulo: X\nPágina sin tarifas"
+    assert segmentador.segment("a.txt", texto) == texto
+
+
+def test_aprende_lineas_repetidas_del_dominio(tmp_path):
+    estado = tmp_path / "segmentacion.json"
+    segmentador = PricingSegmenter(state_file=str(estado), min_pages=3)
+    for i in range(3):
+        segmentador.segment("a.txt", _captura(f"https://a.es/{i}", ["Descripción"]))
+    segmentador.save()
+
+    # Otra ejecución recuerda el menú del dominio y lo descarta
+    segmentador = PricingSegmenter(state_file=str(estado), min_pages=3)
+    segmentado = segmentador.segment("a.txt", _captura("https://a.es/nueva", ["Descripción nueva"]))
+    assert not set(MENU) & set(segmentado.splitlines())
+    assert "Descripción nueva" in segmentado
+
+    # En otro dominio el menú no se ha visto aún
+    segmentado = segmentador.segment("b.txt", _captura("https://b.es/1", ["Descripción"]))
+    assert set(MENU) <= set(segmentado.splitlines())
+
+
+def test_lineas_repetidas_con_precios_se_conservan():
+    segmentador = PricingSegmenter(min_pages=2)
+    for i in range(2):
+        segmentado = segmentador.segment("a.txt", _captura(f"https://a.es/{i}", ["Potencia 0,089 €/kW día"]))
+    assert "Potencia 0,089 €/kW día" in segmentado.splitlines()